@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+# Command line alignment without the GUI (and without PyQt).
+#
+#   python3 AlignCLI.py genomes.txt --banded --align-length 3000
+#   python3 AlignCLI.py genomes.txt --query 2 --engine hirschberg --align-length 40000 --format json
+#   python3 AlignCLI.py references.fasta --query-file isolate.fasta --workers 8
+#   python3 AlignCLI.py many_genomes.fasta --workers 8 --max-distance 0.3
+#   python3 AlignCLI.py genomes.txt --align-length 10000 --max-cost -20000
+#   python3 AlignCLI.py genomes.txt --query 2 --engine auto --align-length 40000 --memory-budget 512
+#   python3 AlignCLI.py genomes.txt --align-length 1000 3000 10000
+#
+# Without --query every pair (i, j) with j >= i is aligned, as in the GUI matrix.
+# Results are written to stdout as they finish, either as TSV or as JSON lines.
+# --prefilter screens the pairs with MinHash sketches first and aligns the most
+# similar ones first; --max-distance also skips the pairs estimated to differ more,
+# reporting them with only their estimated distance.  --max-cost stops aligning a
+# pair once it must cost more, reporting its cost as inf.  Several --align-length
+# values sweep every pair over all of them in one pass, adding a sweep column with
+# the cost at each length; --traceback-lengths picks the lengths that also get an
+# alignment from --engine (their strings and CIGARs are only written as JSON).
+
+import argparse
+import json
+import math
+import os
+import sys
+
+from GeneSequencing import GeneSequencing
+from SequenceStore import load_sequences
+from Sketch import estimated_result, screen_pairs
+
+FIELDS = ['i', 'j', 'label_i', 'label_j', 'align_cost']
+
+
+# A result as plain data for the output, with the strings and CIGAR only when asked for
+def result_record(i, j, labels, result, strings, cigar):
+	record = {'i': i, 'j': j, 'label_i': labels[i], 'label_j': labels[j]}
+	record.update(result_fields(result, strings, cigar))
+	return record
+
+
+def result_fields(result, strings, cigar):
+	record = {}
+	for key, value in result.items():
+		if key == 'sweep':
+			record[key] = [result_fields(entry, strings, cigar) for entry in value]
+		elif key == 'alignment':
+			if cigar:
+				record['cigar'] = value.cigar() if value is not None else result.get('cigar')
+		elif key in ('seqi_first100', 'seqj_first100'):
+			if strings:
+				record[key] = value
+		elif key != 'cigar' or cigar:
+			record[key] = value
+	return record
+
+
+# JSON has no infinity: a cost over --max-cost becomes null, flagged with
+# 'exceeds_max_cost' (which is false for the costs within it)
+def json_record(record):
+	record = dict(record)
+	if 'max_cost' in record:
+		record['exceeds_max_cost'] = record['align_cost'] == math.inf
+		if record['exceeds_max_cost']:
+			record['align_cost'] = None
+	if 'sweep' in record:
+		record['sweep'] = [json_record(entry) for entry in record['sweep']]
+	return record
+
+
+def write_record(record, output_format, columns):
+	if output_format == 'json':
+		print(json.dumps(json_record(record), allow_nan=False))
+	else:
+		fields = dict(record)
+		if 'sweep' in fields:
+			fields['sweep'] = ','.join('{}:{}'.format(entry['align_length'], entry['align_cost'])
+									   for entry in fields['sweep'])
+		print('\t'.join('' if fields.get(column) is None else str(fields[column]) for column in columns))
+	sys.stdout.flush()
+
+
+def aligned_pairs(sequences, pairs, args):
+	if args.workers == 1:
+		distances = None
+		if args.prefilter or args.max_distance is not None:
+			pairs, skipped, distances = screen_pairs(sequences, pairs, args.max_distance, args.align_length)
+			for i, j, distance in skipped:
+				yield i, j, estimated_result(distance)
+		solver = GeneSequencing(memory_budget=args.memory_budget)
+		queries = {i for i, j in pairs}
+		if len(queries) == 1 and distances is None and args.max_cost is None and not args.traceback_lengths:
+			# one query against every target: let align_many fill them together
+			query = queries.pop()
+			results = solver.align_many(sequences[query], [sequences[j] for i, j in pairs], banded=args.banded,
+										align_length=args.align_length, engine=args.engine)
+			for (i, j), result in zip(pairs, results):
+				yield i, j, result
+			return
+		for i, j in pairs:
+			result = solver.align(sequences[i], sequences[j], banded=args.banded,
+								  align_length=args.align_length, engine=args.engine, max_cost=args.max_cost,
+								  traceback_lengths=args.traceback_lengths)
+			if distances is not None:
+				result['distance'] = distances[i, j]
+			yield i, j, result
+	else:
+		# the process pool is only loaded when it is used
+		from AllPairs import align_all_pairs
+		yield from align_all_pairs(sequences, args.banded, args.align_length, engine=args.engine, pairs=pairs,
+								   workers=args.workers, chunk_size=args.chunk_size, prefilter=args.prefilter,
+								   max_distance=args.max_distance, max_cost=args.max_cost,
+								   memory_budget=args.memory_budget, traceback_lengths=args.traceback_lengths)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Align the sequences in a genomes.txt style or FASTA file.')
+	parser.add_argument('file', help='genomes.txt style or FASTA file')
+	parser.add_argument('--query', type=int, help='align only this sequence (by index) against every sequence')
+	parser.add_argument('--query-file', help='align the first sequence of this file against every sequence')
+	parser.add_argument('--banded', action='store_true', help='banded alignment')
+	parser.add_argument('--align-length', type=int, nargs='+', default=[1000],
+						help='number of bases to align; several lengths are swept in one pass')
+	parser.add_argument('--traceback-lengths', type=int, nargs='+', default=[],
+						help='lengths of a sweep that also get an alignment from --engine')
+	parser.add_argument('--engine', default='score',
+						help='full alignment engine (see GeneSequencing.align); the default score engine gives no strings, '
+							 'auto picks the fastest that fits the memory budget')
+	parser.add_argument('--workers', type=int, default=1, help='worker processes (1 aligns in this process)')
+	parser.add_argument('--chunk-size', type=int, default=1, help='pairs handed to a worker at a time')
+	parser.add_argument('--format', choices=['tsv', 'json'], default='tsv', help='output format')
+	parser.add_argument('--strings', action='store_true', help='include the first 100 aligned columns')
+	parser.add_argument('--cigar', action='store_true', help='include the alignment as a CIGAR string')
+	parser.add_argument('--prefilter', action='store_true',
+						help='estimate pair distances with MinHash sketches and align the closest pairs first')
+	parser.add_argument('--max-distance', type=float,
+						help='skip pairs estimated to differ by more than this fraction of bases (implies --prefilter)')
+	parser.add_argument('--max-cost', type=int,
+						help='only pairs costing at most this are aligned to the end; the rest get cost inf')
+	parser.add_argument('--memory-budget', type=float,
+						help='MiB an alignment may need before it is refused (half the physical memory by default)')
+	args = parser.parse_args(argv)
+	if args.memory_budget is not None:
+		args.memory_budget = int(args.memory_budget*1024*1024)
+	if len(args.align_length) == 1:
+		args.align_length = args.align_length[0]
+	elif args.format == 'tsv' and (args.cigar or args.strings):
+		# a TSV row is one pair, with no room for the alignment of every length
+		parser.error('--cigar and --strings with several --align-length values need --format json')
+
+	sequences = load_sequences(args.file)
+	if args.query_file is not None:
+		sequences = load_sequences(args.query_file)[:1] + sequences
+		pairs = [(0, j) for j in range(1, len(sequences))]
+	elif args.query is not None:
+		pairs = [(args.query, j) for j in range(len(sequences))]
+	else:
+		pairs = [(i, j) for i in range(len(sequences)) for j in range(i, len(sequences))]
+	labels = [seq.name for seq in sequences]
+
+	columns = list(FIELDS)
+	if args.strings:
+		columns += ['seqi_first100', 'seqj_first100']
+	if args.cigar:
+		columns.append('cigar')
+	if args.prefilter or args.max_distance is not None:
+		columns += ['distance', 'estimated']
+	if isinstance(args.align_length, list):
+		columns.append('sweep')
+	if args.format == 'tsv':
+		print('\t'.join(columns))
+
+	try:
+		for i, j, result in aligned_pairs(sequences, pairs, args):
+			write_record(result_record(i, j, labels, result, args.strings, args.cigar), args.format, columns)
+	except BrokenPipeError:
+		# the reader stopped early (e.g. piped into head); keep Python from complaining on exit
+		os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+# A local alignment service: JSON over HTTP, built on asyncio.
+#
+#   python3 AlignService.py --port 8765 --workers 4
+#   curl -d '{"seq1": "polynomial", "seq2": "exponential", "banded": false, "align_length": 1000}' \
+#        http://127.0.0.1:8765/align
+#   curl http://127.0.0.1:8765/stats
+#
+# POST /align takes seq1 and seq2 (text), and optionally banded (false),
+# align_length (1000) and engine ('score'), and answers with the result dict of
+# GeneSequencing.align, the alignment given as a CIGAR string.
+#
+# Identical requests that arrive while one is being aligned share its result.
+# Requests wait in a bounded queue and are handed to a process pool in batches of
+# up to batch_size, so the event loop only parses and answers.  A request that is
+# not valid gets 400, and one whose alignment fails (e.g. with MemoryError) 500.
+# When the queue stays full for queue_timeout seconds, or the pool has broken, the
+# request is turned away with 503, and when its result takes longer than
+# request_timeout seconds with 504.
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from AlignmentCache import storable_result
+from GeneSequencing import ENGINES, GeneSequencing
+
+DEFAULT_PORT = 8765
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error',
+		   503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+# The solver of each pool process
+worker_solver = None
+
+
+# A request turned away because the service cannot take it now (answered with 503)
+class ServiceUnavailable(Exception):
+	pass
+
+
+# Align every request of a batch.  A request that fails does not fail the others:
+# its exception is handed back in place of the result.
+def align_batch(requests):
+	global worker_solver
+	if worker_solver is None:
+		worker_solver = GeneSequencing()
+	results = []
+	for request in requests:
+		try:
+			result = worker_solver.align(request['seq1'], request['seq2'], banded=request['banded'],
+										 align_length=request['align_length'], engine=request['engine'])
+			results.append((True, storable_result(result)))
+		except Exception as error:
+			results.append((False, error))
+	return results
+
+
+# A request with its defaults filled in, or ValueError if it is not one
+def parse_request(payload):
+	if not isinstance(payload, dict) or not isinstance(payload.get('seq1'), str) \
+			or not isinstance(payload.get('seq2'), str):
+		raise ValueError('seq1 and seq2 must be strings')
+	request = {
+		'seq1': payload['seq1'],
+		'seq2': payload['seq2'],
+		'banded': bool(payload.get('banded', False)),
+		'align_length': payload.get('align_length', 1000),
+		'engine': payload.get('engine', 'score'),
+	}
+	if not isinstance(request['align_length'], int) or request['align_length'] < 0:
+		raise ValueError('align_length must be a non-negative integer')
+	if request['engine'] not in ENGINES:
+		raise ValueError('engine must be one of {}'.format(', '.join(ENGINES)))
+	return request
+
+
+def request_key(request):
+	return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+class AlignmentService:
+
+	def __init__(self, workers=None, batch_size=16, max_queue=1024, queue_timeout=1.0, request_timeout=None):
+		if workers is None:
+			workers = os.cpu_count() or 1
+		self.workers = workers
+		self.pool = self.new_pool()
+		# one batcher per pool process keeps every process busy
+		self.batchers = workers
+		self.batch_size = batch_size
+		self.queue_timeout = queue_timeout
+		self.request_timeout = request_timeout
+		self.queue = asyncio.Queue(max_queue)
+		self.in_flight = {}
+		self.stats = {'requests': 0, 'coalesced': 0, 'aligned': 0, 'batches': 0, 'rejected': 0}
+		self.tasks = []
+
+	def new_pool(self):
+		# forked workers would inherit the open client sockets and keep them from closing
+		return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+	async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+		self.tasks = [asyncio.create_task(self.batcher()) for batcher in range(self.batchers)]
+		self.server = await asyncio.start_server(self.handle_connection, host, port)
+		return self.server
+
+	async def close(self):
+		self.server.close()
+		await self.server.wait_closed()
+		for task in self.tasks:
+			task.cancel()
+		await asyncio.gather(*self.tasks, return_exceptions=True)
+		self.pool.shutdown(cancel_futures=True)
+
+	# The result of one request.  Raises the exception its alignment raised,
+	# ServiceUnavailable when the queue is full or the pool broke, and
+	# asyncio.TimeoutError when the result takes longer than request_timeout.  A
+	# request that times out is still aligned, for any identical ones waiting on it.
+	async def align(self, request):
+		self.stats['requests'] += 1
+		key = request_key(request)
+		if key in self.in_flight:
+			self.stats['coalesced'] += 1
+			return await asyncio.wait_for(asyncio.shield(self.in_flight[key]), self.request_timeout)
+
+		future = asyncio.get_running_loop().create_future()
+		self.in_flight[key] = future
+		try:
+			try:
+				await asyncio.wait_for(self.queue.put((request, future)), self.queue_timeout)
+			except asyncio.TimeoutError:
+				self.stats['rejected'] += 1
+				# the requests waiting on this one are turned away too
+				future.set_exception(ServiceUnavailable('too many requests queued'))
+			return await asyncio.wait_for(asyncio.shield(future), self.request_timeout)
+		finally:
+			del self.in_flight[key]
+
+	# Take whatever is queued (up to batch_size) and align it in the pool
+	async def batcher(self):
+		loop = asyncio.get_running_loop()
+		while True:
+			batch = [await self.queue.get()]
+			while len(batch) < self.batch_size and not self.queue.empty():
+				batch.append(self.queue.get_nowait())
+			self.stats['batches'] += 1
+			try:
+				results = await loop.run_in_executor(self.pool, align_batch, [request for request, future in batch])
+			except BrokenProcessPool as error:
+				# a worker died (killed, or out of memory); later batches get a new pool
+				self.pool.shutdown(wait=False)
+				self.pool = self.new_pool()
+				results = [(False, ServiceUnavailable('the worker pool broke: {}'.format(error)))]*len(batch)
+			except Exception as error:
+				results = [(False, error)]*len(batch)
+			for (request, future), (succeeded, value) in zip(batch, results):
+				self.stats['aligned'] += 1
+				if future.done():
+					continue
+				if succeeded:
+					future.set_result(value)
+				else:
+					future.set_exception(value)
+
+	async def handle_connection(self, reader, writer):
+		try:
+			while True:
+				request_line = await reader.readline()
+				if not request_line:
+					break
+				method, path, version = request_line.decode('latin-1').split(' ', 2)
+				headers = {}
+				while True:
+					line = (await reader.readline()).decode('latin-1').strip()
+					if not line:
+						break
+					name, value = line.split(':', 1)
+					headers[name.strip().lower()] = value.strip()
+				body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+				status, response = await self.respond(method, path, body)
+				data = json.dumps(response).encode()
+				writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n'.format(
+					status, REASONS[status], len(data)).encode('latin-1') + data)
+				await writer.drain()
+				if headers.get('connection', '').lower() == 'close':
+					break
+		except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+			pass
+		finally:
+			writer.close()
+
+	async def respond(self, method, path, body):
+		if path == '/stats':
+			return 200, dict(self.stats, queued=self.queue.qsize(), in_flight=len(self.in_flight))
+		if path != '/align':
+			return 404, {'error': 'unknown path {}'.format(path)}
+		if method != 'POST':
+			return 405, {'error': 'use POST'}
+		try:
+			request = parse_request(json.loads(body))
+		except ValueError as error:
+			return 400, {'error': str(error)}
+		try:
+			return 200, await self.align(request)
+		except ServiceUnavailable as error:
+			return 503, {'error': str(error)}
+		except asyncio.TimeoutError:
+			return 504, {'error': 'no result within {} seconds'.format(self.request_timeout)}
+		except ValueError as error:
+			# sequences the engine cannot take, like too many characters for four-russians
+			return 400, {'error': str(error)}
+		except Exception as error:
+			return 500, {'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+async def serve(host, port, workers, batch_size, max_queue, queue_timeout, request_timeout):
+	service = AlignmentService(workers, batch_size, max_queue, queue_timeout, request_timeout)
+	server = await service.start(host, port)
+	print('Listening on http://{}:{}'.format(host, port), flush=True)
+	async with server:
+		await server.serve_forever()
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Serve alignments as JSON over HTTP on this machine.')
+	parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+	parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on')
+	parser.add_argument('--workers', type=int, help='worker processes (one per CPU by default)')
+	parser.add_argument('--batch-size', type=int, default=16, help='most requests handed to a worker at once')
+	parser.add_argument('--max-queue', type=int, default=1024, help='requests that may wait for a worker')
+	parser.add_argument('--queue-timeout', type=float, default=1.0,
+						help='seconds a request waits for room in a full queue before getting 503')
+	parser.add_argument('--request-timeout', type=float,
+						help='seconds a queued request waits for its result before getting 504 (no limit by default)')
+	args = parser.parse_args(argv)
+	try:
+		asyncio.run(serve(args.host, args.port, args.workers, args.batch_size, args.max_queue, args.queue_timeout,
+						  args.request_timeout))
+	except KeyboardInterrupt:
+		pass
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,96 @@
+import re
+
+from Operations import DELETE, INSERT, MATCH, SUB
+
+# CIGAR letters: '=' match, 'X' sub, 'D' uses a character of seq1 only, 'I' one of seq2 only
+CIGAR_LETTERS = {MATCH: '=', SUB: 'X', DELETE: 'D', INSERT: 'I'}
+
+
+# Add _count_ operations to a run-length list of [operation, count] runs
+def push_run(runs, operation, count=1):
+	if runs and runs[-1][0] == operation:
+		runs[-1][1] += count
+	else:
+		runs.append([operation, count])
+
+
+# An alignment kept as runs of Operation codes instead of padded strings.  The
+# path starts at (start_i, start_j) of the table, which is (0, 0) unless a
+# traceback wandered off the table edge.  Padded strings are only built for the
+# window of columns asked for.
+class Alignment:
+
+	def __init__(self, seq1, seq2, runs, start_i=0, start_j=0):
+		self.seq1 = seq1
+		self.seq2 = seq2
+		self.runs = [(operation, count) for operation, count in runs]
+		self.start_i = start_i
+		self.start_j = start_j
+
+	# Build from runs collected while walking back from the end of the path
+	@classmethod
+	def from_traceback(cls, seq1, seq2, reversed_runs, start_i, start_j):
+		return cls(seq1, seq2, reversed(reversed_runs), start_i, start_j)
+
+	# Build from a list of Operation codes in path order
+	@classmethod
+	def from_operations(cls, seq1, seq2, operations):
+		runs = []
+		for operation in operations:
+			push_run(runs, operation)
+		return cls(seq1, seq2, runs)
+
+	# Build from a CIGAR string as given by cigar()
+	@classmethod
+	def from_cigar(cls, seq1, seq2, cigar, start_i=0, start_j=0):
+		operations = {letter: operation for operation, letter in CIGAR_LETTERS.items()}
+		runs = [(operations[letter], int(count)) for count, letter in re.findall(r'(\d+)(\D)', cigar)]
+		return cls(seq1, seq2, runs, start_i, start_j)
+
+	def __len__(self):
+		return sum(count for operation, count in self.runs)
+
+	def cigar(self):
+		return ''.join('{}{}'.format(count, CIGAR_LETTERS[operation]) for operation, count in self.runs)
+
+	# The padded strings for columns _start_ up to (not including) _stop_
+	def render(self, start=0, stop=None):
+		alignment1 = []
+		alignment2 = []
+		i = self.start_i
+		j = self.start_j
+		column = 0
+		for operation, count in self.runs:
+			if stop is not None and column >= stop:
+				break
+			# skip whole runs that end before the window
+			if column + count <= start:
+				skipped = count
+			else:
+				skipped = max(0, start - column)
+			if operation != INSERT:
+				i += skipped
+			if operation != DELETE:
+				j += skipped
+			column += skipped
+
+			shown = count - skipped
+			if stop is not None:
+				shown = min(shown, stop - column)
+			for step in range(shown):
+				if operation == DELETE:
+					alignment1.append(self.seq1[i])
+					alignment2.append("-")
+					i += 1
+				elif operation == INSERT:
+					alignment1.append("-")
+					alignment2.append(self.seq2[j])
+					j += 1
+				else:
+					alignment1.append(self.seq1[i])
+					alignment2.append(self.seq2[j])
+					i += 1
+					j += 1
+			column += shown
+
+		return "".join(alignment1), "".join(alignment2)
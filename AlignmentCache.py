@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+from Alignment import Alignment
+
+# Where the GUI keeps its cache unless told otherwise
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'GeneSequencing', 'alignments.sqlite')
+DEFAULT_MAX_BYTES = 64*1024*1024
+
+
+# A result as plain data for JSON: the Alignment object becomes its CIGAR string
+# (and 'cigar_start', when the path does not start at (0, 0)).  Instrumentation
+# describes one run, not the result, so it is dropped.  The results of a sweep over
+# several lengths are converted the same way.
+def storable_result(result):
+	stored = dict(result)
+	stored.pop('instrumentation', None)
+	alignment = stored.pop('alignment', None)
+	if alignment is not None:
+		stored['cigar'] = alignment.cigar()
+		if alignment.start_i or alignment.start_j:
+			stored['cigar_start'] = [alignment.start_i, alignment.start_j]
+	if 'sweep' in stored:
+		stored['sweep'] = [storable_result(entry) for entry in stored['sweep']]
+	return stored
+
+
+# The inverse of storable_result: the CIGAR string becomes an Alignment of _seq1_
+# and _seq2_ again (in the order the alignment has them, the shorter first), so a
+# stored result has the same keys as a computed one
+def restored_result(stored, seq1, seq2):
+	result = dict(stored)
+	cigar = result.pop('cigar', None)
+	start = result.pop('cigar_start', (0, 0))
+	result['alignment'] = None if cigar is None else Alignment.from_cigar(seq1, seq2, cigar, *start)
+	if 'sweep' in result:
+		result['sweep'] = [restored_result(entry, seq1, seq2) for entry in result['sweep']]
+	return result
+
+
+# A persistent cache of alignment results, stored in an SQLite file.  Entries are
+# addressed by a hash of the two sequences and every parameter the result depends
+# on, and the least recently used entries are dropped once the stored results
+# take more than _max_bytes_.  _hits_ and _misses_ count lookups since it was opened.
+class AlignmentCache:
+
+	def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+		self.path = path
+		self.max_bytes = max_bytes
+		self.hits = 0
+		self.misses = 0
+
+		directory = os.path.dirname(path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		self.connection = sqlite3.connect(path)
+		self.connection.execute('CREATE TABLE IF NOT EXISTS results '
+								'(key TEXT PRIMARY KEY, result TEXT, size INTEGER, last_used INTEGER)')
+		self.connection.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+		self.connection.commit()
+
+	def key(self, seq1, seq2, parameters):
+		digest = hashlib.sha256()
+		for seq in (seq1, seq2):
+			seq_digest = hashlib.sha256(seq.encode('latin-1') if isinstance(seq, str) else bytes(seq))
+			digest.update(seq_digest.digest())
+		digest.update(json.dumps(parameters, sort_keys=True).encode())
+		return digest.hexdigest()
+
+	def get(self, key):
+		row = self.connection.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+		if row is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.connection.execute('UPDATE results SET last_used = ? WHERE key = ?', (self.next_use(), key))
+		self.connection.commit()
+		return json.loads(row[0])
+
+	def put(self, key, result):
+		data = json.dumps(storable_result(result))
+		self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+								(key, data, len(data), self.next_use()))
+		self.evict()
+		self.connection.commit()
+
+	# Drop the least recently used entries until the cache fits in max_bytes
+	def evict(self):
+		total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+		while total > self.max_bytes:
+			key, size = self.connection.execute('SELECT key, size FROM results ORDER BY last_used LIMIT 1').fetchone()
+			self.connection.execute('DELETE FROM results WHERE key = ?', (key,))
+			total -= size
+
+	def next_use(self):
+		return self.connection.execute('SELECT COALESCE(MAX(last_used), 0) + 1 FROM results').fetchone()[0]
+
+	def clear(self):
+		self.connection.execute('DELETE FROM results')
+		self.connection.commit()
+
+	def stats(self):
+		entries, size = self.connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+		return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+	def close(self):
+		self.connection.close()
@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from GeneSequencing import GeneSequencing
+from SequenceCodes import as_codes
+from Sketch import estimated_result, screen_pairs
+
+# How often a waiting align_all_pairs asks whether it has been cancelled
+CANCEL_POLL_SECONDS = 0.1
+
+# State of each worker process, set up once by attach_sequences
+worker_memory = None
+worker_sequences = None
+worker_solver = None
+
+
+# Every (i, j) with j >= i, the upper triangle the GUI fills
+def upper_triangle(count):
+	return [(i, j) for i in range(count) for j in range(i, count)]
+
+
+# Copy all sequences into one shared memory block.  Returns the block and the
+# (start, end) offsets of each sequence inside it.
+def share_sequences(sequences):
+	codes = [as_codes(seq) for seq in sequences]
+	offsets = []
+	total = 0
+	for seq_codes in codes:
+		offsets.append((total, total + len(seq_codes)))
+		total += len(seq_codes)
+
+	memory = shared_memory.SharedMemory(create=True, size=max(total, 1))
+	buffer = np.ndarray((total,), dtype=np.uint8, buffer=memory.buf)
+	for seq_codes, (start, end) in zip(codes, offsets):
+		buffer[start:end] = seq_codes
+	return memory, offsets
+
+
+# Pool initializer: attach to the shared block instead of receiving the sequences with every task
+def attach_sequences(name, offsets, memory_budget):
+	global worker_memory, worker_sequences, worker_solver
+	worker_memory = shared_memory.SharedMemory(name=name)
+	buffer = np.ndarray((offsets[-1][1] if offsets else 0,), dtype=np.uint8, buffer=worker_memory.buf)
+	worker_sequences = [buffer[start:end] for start, end in offsets]
+	worker_solver = GeneSequencing(memory_budget=memory_budget)
+
+
+def align_chunk(pairs, banded, align_length, engine, instrument, max_cost, traceback_lengths):
+	results = []
+	for i, j in pairs:
+		result = worker_solver.align(worker_sequences[i], worker_sequences[j], banded=banded, align_length=align_length,
+									 engine=engine, instrument=instrument, max_cost=max_cost,
+									 traceback_lengths=traceback_lengths)
+		results.append((i, j, result))
+	return results
+
+
+# Align every pair in _pairs_ (the upper triangle by default) on a pool of _workers_ processes,
+# handing each task _chunk_size_ pairs.  Yields (i, j, result) as alignments finish, so the
+# order depends on which pairs complete first.  With a _cache_ (an AlignmentCache) the cached
+# pairs are yielded straight away and only the rest go to the pool.  With _instrument_ every
+# aligned pair carries its 'instrumentation' (see GeneSequencing.align); cached pairs do not.
+#
+# With _prefilter_ the pairs are first screened with MinHash sketches (see Sketch.py) and aligned
+# most similar first, and every result gets the estimated 'distance'.  Pairs estimated to be
+# farther apart than _max_distance_ (which implies _prefilter_) are not aligned at all: they are
+# yielded first, as results with no cost, 'estimated' set and only the distance.
+#
+# With _max_cost_ pairs costing more are not aligned to the end (see GeneSequencing.align).
+# _memory_budget_ is the budget of each worker's GeneSequencing.  With a list of
+# _align_length_s every pair is a sweep (see GeneSequencing.align_sweep).
+#
+# _cancelled_ is a callable polled while waiting for the pool; once it returns True
+# no more results are yielded.  Cancelling, or closing the generator early, drops
+# the pairs not yet started and terminates the workers without waiting for the
+# alignments still running.
+def align_all_pairs(sequences, banded, align_length, engine='serial', pairs=None, workers=None, chunk_size=1,
+					cache=None, instrument=False, prefilter=False, max_distance=None, max_cost=None,
+					memory_budget=None, traceback_lengths=(), cancelled=None):
+	if pairs is None:
+		pairs = upper_triangle(len(sequences))
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	distances = None
+	if prefilter or max_distance is not None:
+		pairs, skipped, distances = screen_pairs(sequences, pairs, max_distance, align_length)
+		for i, j, distance in skipped:
+			yield i, j, estimated_result(distance)
+
+	keys = {}
+	if cache is not None:
+		solver = GeneSequencing(cache=cache)
+		parameters = solver.result_parameters(banded, align_length, engine, max_cost, traceback_lengths)
+		missing = []
+		for i, j in pairs:
+			keys[i, j] = cache.key(sequences[i], sequences[j], parameters)
+			result = solver.cached_result(keys[i, j], sequences[i], sequences[j])
+			if result is None:
+				missing.append((i, j))
+			else:
+				if distances is not None:
+					result['distance'] = distances[i, j]
+				yield i, j, result
+		pairs = missing
+	if not pairs:
+		return
+
+	chunks = [pairs[start:start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+
+	memory, offsets = share_sequences(sequences)
+	# spawned, not forked: the caller may be a thread of a running Qt application, and
+	# a fork copies only that thread along with locks the others may hold
+	pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+							   initializer=attach_sequences, initargs=(memory.name, offsets, memory_budget))
+	finished = False
+	try:
+		pending = {pool.submit(align_chunk, chunk, banded, align_length, engine, instrument, max_cost,
+							   traceback_lengths) for chunk in chunks}
+		while pending:
+			if cancelled is not None and cancelled():
+				return
+			done, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+			for future in done:
+				for i, j, result in future.result():
+					if cache is not None:
+						cache.put(keys[i, j], result)
+					if distances is not None:
+						result['distance'] = distances[i, j]
+					yield i, j, result
+		finished = True
+	finally:
+		if finished:
+			pool.shutdown()
+		else:
+			stop_pool(pool)
+		memory.close()
+		memory.unlink()
+
+
+# Shut _pool_ down without waiting: queued tasks are dropped and running ones killed
+def stop_pool(pool):
+	terminate = getattr(pool, 'terminate_workers', None)
+	if terminate is not None:
+		# Python 3.14 and later
+		terminate()
+		return
+	processes = list((pool._processes or {}).values())
+	pool.shutdown(wait=False, cancel_futures=True)
+	for process in processes:
+		process.terminate()
+	for process in processes:
+		process.join()
@@ -0,0 +1,145 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from Alignment import push_run
+from BandFill import adaptive_band
+from Hirschberg import hirschberg
+from Instrumentation import NULL_PROBE
+from Operations import DELETE, INSERT, MATCH
+from SequenceCodes import as_codes
+from Sketch import kmer_values
+
+SEED_LENGTH = 16
+# Gaps up to this many cells are filled with the adaptive band; larger ones
+# (where the band could grow to the whole gap) with Hirschberg in linear memory
+BAND_GAP_CELLS = 1 << 24
+
+
+# Exact seeds: k-mers found exactly once in each sequence.  Seeds on the same
+# diagonal that touch or overlap are merged, giving (i, j, length) matches
+# sorted by i.
+def find_seeds(codes1, codes2, k):
+	positions1, kmers1 = kmer_values(codes1, k)
+	positions2, kmers2 = kmer_values(codes2, k)
+	unique1, first1, counts1 = np.unique(kmers1, return_index=True, return_counts=True)
+	unique2, first2, counts2 = np.unique(kmers2, return_index=True, return_counts=True)
+	shared, in1, in2 = np.intersect1d(unique1[counts1 == 1], unique2[counts2 == 1], assume_unique=True,
+									  return_indices=True)
+	starts1 = positions1[first1[counts1 == 1][in1]]
+	starts2 = positions2[first2[counts2 == 1][in2]]
+	if len(shared) == 0:
+		return []
+
+	# group by diagonal, then merge runs of seeds that are at most k apart along it
+	diagonals = starts2 - starts1
+	order = np.lexsort((starts1, diagonals))
+	starts1 = starts1[order]
+	starts2 = starts2[order]
+	diagonals = diagonals[order]
+	new_match = np.ones(len(order), dtype=bool)
+	new_match[1:] = (diagonals[1:] != diagonals[:-1]) | (starts1[1:] - starts1[:-1] > k)
+	match_starts = np.flatnonzero(new_match)
+	match_ends = np.append(match_starts[1:], len(order)) - 1
+	lengths = starts1[match_ends] + k - starts1[match_starts]
+
+	return sorted(zip(starts1[match_starts].tolist(), starts2[match_starts].tolist(), lengths.tolist()))
+
+
+# The heaviest co-linear chain of seeds, weighted by length: each seed must
+# start after the previous one in both sequences.  Overlaps between chained
+# seeds are trimmed off the later seed.  Seeds are taken in order of i, and a
+# Fenwick tree over the j starts keeps the best chain so far below each j.
+def chain_seeds(seeds):
+	if not seeds:
+		return []
+	columns = sorted({j for i, j, length in seeds})
+	tree_best = [0]*(len(columns) + 1)
+	tree_seed = [-1]*(len(columns) + 1)
+	best = []
+	previous = []
+
+	for index, (i, j, length) in enumerate(seeds):
+		# best chain among seeds with a smaller j (those with a smaller i were added already)
+		position = bisect_left(columns, j)
+		chained = 0
+		before = -1
+		while position > 0:
+			if tree_best[position] > chained:
+				chained = tree_best[position]
+				before = tree_seed[position]
+			position -= position & -position
+		best.append(chained + length)
+		previous.append(before)
+
+		position = bisect_left(columns, j) + 1
+		while position <= len(columns):
+			if best[index] > tree_best[position]:
+				tree_best[position] = best[index]
+				tree_seed[position] = index
+			position += position & -position
+
+	index = max(range(len(seeds)), key=lambda index: best[index])
+	chain = []
+	while index >= 0:
+		chain.append(seeds[index])
+		index = previous[index]
+	chain.reverse()
+
+	trimmed = []
+	end_i = end_j = 0
+	for i, j, length in chain:
+		overlap = max(0, end_i - i, end_j - j)
+		if overlap < length:
+			trimmed.append((i + overlap, j + overlap, length - overlap))
+			end_i = i + length
+			end_j = j + length
+	return trimmed
+
+
+# Fill a gap between anchors with an optimal alignment of its two pieces.  Returns
+# the score and Operation codes.
+def fill_gap(codes1, codes2, d, match_cost, indel_cost, sub_cost, probe):
+	num_rows = len(codes1)
+	num_cols = len(codes2)
+	if num_rows == 0 or num_cols == 0:
+		return (num_rows + num_cols)*indel_cost, [DELETE]*num_rows + [INSERT]*num_cols
+	if num_rows*num_cols > BAND_GAP_CELLS:
+		return hirschberg(codes1, codes2, match_cost, indel_cost, sub_cost, probe)
+	if num_rows <= num_cols:
+		score, operations, width = adaptive_band(codes1, codes2, d, match_cost, indel_cost, sub_cost, probe)
+		return score, operations
+	# the band wants the shorter piece first; swap back by exchanging deletes and inserts
+	score, operations, width = adaptive_band(codes2, codes1, d, match_cost, indel_cost, sub_cost, probe)
+	swapped = {DELETE: INSERT, INSERT: DELETE}
+	return score, [swapped.get(operation, operation) for operation in operations]
+
+
+# Whole-genome alignment anchored on shared exact seeds.  Seeds of _seed_length_
+# bases found once in each sequence are chained co-linearly and taken as matches;
+# only the gaps between them are aligned, with the adaptive band starting at half
+# width _d_.  The result is optimal within the gaps but not necessarily overall.
+# Returns the score, the alignment as [operation, count] runs, the number of
+# alignment columns covered by anchors and the number of anchors.
+def anchored_alignment(seq1, seq2, d, match_cost, indel_cost, sub_cost, seed_length=SEED_LENGTH, probe=NULL_PROBE):
+	codes1 = as_codes(seq1)
+	codes2 = as_codes(seq2)
+	anchors = chain_seeds(find_seeds(codes1, codes2, seed_length))
+
+	runs = []
+	score = 0
+	anchored = 0
+	end_i = end_j = 0
+	for i, j, length in anchors + [(len(codes1), len(codes2), 0)]:
+		gap_score, operations = fill_gap(codes1[end_i:i], codes2[end_j:j], d, match_cost, indel_cost, sub_cost,
+										 probe)
+		score += gap_score
+		for operation in operations:
+			push_run(runs, operation)
+		if length:
+			push_run(runs, MATCH, length)
+			score += length*match_cost
+			anchored += length
+		end_i = i + length
+		end_j = j + length
+	return score, runs, anchored, len(anchors)
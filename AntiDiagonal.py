@@ -0,0 +1,75 @@
+import numpy as np
+
+from Bounds import CHECK_INTERVAL, exceeds_max_cost
+from Operations import DELETE, INSERT, MATCH, SUB
+from PackedOperations import PackedOperations
+from SequenceCodes import as_codes
+
+
+# Fill the full Needleman-Wunsch table one anti-diagonal at a time.  Every cell on
+# anti-diagonal s = i + j only depends on diagonals s - 1 and s - 2, so a whole
+# diagonal is computed with a handful of NumPy operations.  Scores are kept in
+# three rolling diagonals (indexed by row), back pointers in a full PackedOperations
+# table; its first row and column are not written.  Returns the score of the
+# bottom right cell and the operations table.
+# With _max_cost_ the fill stops, returning None for the score, as soon as no path
+# through the last two diagonals can reach the bottom right cell at a cost of at
+# most _max_cost_ (a path steps over a diagonal only with a diagonal move).
+def fill_antidiagonal(seq1, seq2, match_cost, indel_cost, sub_cost, max_cost=None):
+	codes1 = as_codes(seq1)
+	codes2 = as_codes(seq2)
+	num_rows = len(codes1)
+	num_cols = len(codes2)
+
+	ops = PackedOperations(num_rows + 1, num_cols + 1)
+	all_rows = np.arange(num_rows + 1)
+
+	prev2 = np.zeros(num_rows + 1, dtype=np.int32)
+	prev1 = np.zeros(num_rows + 1, dtype=np.int32)
+	cur = np.zeros(num_rows + 1, dtype=np.int32)
+
+	for s in range(num_rows + num_cols + 1):
+		# first row and first column
+		if s <= num_cols:
+			cur[0] = s*indel_cost
+		if s <= num_rows:
+			cur[s] = s*indel_cost
+
+		first = max(1, s - num_cols)
+		last = min(num_rows, s - 1)
+		if first <= last:
+			rows = slice(first, last + 1)
+			above = slice(first - 1, last)
+			# seq1[i - 1] against seq2[s - i - 1] for every row i on the diagonal
+			matches = codes1[first - 1:last] == codes2[s - last - 1:s - first][::-1]
+
+			delete = prev1[above] + indel_cost
+			insert = prev1[rows] + indel_cost
+			diagonal = prev2[above] + np.where(matches, match_cost, sub_cost)
+
+			# a match always takes the diagonal, otherwise take the cheapest
+			value = np.where(matches, diagonal, np.minimum(np.minimum(delete, insert), diagonal))
+
+			# ties are broken delete, then insert, then sub
+			op = np.where(value == insert, INSERT, SUB)
+			op = np.where(value == delete, DELETE, op)
+			op = np.where(matches, MATCH, op)
+
+			cur[rows] = value
+			# one cell per row, so the cells of a diagonal never share a byte
+			ops.put(all_rows[rows], s - all_rows[rows], op)
+
+		if max_cost is not None and s % CHECK_INTERVAL == 1:
+			if diagonal_exceeds(cur, s, num_rows, num_cols, match_cost, indel_cost, max_cost) and \
+					diagonal_exceeds(prev1, s - 1, num_rows, num_cols, match_cost, indel_cost, max_cost):
+				return None, ops
+
+		prev2, prev1, cur = prev1, cur, prev2
+
+	return int(prev1[num_rows]), ops
+
+
+# exceeds_max_cost for the cells of anti-diagonal _s_, whose scores are indexed by row
+def diagonal_exceeds(scores, s, num_rows, num_cols, match_cost, indel_cost, max_cost):
+	rows = np.arange(max(0, s - num_cols), min(num_rows, s) + 1)
+	return exceeds_max_cost(scores[rows], num_rows - rows, num_cols - (s - rows), match_cost, indel_cost, max_cost)
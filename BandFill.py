@@ -0,0 +1,175 @@
+import numpy as np
+
+from Bounds import CHECK_INTERVAL, exceeds_max_cost
+from Instrumentation import NULL_PROBE
+from Operations import DELETE, INSERT, MATCH, SUB
+from PackedOperations import PackedOperations
+from SequenceCodes import as_codes
+
+# Score of a cell outside the band, larger than any real alignment cost
+OUT_OF_BAND = 1 << 40
+# Offset that keeps the running minimum of one segment out of the next one
+SEGMENT_OFFSET = 1 << 48
+
+
+# Fill a band of width 2d+1 around the main diagonal.  Only the band is stored:
+# row i of the returned PackedOperations holds the Operation codes of cells (i, j)
+# for j = i - d .. i + d, so cell (i, j) sits at column j - i + d.  Only cells with
+# 1 <= i and 1 <= j <= len(seq2) are written.  Scores are kept for the current and
+# previous row only.  Cells outside the band (or past the end of seq2) score
+# OUT_OF_BAND, which keeps them out of every minimum.
+# With _forced_match_ a match always takes the diagonal, as the original banded
+# table did; without it every cell takes the true minimum of its three moves.
+# Returns the last row of scores (in the same band coordinates) and the band.
+# With _max_cost_ the fill stops, returning (None, None), as soon as no path through
+# the current row can reach cell (len(seq1), _end_col_) (by default the last
+# column) at a cost of at most _max_cost_.
+def fill_band(seq1, seq2, d, match_cost, indel_cost, sub_cost, forced_match=True, max_cost=None, end_col=None):
+	codes1 = as_codes(seq1)
+	codes2 = as_codes(seq2)
+	num_rows = len(codes1)
+	num_cols = len(codes2)
+	width = 2*d + 1
+
+	ops = PackedOperations(num_rows + 1, width)
+	band_cols = np.arange(width)
+	if end_col is None:
+		end_col = num_cols
+
+	# Row 0 holds (0, j) for j = 0 .. d
+	prev = np.full(width, OUT_OF_BAND, dtype=np.int64)
+	top = min(d, num_cols)
+	prev[d:d + top + 1] = np.arange(top + 1)*indel_cost
+
+	for i in range(1, num_rows + 1):
+		first_col = max(1, i - d)
+		last_col = min(num_cols, i + d)
+		row = np.full(width, OUT_OF_BAND, dtype=np.int64)
+		if first_col > last_col:
+			prev = row
+			continue
+		first = first_col - i + d
+		last = last_col - i + d
+		cols = slice(first, last + 1)
+
+		matches = codes2[first_col - 1:last_col] == codes1[i - 1]
+		delete = np.append(prev[1:], OUT_OF_BAND)[cols] + indel_cost
+		diagonal = prev[cols] + np.where(matches, match_cost, sub_cost)
+		value = np.minimum(delete, diagonal)
+		if forced_match:
+			value = np.where(matches, diagonal, value)
+
+		# The (i, 0) cell of the first d rows seeds the insert chain, and a forced
+		# match starts a new one
+		starts = matches.copy() if forced_match else np.zeros(len(matches), dtype=bool)
+		if i <= d:
+			value = np.append(i*indel_cost, value)
+			starts = np.append(True, starts)
+			first -= 1
+		else:
+			starts[0] = True
+
+		# Inserts run left to right until the next chain starts, so each chain is a
+		# running minimum of value[l] + (j - l)*indel_cost
+		steps = np.arange(len(value))*indel_cost
+		segment = np.cumsum(starts)*SEGMENT_OFFSET
+		value = np.minimum.accumulate(value - steps - segment) + steps + segment
+		row[first:last + 1] = value
+
+		if i <= d:
+			value = value[1:]
+		insert = row[first:last]
+		if i > d:
+			insert = np.append(OUT_OF_BAND, insert)
+		insert = insert + indel_cost
+
+		# ties are broken delete, then insert, then the diagonal
+		op = np.where(value == insert, INSERT, np.where(matches, MATCH, SUB))
+		op = np.where(value == delete, DELETE, op)
+		if forced_match:
+			op = np.where(matches, MATCH, op)
+		ops.put_row(i, cols.start, op)
+
+		if max_cost is not None and i % CHECK_INTERVAL == 0:
+			# band column k holds column i - d + k; the ones right of end_col cannot reach it
+			reachable = min(width, end_col - i + d + 1)
+			if reachable <= 0 or exceeds_max_cost(row[:reachable], num_rows - i, end_col - i + d - band_cols[:reachable],
+												   match_cost, indel_cost, max_cost):
+				return None, None
+
+		prev = row
+
+	return prev, ops
+
+
+# Walk a band filled by fill_band back from (num_rows, num_cols), stepping along
+# the first row and column once the path reaches them.  Returns the Operation
+# codes of the path from (0, 0).
+def trace_band_path(band, d, num_rows, num_cols):
+	path = []
+	i = num_rows
+	j = num_cols
+	while i > 0 or j > 0:
+		if i == 0:
+			operation = INSERT
+		elif j == 0:
+			operation = DELETE
+		else:
+			operation = band.get(i, j - i + d)
+		path.append(operation)
+		if operation == DELETE:
+			i -= 1
+		elif operation == INSERT:
+			j -= 1
+		else:
+			i -= 1
+			j -= 1
+	path.reverse()
+	return path
+
+
+# Number of cells fill_band computes for an n x m table
+def band_cells(num_rows, num_cols, d):
+	rows = np.arange(1, num_rows + 1)
+	first_cols = np.maximum(1, rows - d)
+	last_cols = np.minimum(num_cols, rows + d)
+	return int(np.maximum(0, last_cols - first_cols + 1).sum())
+
+
+# Smallest cost any alignment of an n x m table (n <= m) can have if its path leaves
+# the band of half width d.  Such a path needs at least d + 1 inserts or deletes on
+# one side, every delete forces an extra insert, and at best the rest are matches.
+# Assumes match_cost <= sub_cost.
+def outside_band_bound(num_rows, num_cols, d, match_cost, indel_cost):
+	skew = num_cols - num_rows
+	deletes = max(0, d + 1 - skew)
+	return match_cost*(num_rows - deletes) + indel_cost*(2*deletes + skew)
+
+
+# Ukkonen style banded alignment that is still exact.  Start with a band of half
+# width _d_ (at least wide enough to reach the corner), and double it until the
+# best path inside the band is no worse than outside_band_bound, which proves no
+# path outside it can do better.  Returns the score, the Operation codes of the
+# path and the final half width.  The cells of every attempt are counted on _probe_.
+# With _max_bytes_ a band whose back pointers would need more raises MemoryError
+# instead of being filled.
+def adaptive_band(seq1, seq2, d, match_cost, indel_cost, sub_cost, probe=NULL_PROBE, max_bytes=None):
+	codes1 = as_codes(seq1)
+	codes2 = as_codes(seq2)
+	num_rows = len(codes1)
+	num_cols = len(codes2)
+	if num_rows > num_cols:
+		raise ValueError('adaptive_band expects the shorter sequence first')
+
+	d = min(max(d, num_cols - num_rows, 1), max(num_cols, 1))
+	while True:
+		if max_bytes is not None and (num_rows + 1)*((2*d + 4)//4) > max_bytes:
+			raise MemoryError('a band of half width {} over {} rows needs more than {:,} bytes'.format(
+				d, num_rows, max_bytes))
+		last_row, band = fill_band(codes1, codes2, d, match_cost, indel_cost, sub_cost, forced_match=False)
+		probe.count_cells(band_cells(num_rows, num_cols, d))
+		score = int(last_row[num_cols - num_rows + d])
+		# once the band covers the whole table there is nothing outside it
+		if d >= num_cols or score <= outside_band_bound(num_rows, num_cols, d, match_cost, indel_cost):
+			return score, trace_band_path(band, d, num_rows, num_cols), d
+		d = min(2*d, num_cols)
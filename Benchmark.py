@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+# Headless benchmark of the alignment engines on pairs from genomes.txt.
+#
+#   python3 Benchmark.py --lengths 100,300,1000 --output bench.json
+#   python3 Benchmark.py --lengths 100,300,1000 --compare bench.json
+#
+# Every (mode, align_length, pair) is timed with wall clock and then run again
+# under tracemalloc for its peak memory.  Results are written as JSON so a later
+# run can be compared against them with --compare.
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from GeneSequencing import ENGINES, SCORE_ONLY_ENGINES, GeneSequencing, MAXINDELS
+from SequenceStore import load_sequences
+
+# every engine that gives an alignment, so new engines are benchmarked too
+DEFAULT_ENGINES = [engine for engine in ENGINES if engine not in SCORE_ONLY_ENGINES]
+DEFAULT_LENGTHS = [100, 300, 1000]
+# two closely related genomes, two distant ones, and a test string against a genome
+DEFAULT_PAIRS = [(2, 3), (2, 7), (0, 2)]
+
+
+# The modes to run: banded (where the engine does not matter) and each full engine
+def benchmark_modes(engines, banded, unbanded):
+	modes = []
+	if banded:
+		modes.append((True, None))
+	if unbanded:
+		modes.extend((False, engine) for engine in engines)
+	return modes
+
+
+# Table cells an alignment of this pair covers, used for cells per second
+def cell_count(seq1, seq2, banded, align_length):
+	num_rows = min(len(seq1), len(seq2), align_length)
+	num_cols = min(max(len(seq1), len(seq2)), align_length)
+	if banded:
+		return num_rows*(2*MAXINDELS + 1)
+	return num_rows*num_cols
+
+
+def run_once(solver, seq1, seq2, banded, align_length, engine):
+	if banded:
+		return solver.align(seq1, seq2, banded=True, align_length=align_length)
+	return solver.align(seq1, seq2, banded=False, align_length=align_length, engine=engine)
+
+
+def benchmark(sequences, pairs, lengths, modes, repeat):
+	solver = GeneSequencing()
+	runs = []
+	for banded, engine in modes:
+		for align_length in lengths:
+			for i, j in pairs:
+				seq1 = sequences[i]
+				seq2 = sequences[j]
+
+				times = []
+				for attempt in range(repeat):
+					start = time.perf_counter()
+					result = run_once(solver, seq1, seq2, banded, align_length, engine)
+					times.append(time.perf_counter() - start)
+
+				tracemalloc.start()
+				run_once(solver, seq1, seq2, banded, align_length, engine)
+				peak = tracemalloc.get_traced_memory()[1]
+				tracemalloc.stop()
+
+				seconds = min(times)
+				cells = cell_count(seq1, seq2, banded, align_length)
+				run = {
+					'mode': 'banded' if banded else engine,
+					'align_length': align_length,
+					'pair': [i, j],
+					'seconds': seconds,
+					'cells': cells,
+					'cells_per_second': cells/seconds if seconds > 0 else None,
+					'peak_bytes': peak,
+					'align_cost': result['align_cost'],
+				}
+				runs.append(run)
+				print('{:>12} L={:<6} pair={},{}  {:9.4f}s  {:12.0f} cells/s  {:10.1f} KiB peak'.format(
+					run['mode'], align_length, i, j, seconds, run['cells_per_second'] or 0, peak/1024),
+					file=sys.stderr)
+	return runs
+
+
+def run_key(run):
+	return run['mode'], run['align_length'], tuple(run['pair'])
+
+
+# Print the speed and memory of each run relative to the same run in _previous_
+def compare(runs, previous):
+	earlier = {run_key(run): run for run in previous['runs']}
+	print('{:>12} {:>7} {:>6}  {:>9} {:>9} {:>8}  {:>8}  cost'.format(
+		'mode', 'length', 'pair', 'before s', 'after s', 'speedup', 'memory'))
+	for run in runs:
+		before = earlier.get(run_key(run))
+		if before is None:
+			continue
+		speedup = before['seconds']/run['seconds'] if run['seconds'] > 0 else float('inf')
+		memory = run['peak_bytes']/before['peak_bytes'] if before['peak_bytes'] > 0 else float('inf')
+		cost = 'same' if before['align_cost'] == run['align_cost'] else 'CHANGED {} -> {}'.format(
+			before['align_cost'], run['align_cost'])
+		print('{:>12} {:>7} {:>6}  {:9.4f} {:9.4f} {:7.2f}x  {:7.2f}x  {}'.format(
+			run['mode'], run['align_length'], '{},{}'.format(*run['pair']),
+			before['seconds'], run['seconds'], speedup, memory, cost))
+
+
+def parse_pairs(text):
+	pairs = []
+	for pair in text.split(','):
+		i, j = pair.split('-')
+		pairs.append((int(i), int(j)))
+	return pairs
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Benchmark the alignment engines on pairs from a sequence file.')
+	parser.add_argument('--file', default='genomes.txt', help='genomes.txt style or FASTA file')
+	parser.add_argument('--lengths', default=','.join(str(length) for length in DEFAULT_LENGTHS),
+						help='comma separated align_length values')
+	parser.add_argument('--engines', default=','.join(DEFAULT_ENGINES), help='comma separated full alignment engines')
+	parser.add_argument('--pairs', default=','.join('{}-{}'.format(i, j) for i, j in DEFAULT_PAIRS),
+						help='comma separated sequence index pairs, e.g. 2-3,2-7')
+	parser.add_argument('--no-banded', action='store_true', help='skip the banded mode')
+	parser.add_argument('--no-unbanded', action='store_true', help='skip the full alignment engines')
+	parser.add_argument('--repeat', type=int, default=1, help='time each run this many times and keep the best')
+	parser.add_argument('--output', help='write the results as JSON to this file')
+	parser.add_argument('--compare', help='JSON file from an earlier run to compare against')
+	args = parser.parse_args(argv)
+
+	# unpack up front so the packed store does not show up in the timings
+	sequences = [str(seq) for seq in load_sequences(args.file)]
+	lengths = [int(length) for length in args.lengths.split(',')]
+	modes = benchmark_modes(args.engines.split(','), not args.no_banded, not args.no_unbanded)
+	runs = benchmark(sequences, parse_pairs(args.pairs), lengths, modes, args.repeat)
+
+	report = {
+		'environment': {
+			'python': platform.python_version(),
+			'numpy': np.__version__,
+			'machine': platform.machine(),
+			'processor': platform.processor(),
+		},
+		'file': args.file,
+		'runs': runs,
+	}
+	if args.output:
+		with open(args.output, 'w') as file:
+			json.dump(report, file, indent=1)
+	if args.compare:
+		with open(args.compare) as file:
+			compare(runs, json.load(file))
+	elif not args.output:
+		json.dump(report, sys.stdout, indent=1)
+		print()
+
+
+if __name__ == '__main__':
+	main()
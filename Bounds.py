@@ -0,0 +1,22 @@
+import numpy as np
+
+# The fills test the bound once every this many rows (columns, diagonals); each
+# test costs about as much as filling a row
+CHECK_INTERVAL = 32
+
+
+# Smallest cost of any path from a cell to the end cell when _rows_left_ rows and
+# _cols_left_ columns remain (arrays or numbers).  At best every step that can be
+# diagonal is a match and the difference is made up with inserts or deletes.
+# Assumes match_cost <= sub_cost and match_cost <= indel_cost.
+def remaining_cost_bound(rows_left, cols_left, match_cost, indel_cost):
+	diagonal = np.minimum(rows_left, cols_left)
+	return diagonal*match_cost + (rows_left + cols_left - 2*diagonal)*indel_cost
+
+
+# True when no path through the cells with _scores_ can end at a cost of at most
+# _max_cost_, so the rest of the table need not be filled.  The cells must be
+# ones every path to the end cell passes through (a row, a column, or two
+# neighbouring anti-diagonals).
+def exceeds_max_cost(scores, rows_left, cols_left, match_cost, indel_cost, max_cost):
+	return (scores + remaining_cost_bound(rows_left, cols_left, match_cost, indel_cost)).min() > max_cost
@@ -0,0 +1,165 @@
+import os
+
+import numpy as np
+
+from AlignmentCache import DEFAULT_PATH
+from Hirschberg import next_row
+from SequenceCodes import as_codes
+
+# Blocks are BLOCK x BLOCK cells.  The table has an entry for every equality
+# pattern (2**(BLOCK*BLOCK)) and every input boundary, which is only affordable for 2
+BLOCK = 2
+# Every difference between neighbouring cells is stored in 4 bits
+FIELD_BITS = 4
+# Characters are numbered in 4 bits too, for the equality pattern lookup
+MAX_SYMBOLS = 16
+# Where the block tables are kept between runs
+TABLE_DIRECTORY = os.path.dirname(DEFAULT_PATH)
+
+
+# The range of the difference between two neighbouring cells of a row or column:
+# moving one cell on can gain at most a match over an indel and lose at most an indel
+def difference_range(match_cost, indel_cost):
+	return match_cost - indel_cost, indel_cost
+
+
+# The block table: for every key (equality pattern << 16 | top << 8 | left) the
+# block's bottom and right boundaries (bottom << 8 | right), laid out so that they
+# are the top and left of the blocks below and to the right.  A boundary is two
+# differences of 4 bits each, stored less the smallest difference: top and bottom
+# are the differences along a row (cell j minus cell j - 1), left and right along a
+# column (cell i minus cell i - 1).  Bit 2*a + b of the pattern is set when
+# character a of the block's piece of seq1 equals character b of seq2's.
+def build_block_table(match_cost, indel_cost, sub_cost):
+	low, high = difference_range(match_cost, indel_cost)
+	if high - low >= 1 << FIELD_BITS:
+		raise ValueError('differences from {} to {} do not fit in {} bits'.format(low, high, FIELD_BITS))
+
+	keys = np.arange(1 << 20, dtype=np.uint32)
+	field = lambda shift: ((keys >> shift) & 15).astype(np.int64) + low
+	pattern = keys >> 16
+	cost = lambda bit: np.where(pattern & (1 << bit), match_cost, sub_cost)
+	h1, h2, v1, v2 = field(8), field(12), field(0), field(4)
+
+	# the block's own table, with its top left cell at 0
+	d01 = h1
+	d02 = h1 + h2
+	d10 = v1
+	d20 = v1 + v2
+	d11 = np.minimum(np.minimum(cost(0), d01 + indel_cost), d10 + indel_cost)
+	d12 = np.minimum(np.minimum(d01 + cost(1), d02 + indel_cost), d11 + indel_cost)
+	d21 = np.minimum(np.minimum(d10 + cost(2), d11 + indel_cost), d20 + indel_cost)
+	d22 = np.minimum(np.minimum(d11 + cost(3), d12 + indel_cost), d21 + indel_cost)
+
+	pack = lambda first, second: (np.clip(first - low, 0, 15) | np.clip(second - low, 0, 15) << 4).astype(np.uint16)
+	return pack(d21 - d20, d22 - d21) << 8 | pack(d12 - d02, d22 - d12)
+
+
+# Equality patterns (shifted into place for the block table's keys) of every two
+# characters of seq1 against every two of seq2, indexed by first1 << 12 | second1 << 8
+# | first2 << 4 | second2, for sequences of at most 16 distinct characters
+def pattern_table():
+	pairs = np.arange(1 << 16, dtype=np.uint32)
+	a0, a1, b0, b1 = pairs >> 12, (pairs >> 8) & 15, (pairs >> 4) & 15, pairs & 15
+	pattern = (a0 == b0).astype(np.uint32) | (a0 == b1) << 1 | (a1 == b0) << 2 | (a1 == b1) << 3
+	return pattern << 16
+
+
+# The block table for the costs, built once and then read from TABLE_DIRECTORY
+def block_table(match_cost, indel_cost, sub_cost, directory=None):
+	if directory is None:
+		directory = TABLE_DIRECTORY
+	path = os.path.join(directory, 'four-russians-{}x{}-{}_{}_{}.npy'.format(BLOCK, BLOCK, match_cost, indel_cost,
+																			 sub_cost))
+	try:
+		table = np.load(path)
+		if table.shape == (1 << 20,) and table.dtype == np.uint16:
+			return table
+	except (OSError, ValueError):
+		pass
+	table = build_block_table(match_cost, indel_cost, sub_cost)
+	try:
+		os.makedirs(directory, exist_ok=True)
+		temporary = '{}.{}.tmp.npy'.format(path, os.getpid())
+		np.save(temporary, table)
+		os.replace(temporary, path)
+	except OSError:
+		# an unwritable cache only costs rebuilding the table next time
+		pass
+	return table
+
+
+# One more row of the table below _row_ for the character _char_ against _codes_
+def last_row(row, char, codes, first, match_cost, indel_cost, sub_cost):
+	steps = np.arange(len(row), dtype=np.int64)*indel_cost
+	return next_row(row, np.where(codes == char, match_cost, sub_cost), first, indel_cost, steps)
+
+
+# The cost of aligning _seq1_ with _seq2_ with the Method of Four Russians.  The
+# table is cut into 2 x 2 blocks, and a block's bottom row and right column follow
+# from its equality pattern and the differences along its top row and left column,
+# so a whole block is one lookup in the precomputed block table.  Only the
+# differences along the current block boundaries are kept, and the blocks of one
+# block anti-diagonal are looked up together.  An odd last row or column is
+# finished with a plain row scan.  Returns the score only.
+def four_russians_score(seq1, seq2, match_cost, indel_cost, sub_cost, table=None):
+	codes1 = as_codes(seq1)
+	codes2 = as_codes(seq2)
+	num_rows = len(codes1)
+	num_cols = len(codes2)
+	if table is None:
+		table = block_table(match_cost, indel_cost, sub_cost)
+	low, high = difference_range(match_cost, indel_cost)
+	block_rows = num_rows//BLOCK
+	block_cols = num_cols//BLOCK
+
+	# the first row and column are all indels
+	border = (indel_cost - low)*0x11
+	tops = np.full(block_cols, border << 8, dtype=np.uint32)
+	lefts = np.full(block_rows, border, dtype=np.uint32)
+
+	# each block's two characters of each sequence as one number, so that its
+	# equality pattern is a single lookup
+	symbols, ids = np.unique(np.concatenate([codes1, codes2]), return_inverse=True)
+	if len(symbols) > MAX_SYMBOLS:
+		raise ValueError('the Four Russians engine takes at most {} distinct characters, not {}'
+						 .format(MAX_SYMBOLS, len(symbols)))
+	ids = ids.astype(np.uint32)
+	ids1 = ids[:num_rows]
+	ids2 = ids[num_rows:]
+	pairs1 = ids1[0:2*block_rows:2] << 12 | ids1[1:2*block_rows:2] << 8
+	pairs2 = ids2[0:2*block_cols:2] << 4 | ids2[1:2*block_cols:2]
+	patterns = pattern_table()
+
+	for diagonal in range(block_rows + block_cols - 1):
+		lo = max(0, diagonal - block_cols + 1)
+		hi = min(block_rows - 1, diagonal)
+		rows = slice(lo, hi + 1)
+		# block columns diagonal - hi .. diagonal - lo, reversed to line up with the rows
+		cols = slice(diagonal - lo, diagonal - hi - 1 if diagonal - hi > 0 else None, -1)
+
+		keys = patterns[pairs1[rows] | pairs2[cols]]
+		keys |= tops[cols]
+		keys |= lefts[rows]
+		boundaries = table[keys]
+		tops[cols] = boundaries & 0xFF00
+		lefts[rows] = boundaries & 0xFF
+
+	# undo the packing: differences along row 2*block_rows and column 2*block_cols
+	bottom = np.empty(2*block_cols, dtype=np.int64)
+	bottom[0::2] = ((tops >> 8) & 15).astype(np.int64) + low
+	bottom[1::2] = (tops >> 12).astype(np.int64) + low
+	right = np.empty(2*block_rows, dtype=np.int64)
+	right[0::2] = (lefts & 15).astype(np.int64) + low
+	right[1::2] = (lefts >> 4).astype(np.int64) + low
+	row = np.concatenate([[2*block_rows*indel_cost], 2*block_rows*indel_cost + np.cumsum(bottom)])
+	column = np.concatenate([[2*block_cols*indel_cost], 2*block_cols*indel_cost + np.cumsum(right)])
+
+	if num_cols > 2*block_cols:
+		# the last column, scanned down as a row of the transposed table
+		column = last_row(column, codes2[num_cols - 1], codes1[:2*block_rows], num_cols*indel_cost,
+						  match_cost, indel_cost, sub_cost)
+		row = np.append(row, column[-1])
+	if num_rows > 2*block_rows:
+		row = last_row(row, codes1[num_rows - 1], codes2, num_rows*indel_cost, match_cost, indel_cost, sub_cost)
+	return int(row[-1])
@@ -1,17 +1,27 @@
 #!/usr/bin/python3
-from Table import Table
-from Cell import Cell
-from which_pyqt import PYQT_VER
-if PYQT_VER == 'PYQT5':
-	from PyQt5.QtCore import QLineF, QPointF
-elif PYQT_VER == 'PYQT4':
-	from PyQt4.QtCore import QLineF, QPointF
-elif PYQT_VER == 'PYQT6':
-	from PyQt6.QtCore import QLineF, QPointF
-else:
-	raise Exception('Unsupported Version of PyQt: {}'.format(PYQT_VER))
-
+from AntiDiagonal import fill_antidiagonal
+from BandFill import adaptive_band, band_cells, fill_band
+from Bounds import CHECK_INTERVAL, exceeds_max_cost
+from Anchored import anchored_alignment
+from Hirschberg import corner_scores, hirschberg, last_row_scores
+from Wavefront import wavefront_alignment
+from FourRussians import block_table, four_russians_score
+from ParallelFill import fill_parallel
+from Lanes import lane_scores
+from Operations import Operation
+from Alignment import Alignment, push_run
+from AlignmentCache import restored_result
+from SequenceCodes import as_codes, as_text
+from Instrumentation import Instrumentation, NULL_PROBE
+from PackedOperations import PackedOperations
+from Planner import check_budget, default_memory_budget, plan_alignment
+
+# The alignment code does not depend on PyQt, so it can run headless (see AlignCLI.py)
+import math
 import random
+from array import array
+
+import numpy as np
 
 # Used to compute the bandwidth for banded version (d)
 MAXINDELS = 3
@@ -21,226 +31,505 @@ MATCH = -3
 INDEL = 5
 SUB = 1
 
+# The full alignment engines align takes (see the list above align), and those of
+# them that give the cost only
+ENGINES = ['serial', 'antidiagonal', 'parallel', 'hirschberg', 'score', 'four-russians', 'adaptive', 'anchored',
+		   'wavefront', 'auto', 'auto-score']
+SCORE_ONLY_ENGINES = ['score', 'four-russians', 'auto-score']
+
 class GeneSequencing:
 
-	def __init__( self ):
+	def __init__( self, cache=None, memory_budget=None, workers=None ):
 		self.table = None
-
-# This is the method called by the GUI.  _seq1_ and _seq2_ are two sequences to be aligned, _banded_ is a boolean that tells
+		# optional AlignmentCache consulted before every alignment
+		self.cache = cache
+		self.probe = NULL_PROBE
+		# bytes an alignment may be expected to need before it is refused (see Planner.py)
+		self.memory_budget = default_memory_budget() if memory_budget is None else memory_budget
+		# processes the 'parallel' engine fills one table with (one per CPU by default)
+		self.workers = workers
+
+# This is the method called by the GUI.  _seq1_ and _seq2_ are two sequences to be aligned (str, uint8 code arrays
+# or SequenceStore.PackedSequence), _banded_ is a boolean that tells
 # you whether you should compute a banded alignment or full alignment, and _align_length_ tells you
-# how many base pairs to use in computing the alignment
-
-	def align( self, seq1, seq2, banded, align_length):
+# how many base pairs to use in computing the alignment.  _engine_ picks how the full (unbanded) table is
+# filled:
+#   'serial'       the cell by cell loop
+#   'antidiagonal' whole anti-diagonals at a time with NumPy
+#   'parallel'     the same table as 'antidiagonal', cut into tiles that are filled on the workers' processes,
+#                  each as soon as the tiles above and to its left are done; the result is identical
+#   'hirschberg'   divide and conquer with memory linear in the sequence lengths (for whole genomes)
+#   'score'        two rows and no back pointers, returning only the cost (the alignment strings are None)
+#   'four-russians' the cost only, like 'score', but the table is filled 2 x 2 cells at a time from a block
+#                  table precomputed once for the costs and kept on disk (Method of Four Russians); for
+#                  sequences of at most 16 distinct characters
+#   'adaptive'     a band that starts at MAXINDELS and doubles until it provably holds the optimal path;
+#                  the result also records the final 'band_width'
+#   'anchored'     whole genomes in near linear time: shared exact seeds are chained and taken as matches, and
+#                  only the gaps between them are aligned with the adaptive band.  The cost is optimal within
+#                  the gaps but not always overall; the result records the 'anchored_fraction' and
+#                  'filled_fraction' of the alignment columns and the number of 'anchors'
+#   'wavefront'    exact alignment that follows only the furthest point reached on each diagonal for each
+#                  penalty (WFA), in time that grows with the length times the divergence, so near identical
+#                  genomes take a fraction of a second
+#   'auto'         the fastest of 'antidiagonal', 'adaptive', 'hirschberg' and 'wavefront' expected to fit in the
+#                  memory budget, judged from the lengths and (for the band and the wavefront) a sketch of how far
+#                  apart the sequences are; the result records the 'plan' with the choice and every estimate
+#   'auto-score'   the same for when only the cost is wanted
+# An engine expected to need more than the memory budget raises MemoryError before it allocates anything.
+# With _instrument_ (True, or an Instrumentation with its own hooks) the result gets an 'instrumentation'
+# entry with the time spent in each phase, the DP cells evaluated, the band width and the peak memory.
+# Instrumented alignments always run, even if the cache has the result.
+# With _max_cost_ only costs up to max_cost matter: the banded, 'serial', 'antidiagonal' and 'score' engines stop
+# filling as soon as every remaining path must cost more, and any alignment costing more is returned with an
+# align_cost of math.inf and no strings.  The result also records the 'max_cost'.
+# _align_length_ may also be a list of lengths, to align the prefixes of each of them at once (see align_sweep).
+
+	def align( self, seq1, seq2, banded, align_length, engine='serial', instrument=False, max_cost=None,
+			   traceback_lengths=()):
+		if isinstance(align_length, (list, tuple)):
+			return self.align_sweep(seq1, seq2, banded, align_length, engine, instrument, max_cost, traceback_lengths)
+
+		use_cache = self.cache is not None and not instrument
+		if use_cache:
+			key = self.cache.key(seq1, seq2, self.result_parameters(banded, align_length, engine, max_cost))
+			result = self.cached_result(key, seq1, seq2)
+			if result is not None:
+				return result
+
+		if instrument:
+			self.probe = instrument if isinstance(instrument, Instrumentation) else Instrumentation()
+			self.probe.start()
+		try:
+			result = self.compute_alignment(seq1, seq2, banded, align_length, engine, max_cost)
+		finally:
+			probe = self.probe
+			self.probe = NULL_PROBE
+			# stopped even when the engine raised, or tracemalloc would stay on
+			report = probe.stop() if instrument else None
+		if instrument:
+			result['instrumentation'] = report
+
+		if use_cache:
+			self.cache.put(key, result)
+		return result
+
+	# Align the prefixes of every length in _align_lengths_.  Without banding the cost at length L is cell
+	# (min(n, L), min(m, L)) of the table of the longest length, so every cost comes from one score only pass
+	# over that table; only the lengths in _traceback_lengths_ are aligned again with _engine_ for their
+	# alignment.  A banded cost depends on its traceback, so each banded length is aligned on its own.
+	# Returns the result of the longest length with a 'sweep' entry: the result of every length, shortest
+	# first, each with its 'align_length'.  The result of every length is cached on its own, under the same
+	# key as aligning just that length with the 'score' engine.
+	def align_sweep( self, seq1, seq2, banded, align_lengths, engine='score', instrument=False, max_cost=None,
+					 traceback_lengths=()):
+		lengths = sorted(set(align_lengths))
+		results = {}
+		for length in lengths:
+			if banded or length in traceback_lengths:
+				results[length] = self.align(seq1, seq2, banded, length, engine, instrument, max_cost)
+
+		keys = {}
+		if self.cache is not None and not instrument:
+			for length in lengths:
+				if length not in results:
+					keys[length] = self.cache.key(seq1, seq2, self.result_parameters(False, length, 'score', max_cost))
+					cached = self.cached_result(keys[length], seq1, seq2)
+					if cached is not None:
+						results[length] = cached
+
+		missing = [length for length in lengths if length not in results]
+		if missing:
+			if instrument:
+				probe = instrument if isinstance(instrument, Instrumentation) else Instrumentation()
+				probe.start()
+			else:
+				probe = NULL_PROBE
+			try:
+				codes1, codes2 = self.shorter_longer_sequence(as_codes(seq1), as_codes(seq2))
+				corners = [(min(len(codes1), length), min(len(codes2), length)) for length in missing]
+				with probe.phase('fill'):
+					scores = corner_scores(codes1, codes2, corners, MATCH, INDEL, SUB)
+				probe.count_cells(max(i for i, j in corners)*max(j for i, j in corners))
+			finally:
+				report = probe.stop() if instrument else None
+
+			for length, score in zip(missing, scores):
+				result = {'align_cost':score, 'seqi_first100':None, 'seqj_first100':None, 'alignment':None}
+				if max_cost is not None:
+					result['max_cost'] = max_cost
+					if score > max_cost:
+						result['align_cost'] = math.inf
+				if length in keys:
+					self.cache.put(keys[length], result)
+				if report is not None:
+					# one fill for all of them
+					result['instrumentation'] = report
+				results[length] = result
+
+		sweep = [dict(results[length], align_length=length) for length in lengths]
+		result = dict(sweep[-1])
+		result['sweep'] = sweep
+		return result
+
+	# Align one _query_ against every sequence in _targets_ and return a list with the
+	# result of each, the same as calling align for every target.  Full alignments with
+	# the 'score' engine are filled for many targets at once (see Lanes.py); anything
+	# else (including sweeps over several lengths) is aligned one target at a time.
+	def align_many( self, query, targets, banded, align_length, engine='score'):
+		if banded or engine != 'score' or isinstance(align_length, (list, tuple)):
+			return [self.align(query, target, banded, align_length, engine) for target in targets]
+
+		results = [None]*len(targets)
+		if self.cache is not None:
+			parameters = self.result_parameters(banded, align_length, engine)
+			keys = [self.cache.key(query, target, parameters) for target in targets]
+			results = [self.cached_result(key, query, target) for key, target in zip(keys, targets)]
+		missing = [index for index, result in enumerate(results) if result is None]
+		if missing:
+			# the cost does not depend on which sequence comes first, so the query need not be swapped
+			scores = lane_scores(as_codes(query)[:align_length],
+								 [as_codes(targets[index])[:align_length] for index in missing], MATCH, INDEL, SUB)
+			for index, score in zip(missing, scores):
+				results[index] = {'align_cost':int(score), 'seqi_first100':None, 'seqj_first100':None,
+								  'alignment':None}
+				if self.cache is not None:
+					self.cache.put(keys[index], results[index])
+		return results
+
+	# The cached result for _key_ (made from _seq1_ and _seq2_), or None.  The stored
+	# CIGAR string is turned back into an Alignment, so a hit looks like a miss.
+	def cached_result(self, key, seq1, seq2):
+		stored = self.cache.get(key)
+		if stored is None:
+			return None
+		seq1, seq2 = self.shorter_longer_sequence(as_text(seq1), as_text(seq2))
+		return restored_result(stored, seq1, seq2)
+
+	# Everything besides the two sequences that an alignment result depends on
+	def result_parameters(self, banded, align_length, engine, max_cost=None, traceback_lengths=()):
+		parameters = {
+			'banded': banded,
+			'band_width': 2*MAXINDELS + 1 if banded else None,
+			'scoring': [MATCH, INDEL, SUB],
+			'align_length': align_length,
+			# the engine only matters for full alignments
+			'engine': None if banded else engine,
+		}
+		# results without a threshold keep the keys they were cached under
+		if max_cost is not None:
+			parameters['max_cost'] = max_cost
+		if traceback_lengths:
+			parameters['traceback_lengths'] = sorted(traceback_lengths)
+		return parameters
+
+	def compute_alignment(self, seq1, seq2, banded, align_length, engine, max_cost=None):
 		self.banded = banded
 		self.MaxCharactersToAlign = align_length
-		self.d = 3
+		self.max_cost = max_cost
+		self.d = MAXINDELS
 		self.table = None
 		self.k = self.d*2 + 1
+		# anything an engine reports beyond the cost and strings goes into the result
+		self.details = {}
+
+		# the aligned strings are built from text, so encoded sequences are decoded once here
+		seq1 = as_text(seq1)
+		seq2 = as_text(seq2)
 
 		# make the shorter one sequence 1 and the longer one sequence 2
 		# this will make space O(nk) where n is the shorter of the sequences
 		seq1, seq2 = self.shorter_longer_sequence(seq1, seq2)
+		num_rows = min(len(seq1), align_length)
+		num_cols = min(len(seq2), align_length)
 		if banded:
-			alignment1, alignment2, score = self.align_sequences_banded(seq1, seq2)
+			check_budget('banded', num_rows, num_cols, self.d, self.memory_budget)
+		elif engine in ('auto', 'auto-score'):
+			with self.probe.phase('plan'):
+				plan = plan_alignment(seq1[:num_rows], seq2[:num_cols], self.d, engine == 'auto', self.memory_budget)
+			self.details['plan'] = plan
+			engine = plan['engine']
 		else:
-			alignment1, alignment2, score = self.align_sequences(seq1, seq2)
+			check_budget(engine, num_rows, num_cols, self.d, self.memory_budget)
 
-		# given back pointers, values, and operations from table
-		return {'align_cost':score, 'seqi_first100':alignment1, 'seqj_first100':alignment2}
+		if banded:
+			alignment, score = self.align_sequences_banded(seq1, seq2)
+		elif engine == 'serial':
+			alignment, score = self.align_sequences(seq1, seq2)
+		elif engine == 'antidiagonal':
+			alignment, score = self.align_sequences_antidiagonal(seq1, seq2)
+		elif engine == 'parallel':
+			alignment, score = self.align_sequences_parallel(seq1, seq2)
+		elif engine == 'hirschberg':
+			alignment, score = self.align_sequences_hirschberg(seq1, seq2)
+		elif engine == 'score':
+			alignment, score = self.align_sequences_score(seq1, seq2)
+		elif engine == 'four-russians':
+			alignment, score = self.align_sequences_four_russians(seq1, seq2)
+		elif engine == 'adaptive':
+			alignment, score = self.align_sequences_adaptive(seq1, seq2)
+		elif engine == 'anchored':
+			alignment, score = self.align_sequences_anchored(seq1, seq2)
+		elif engine == 'wavefront':
+			alignment, score = self.align_sequences_wavefront(seq1, seq2)
+		else:
+			raise Exception('Unsupported alignment engine: {}'.format(engine))
+		if max_cost is not None:
+			self.details['max_cost'] = max_cost
+			# engines without an early stop still give the exact cost; hide it all the same
+			if score > max_cost:
+				alignment, score = None, math.inf
+
+		# The engines return the path as runs of operations (an Alignment); only the
+		# first 100 columns are rendered as padded strings.  Any other window can be
+		# rendered later with result['alignment'].render(start, stop)
+		if alignment is None:
+			alignment1 = alignment2 = None
+		else:
+			with self.probe.phase('render'):
+				alignment1, alignment2 = alignment.render(0, 100)
+		result = {'align_cost':score, 'seqi_first100':alignment1, 'seqj_first100':alignment2,
+				  'alignment':alignment}
+		result.update(self.details)
+		return result
 
 	def align_sequences_banded(self, seq1, seq2):
 		num_rows = min(len(seq1), self.MaxCharactersToAlign)
 		num_cols = min(len(seq2), self.MaxCharactersToAlign)
 
-		# get the max and min indices as a list
-		max_indices = [min(num_cols, i + self.d + 1) for i in range(num_rows)]
-		min_indices = [max(0 + 1, i - self.d + 1) for i in range(num_rows)]
-
-		# Initialize a 2D array to store the table between each pair of characters
-		table = [[Cell() for j in range(num_cols + 1)] for i in range(num_rows + 1)]
-
-		# operations to determine back pointers
-		insert = "insert"
-		delete = "delete"
-		sub = "sub"
-		match = "match"
-
-		# Initialize the first row and column of the table array (banded)
-		table[0][0].value = 0
-		for i in range(1, self.d + 1):
-			table[i][0].value = i*INDEL
-		for j in range(1, self.d + 1):
-			table[0][j].value = j*INDEL
-
-		for i in range(1, num_rows + 1):
-			for j in range(min_indices[i-1], max_indices[i-1] + 1):
-				cell = table[i][j]
-				# check if match
-				if seq1[i - 1] == seq2[j - 1]:
-					# set value
-					cell.value = table[i - 1][j - 1].value + MATCH
-					# set back pointer
-					cell.operation = match
-				else:
-					top_edge_determiner = num_cols - num_rows
-
-					# check if j at start. If so, only do delete or sub
-					if i > self.d and j == min_indices[i-1]:
-						cell.value = min(
-							table[i - 1][j].value + INDEL,  # delete
-							table[i - 1][j - 1].value + SUB  # sub
-						)
-						if cell.value == table[i - 1][j].value + INDEL:
-							cell.operation = delete
-						else:
-							cell.operation = sub
-
-					# check if j at end
-					elif j == max_indices[i - 1]:
-
-						# if j on top edge
-						if top_edge_determiner <= self.d and i > num_rows - self.d + top_edge_determiner:
-							# set value
-							cell.value = min(
-								table[i - 1][j].value + INDEL,  # delete
-								table[i][j - 1].value + INDEL,  # insert
-								table[i - 1][j - 1].value + SUB  # sub
-							)
-
-							# set back pointer
-							if cell.value == table[i - 1][j].value + INDEL:
-								cell.operation = delete
-							elif cell.value == table[i][j - 1].value + INDEL:
-								cell.operation = insert
-							else:
-								cell.operation = sub
-
-						# if j not on top edge
-						else:
-							cell.value = min(
-								table[i][j - 1].value + INDEL,  # insert
-								table[i - 1][j - 1].value + SUB  # sub
-							)
-							if cell.value == table[i][j - 1].value + INDEL:
-								cell.operation = insert
-							else:
-								cell.operation = sub
-
-					# if j not on bottom or top edge, treat it like a normal cell
-					else:
-						# set value
-						cell.value = min(
-							table[i - 1][j].value + INDEL,  # delete
-							table[i][j - 1].value + INDEL,  # insert
-							table[i - 1][j - 1].value + SUB  # sub
-						)
+		# Fill only the 2d+1 band around the diagonal.  The band keeps the back pointer
+		# codes of cell (i, j) at band[i][j - i + d]; only the last row of scores is kept
+		# the cost is read at (num_rows, num_cols), or at (num_rows, num_rows) when that is outside the band
+		end_col = num_cols if num_cols <= num_rows + self.d else num_rows
+		with self.probe.phase('fill'):
+			last_row, band = fill_band(seq1[:num_rows], seq2[:num_cols], self.d, MATCH, INDEL, SUB,
+									   max_cost=self.max_cost, end_col=end_col)
+		self.probe.set_band_width(self.k)
+		if last_row is None:
+			return None, math.inf
+		self.probe.count_cells(band_cells(num_rows, num_cols, self.d))
 
-						# set back pointer
-						if cell.value == table[i - 1][j].value + INDEL:
-							cell.operation = delete
-						elif cell.value == table[i][j - 1].value + INDEL:
-							cell.operation = insert
-						else:
-							cell.operation = sub
-
-		alignment1 = ""
-		alignment2 = ""
-
-		# Trace back through the table array to construct the aligned strings
 		i = num_rows
 		j = num_cols
 		if j > i + self.d:
-			score = table[i][i].value
+			score = int(last_row[self.d])
 		else:
-			score = table[i][j].value
-		while i > 0 or j > 0:
-			cell = table[i][j]
-			if cell.operation == match or cell.operation == sub:
-				alignment1 = seq1[i - 1] + alignment1
-				alignment2 = seq2[j - 1] + alignment2
-				i -= 1
-				j -= 1
-			elif cell.operation == delete:
-				alignment1 = seq1[i - 1] + alignment1
-				alignment2 = "-" + alignment2
-				i -= 1
-			elif cell.operation == insert:
-				alignment1 = "-" + alignment1
-				alignment2 = seq2[j - 1] + alignment2
-				j -= 1
-			elif cell.operation == None:
-				alignment1 = "-" + alignment1
-				alignment2 = seq2[j - 1] + alignment2
-				score += INDEL
-				j -= 1
+			score = int(last_row[j - i + self.d])
 
-		return alignment1[:100], alignment2[:100], score
+		with self.probe.phase('traceback'):
+			return self.trace_band_operations(band, seq1, seq2, i, j, num_cols, score)
 
 	def align_sequences(self, seq1, seq2):
 		num_rows = min(len(seq1), self.MaxCharactersToAlign)
 		num_cols = min(len(seq2), self.MaxCharactersToAlign)
 
-		# Initialize a 2D array to store the table between each pair of characters
-		table = [[Cell() for j in range(num_cols + 1)] for i in range(num_rows + 1)]
-
-		insert = "insert"
-		delete = "delete"
-		sub = "sub"
-		match = "match"
-
-		# Initialize the first row and column of the table array
-		table[0][0].value = 0
-		for i in range(1, num_rows + 1):
-			table[i][0].value = i*INDEL
-		for j in range(1, num_cols + 1):
-			table[0][j].value = j*INDEL
-
-		# Compute the table between each pair of characters
-		for j in range(1, num_cols + 1):
-			for i in range(1, num_rows + 1):
-				cell = table[i][j]
-				# check if match
-				if seq1[i - 1] == seq2[j - 1]:
-					# set value
-					cell.value = table[i - 1][j - 1].value + MATCH
-					# set back pointer
-					cell.operation = match
-				else:
-					# set value
-					cell.value = min(table[i - 1][j].value + INDEL, table[i][j - 1].value + INDEL, table[i - 1][j - 1].value + SUB)
-					# set back pointer
-					if cell.value == table[i - 1][j].value + INDEL:
-						cell.operation = delete
-					elif cell.value == table[i][j - 1].value + INDEL:
-						cell.operation = insert
+		insert = Operation.INSERT.value
+		delete = Operation.DELETE.value
+		sub = Operation.SUB.value
+		match = Operation.MATCH.value
+
+		with self.probe.phase('allocate'):
+			# Back pointers go into a packed table of Operation codes; the scores only
+			# need the previous column, so two int32 columns are kept
+			ops = PackedOperations(num_rows + 1, num_cols + 1)
+			rows = np.arange(1, num_rows + 1)
+			column_ops = bytearray(num_rows)
+
+			# Initialize the first column of scores
+			prev = array('i', [i*INDEL for i in range(num_rows + 1)])
+			cur = array('i', prev)
+			rows_left = num_rows - np.arange(num_rows + 1)
+
+		with self.probe.phase('fill'):
+			# Compute the table between each pair of characters, a column at a time
+			for j in range(1, num_cols + 1):
+				cur[0] = j*INDEL
+				for i in range(1, num_rows + 1):
+					# check if match
+					if seq1[i - 1] == seq2[j - 1]:
+						# set value
+						cur[i] = prev[i - 1] + MATCH
+						# set back pointer
+						column_ops[i - 1] = match
 					else:
-						cell.operation = sub
+						# set value
+						value = min(cur[i - 1] + INDEL, prev[i] + INDEL, prev[i - 1] + SUB)
+						cur[i] = value
+						# set back pointer
+						if value == cur[i - 1] + INDEL:
+							column_ops[i - 1] = delete
+						elif value == prev[i] + INDEL:
+							column_ops[i - 1] = insert
+						else:
+							column_ops[i - 1] = sub
+				ops.put(rows, j, np.frombuffer(column_ops, dtype=np.uint8))
+				prev, cur = cur, prev
+				if self.max_cost is not None and j % CHECK_INTERVAL == 0 and \
+						exceeds_max_cost(np.frombuffer(prev, dtype=np.intc), rows_left, num_cols - j, MATCH, INDEL,
+										 self.max_cost):
+					self.probe.count_cells(num_rows*j)
+					return None, math.inf
+		self.probe.count_cells(num_rows*num_cols)
+
+		with self.probe.phase('traceback'):
+			return self.trace_operations(ops, seq1, seq2, num_rows, num_cols), prev[num_rows]
+
+	def align_sequences_antidiagonal(self, seq1, seq2):
+		num_rows = min(len(seq1), self.MaxCharactersToAlign)
+		num_cols = min(len(seq2), self.MaxCharactersToAlign)
 
-		# Initialize variables to store the aligned strings
-		alignment1 = ""
-		alignment2 = ""
+		# Fill the table with NumPy, keeping only the back pointer codes
+		with self.probe.phase('fill'):
+			score, ops = fill_antidiagonal(seq1[:num_rows], seq2[:num_cols], MATCH, INDEL, SUB, self.max_cost)
+		if score is None:
+			return None, math.inf
+		self.probe.count_cells(num_rows*num_cols)
 
-		# Trace back through the table array to construct the aligned strings
-		i = num_rows
-		j = num_cols
-		score = table[i][j].value
+		with self.probe.phase('traceback'):
+			return self.trace_operations(ops, seq1, seq2, num_rows, num_cols), score
+
+	def align_sequences_parallel(self, seq1, seq2):
+		num_rows = min(len(seq1), self.MaxCharactersToAlign)
+		num_cols = min(len(seq2), self.MaxCharactersToAlign)
+
+		# Fill the tiles of the table on a process pool; only the traceback is left here
+		with self.probe.phase('fill'):
+			score, ops = fill_parallel(seq1[:num_rows], seq2[:num_cols], MATCH, INDEL, SUB, self.workers)
+		self.probe.count_cells(num_rows*num_cols)
+
+		with self.probe.phase('traceback'):
+			return self.trace_operations(ops, seq1, seq2, num_rows, num_cols), score
+
+	def align_sequences_hirschberg(self, seq1, seq2):
+		num_rows = min(len(seq1), self.MaxCharactersToAlign)
+		num_cols = min(len(seq2), self.MaxCharactersToAlign)
+
+		# Recover the path without ever holding more than two rows of the table
+		with self.probe.phase('fill'):
+			score, operations = hirschberg(seq1[:num_rows], seq2[:num_cols], MATCH, INDEL, SUB, self.probe)
+
+		with self.probe.phase('traceback'):
+			return Alignment.from_operations(seq1, seq2, operations), score
+
+	def align_sequences_score(self, seq1, seq2):
+		num_rows = min(len(seq1), self.MaxCharactersToAlign)
+		num_cols = min(len(seq2), self.MaxCharactersToAlign)
+
+		# Only the cost is needed, so roll two rows and skip the traceback
+		with self.probe.phase('fill'):
+			last_row = last_row_scores(as_codes(seq1[:num_rows]), as_codes(seq2[:num_cols]), MATCH, INDEL, SUB,
+									   self.max_cost)
+		if last_row is None:
+			return None, math.inf
+		self.probe.count_cells(num_rows*num_cols)
+		return None, int(last_row[num_cols])
+
+	def align_sequences_four_russians(self, seq1, seq2):
+		num_rows = min(len(seq1), self.MaxCharactersToAlign)
+		num_cols = min(len(seq2), self.MaxCharactersToAlign)
+
+		with self.probe.phase('table'):
+			table = block_table(MATCH, INDEL, SUB)
+		with self.probe.phase('fill'):
+			score = four_russians_score(seq1[:num_rows], seq2[:num_cols], MATCH, INDEL, SUB, table)
+		self.probe.count_cells(num_rows*num_cols)
+		return None, score
+
+	def align_sequences_adaptive(self, seq1, seq2):
+		num_rows = min(len(seq1), self.MaxCharactersToAlign)
+		num_cols = min(len(seq2), self.MaxCharactersToAlign)
+
+		with self.probe.phase('fill'):
+			score, operations, d = adaptive_band(seq1[:num_rows], seq2[:num_cols], self.d, MATCH, INDEL, SUB,
+												 self.probe, self.memory_budget)
+		self.details['band_width'] = 2*d + 1
+		self.probe.set_band_width(2*d + 1)
+
+		with self.probe.phase('traceback'):
+			return Alignment.from_operations(seq1, seq2, operations), score
+
+	def align_sequences_anchored(self, seq1, seq2):
+		num_rows = min(len(seq1), self.MaxCharactersToAlign)
+		num_cols = min(len(seq2), self.MaxCharactersToAlign)
+
+		with self.probe.phase('fill'):
+			score, runs, anchored, anchors = anchored_alignment(seq1[:num_rows], seq2[:num_cols], self.d,
+																MATCH, INDEL, SUB, probe=self.probe)
+		alignment = Alignment(seq1, seq2, runs)
+		columns = max(len(alignment), 1)
+		self.details['anchors'] = anchors
+		self.details['anchored_fraction'] = anchored/columns
+		self.details['filled_fraction'] = (len(alignment) - anchored)/columns
+		return alignment, score
+
+	def align_sequences_wavefront(self, seq1, seq2):
+		num_rows = min(len(seq1), self.MaxCharactersToAlign)
+		num_cols = min(len(seq2), self.MaxCharactersToAlign)
+
+		with self.probe.phase('fill'):
+			score, runs, offsets = wavefront_alignment(seq1[:num_rows], seq2[:num_cols], MATCH, INDEL, SUB,
+													   self.memory_budget)
+		# each diagonal offset stands in for a cell of the table
+		self.probe.count_cells(offsets)
+		return Alignment(seq1, seq2, runs), score
+
+	# Walk a PackedOperations table back from (i, j).  The first row and column hold no
+	# operation and are walked as inserts, so a path reaching column 0 above row 0 wraps
+	# around to the end of the row above (as indexing a list of rows with -1 did).
+	def trace_operations(self, ops, seq1, seq2, i, j):
+		match = Operation.MATCH.value
+		sub = Operation.SUB.value
+		delete = Operation.DELETE.value
+		insert = Operation.INSERT.value
+
+		runs = []
+		while i > 0 or j > 0:
+			column = j if j >= 0 else j + ops.num_cols
+			operation = ops.get(i, column) if i > 0 and column > 0 else insert
+			if operation == match or operation == sub:
+				push_run(runs, int(operation))
+				i -= 1
+				j -= 1
+			elif operation == delete:
+				push_run(runs, delete)
+				i -= 1
+			else:
+				push_run(runs, insert)
+				j -= 1
+
+		return Alignment.from_traceback(seq1, seq2, runs, i, j)
+
+	# Walk the band back from (i, j).  Cells outside the band have no operation and are
+	# treated as inserts that add INDEL to the score, just as the full banded table did
+	def trace_band_operations(self, band, seq1, seq2, i, j, num_cols, score):
+		match = Operation.MATCH.value
+		sub = Operation.SUB.value
+		delete = Operation.DELETE.value
+		insert = Operation.INSERT.value
+
+		runs = []
 		while i > 0 or j > 0:
-			cell = table[i][j]
-			if cell.operation == match or cell.operation == sub:
-				alignment1 = seq1[i - 1] + alignment1
-				alignment2 = seq2[j - 1] + alignment2
+			# a negative column wraps around to the end of the row, like indexing a list
+			column = j if j >= 0 else j + num_cols + 1
+			k = column - i + self.d
+			filled = 0 <= k < self.k and i > 0 and 0 < column <= num_cols
+			operation = band.get(i, k) if filled else 0
+			if operation == match or operation == sub:
+				push_run(runs, int(operation))
 				i -= 1
 				j -= 1
-			elif cell.operation == delete:
-				alignment1 = seq1[i - 1] + alignment1
-				alignment2 = "-" + alignment2
+			elif operation == delete:
+				push_run(runs, delete)
 				i -= 1
+			elif operation == insert:
+				push_run(runs, insert)
+				j -= 1
 			else:
-				alignment1 = "-" + alignment1
-				alignment2 = seq2[j - 1] + alignment2
+				push_run(runs, insert)
+				score += INDEL
 				j -= 1
 
-		return alignment1[:100], alignment2[:100], score
+		return Alignment.from_traceback(seq1, seq2, runs, i, j), score
 
 	def del_cost(self, i, j, distances):
 		return distances[i-1][j]
@@ -0,0 +1,135 @@
+import numpy as np
+
+from AntiDiagonal import fill_antidiagonal
+from Bounds import CHECK_INTERVAL, exceeds_max_cost
+from Instrumentation import NULL_PROBE
+from Operations import DELETE, INSERT, MATCH, SUB
+from SequenceCodes import as_codes
+
+# Subproblems with at most this many cells are solved with a full table
+DIRECT_CELLS = 1 << 18
+
+
+# The row of the Needleman-Wunsch table below _row_, in one vectorized pass:
+# delete and sub come from the row above (_costs_ holds the match or sub cost of
+# the new row's character against every column), and the chain of inserts is a
+# running minimum of value[l] + (j - l)*indel_cost.  _first_ is the score of the
+# new row's first cell and _steps_ is arange(len(row))*indel_cost.
+def next_row(row, costs, first, indel_cost, steps):
+	value = np.minimum(row[1:] + indel_cost, row[:-1] + costs)
+	value = np.append(first, value)
+	return np.minimum.accumulate(value - steps) + steps
+
+
+# Score the last row of the Needleman-Wunsch table using two rows of memory, a
+# next_row at a time.  With _max_cost_ the fill stops, returning None, as soon as no path through the
+# current row can reach the last cell at a cost of at most _max_cost_.
+def last_row_scores(codes1, codes2, match_cost, indel_cost, sub_cost, max_cost=None):
+	steps = np.arange(len(codes2) + 1, dtype=np.int64)*indel_cost
+	cols_left = len(codes2) - np.arange(len(codes2) + 1)
+	row = steps.copy()
+	char_costs = {}
+	for i in range(len(codes1)):
+		if max_cost is not None and i % CHECK_INTERVAL == 0 and \
+				exceeds_max_cost(row, len(codes1) - i, cols_left, match_cost, indel_cost, max_cost):
+			return None
+		char = codes1[i]
+		if char not in char_costs:
+			char_costs[char] = np.where(codes2 == char, match_cost, sub_cost)
+		row = next_row(row, char_costs[char], (i + 1)*indel_cost, indel_cost, steps)
+	return row
+
+
+# The scores of the cells (i, j) listed in _corners_, from a single pass of
+# next_rows over as many rows and columns as the furthest corner needs.
+# The cost of aligning every pair of prefixes codes1[:i], codes2[:j] is cell (i, j).
+def corner_scores(codes1, codes2, corners, match_cost, indel_cost, sub_cost):
+	num_rows = max(i for i, j in corners)
+	num_cols = max(j for i, j in corners)
+	codes2 = codes2[:num_cols]
+	wanted = {}
+	for index, (i, j) in enumerate(corners):
+		wanted.setdefault(i, []).append((index, j))
+
+	scores = [None]*len(corners)
+	steps = np.arange(num_cols + 1, dtype=np.int64)*indel_cost
+	row = steps.copy()
+	char_costs = {}
+	for i in range(num_rows + 1):
+		if i > 0:
+			char = codes1[i - 1]
+			if char not in char_costs:
+				char_costs[char] = np.where(codes2 == char, match_cost, sub_cost)
+			row = next_row(row, char_costs[char], i*indel_cost, indel_cost, steps)
+		for index, j in wanted.get(i, []):
+			scores[index] = int(row[j])
+	return scores
+
+
+# Find an optimal alignment with memory linear in the sequence lengths.  The
+# first sequence is split in half, the column where an optimal path crosses the
+# middle row is found from a forward and a backward pass of last_row_scores, and
+# both halves are solved the same way.  Returns the score and the Operation codes
+# of the path from (0, 0) to (n, m).  Every cell scored is counted on _probe_.
+def hirschberg(seq1, seq2, match_cost, indel_cost, sub_cost, probe=NULL_PROBE):
+	operations = []
+	split_alignment(as_codes(seq1), as_codes(seq2), operations, match_cost, indel_cost, sub_cost, probe)
+
+	score = 0
+	for operation in operations:
+		if operation == MATCH:
+			score += match_cost
+		elif operation == SUB:
+			score += sub_cost
+		else:
+			score += indel_cost
+	return score, operations
+
+
+def split_alignment(codes1, codes2, operations, match_cost, indel_cost, sub_cost, probe):
+	num_rows = len(codes1)
+	num_cols = len(codes2)
+	if num_rows == 0:
+		operations.extend([INSERT]*num_cols)
+		return
+	if num_cols == 0:
+		operations.extend([DELETE]*num_rows)
+		return
+	if num_rows == 1 or (num_rows + 1)*(num_cols + 1) <= DIRECT_CELLS:
+		operations.extend(direct_alignment(codes1, codes2, match_cost, indel_cost, sub_cost))
+		probe.count_cells(num_rows*num_cols)
+		return
+
+	mid = num_rows // 2
+	forward = last_row_scores(codes1[:mid], codes2, match_cost, indel_cost, sub_cost)
+	backward = last_row_scores(codes1[mid:][::-1], codes2[::-1], match_cost, indel_cost, sub_cost)
+	split = int(np.argmin(forward + backward[::-1]))
+	probe.count_cells(num_rows*num_cols)
+
+	split_alignment(codes1[:mid], codes2[:split], operations, match_cost, indel_cost, sub_cost, probe)
+	split_alignment(codes1[mid:], codes2[split:], operations, match_cost, indel_cost, sub_cost, probe)
+
+
+# Solve a small subproblem with a full table of back pointers
+def direct_alignment(codes1, codes2, match_cost, indel_cost, sub_cost):
+	score, ops = fill_antidiagonal(codes1, codes2, match_cost, indel_cost, sub_cost)
+	path = []
+	i = len(codes1)
+	j = len(codes2)
+	while i > 0 or j > 0:
+		if i == 0:
+			operation = INSERT
+		elif j == 0:
+			operation = DELETE
+		else:
+			operation = ops.get(i, j)
+		path.append(operation)
+		if operation == DELETE:
+			i -= 1
+		elif operation == INSERT:
+			j -= 1
+		else:
+			i -= 1
+			j -= 1
+	path.reverse()
+	return path
@@ -0,0 +1,109 @@
+import cProfile
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+
+
+# The probe used when an alignment is not instrumented: phases cost nothing
+class NullProbe:
+
+	@contextmanager
+	def phase(self, name):
+		yield
+
+	def count_cells(self, cells):
+		pass
+
+	def set_band_width(self, band_width):
+		pass
+
+
+NULL_PROBE = NullProbe()
+
+
+# Opt-in measurements for one alignment at a time.  The engines wrap their
+# 'allocate', 'fill' and 'traceback' phases in phase(); each phase is timed and
+# wrapped in every hook, where a hook is any callable taking the phase name and
+# returning a context manager (see ProfileHook).  With _memory_ the peak traced
+# memory of the whole alignment is recorded too, which slows allocation heavy
+# engines down noticeably.
+class Instrumentation(NullProbe):
+
+	def __init__(self, memory=True, hooks=()):
+		self.memory = memory
+		self.hooks = list(hooks)
+		self.report = {}
+		self.started_tracing = False
+
+	def start(self):
+		self.report = {'timings': {}, 'cells': 0, 'band_width': None, 'peak_bytes': None}
+		if self.memory:
+			self.started_tracing = not tracemalloc.is_tracing()
+			if self.started_tracing:
+				tracemalloc.start()
+			tracemalloc.reset_peak()
+		self.start_time = time.perf_counter()
+
+	# Finish the alignment and return what was measured
+	def stop(self):
+		self.report['total'] = time.perf_counter() - self.start_time
+		if self.memory:
+			self.report['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+			if self.started_tracing:
+				tracemalloc.stop()
+		return self.report
+
+	@contextmanager
+	def phase(self, name):
+		with ExitStack() as stack:
+			for hook in self.hooks:
+				stack.enter_context(hook(name))
+			start = time.perf_counter()
+			try:
+				yield
+			finally:
+				timings = self.report['timings']
+				timings[name] = timings.get(name, 0) + time.perf_counter() - start
+
+	def count_cells(self, cells):
+		self.report['cells'] += int(cells)
+
+	def set_band_width(self, band_width):
+		self.report['band_width'] = band_width
+
+
+# A hook that runs cProfile during the chosen phases (all of them by default),
+# accumulating into one profile across alignments
+class ProfileHook:
+
+	def __init__(self, phases=None):
+		self.phases = phases
+		self.profile = cProfile.Profile()
+
+	@contextmanager
+	def __call__(self, name):
+		if self.phases is not None and name not in self.phases:
+			yield
+			return
+		self.profile.enable()
+		try:
+			yield
+		finally:
+			self.profile.disable()
+
+	def print_stats(self, sort='cumulative'):
+		self.profile.print_stats(sort)
+
+
+# Add up the instrumentation of many results, e.g. for a whole matrix
+def total_instrumentation(reports):
+	totals = {'timings': {}, 'cells': 0, 'total': 0, 'peak_bytes': None, 'alignments': 0}
+	for report in reports:
+		totals['alignments'] += 1
+		totals['cells'] += report['cells']
+		totals['total'] += report['total']
+		for name, seconds in report['timings'].items():
+			totals['timings'][name] = totals['timings'].get(name, 0) + seconds
+		if report['peak_bytes'] is not None:
+			totals['peak_bytes'] = max(totals['peak_bytes'] or 0, report['peak_bytes'])
+	return totals
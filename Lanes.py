@@ -0,0 +1,62 @@
+import numpy as np
+
+from SequenceCodes import as_codes
+
+# Upper bound on the score rows of one batch of lanes (a few temporaries of the
+# same size are alive while a row is computed)
+LANE_BYTES = 16*1024*1024
+
+
+# Score one query against many targets at once.  Every target is a lane (a row
+# of a 2D array, padded to the longest target) and the query is walked row by
+# row as in Hirschberg.last_row_scores, so each NumPy operation advances all the
+# lanes.  The query profile, the match/sub cost of each query character against
+# every lane, is computed once per distinct character.  Returns the cost of
+# aligning the query with each target.
+def lane_scores(query, targets, match_cost, indel_cost, sub_cost, max_bytes=LANE_BYTES):
+	codes = as_codes(query)
+	target_codes = [as_codes(target) for target in targets]
+	scores = np.zeros(len(target_codes), dtype=np.int64)
+
+	# similar lengths share a batch, so little of each lane is padding
+	order = sorted(range(len(target_codes)), key=lambda index: len(target_codes[index]))
+	start = 0
+	while start < len(order):
+		stop = start + 1
+		while stop < len(order) and (stop - start + 1)*(len(target_codes[order[stop]]) + 1)*4 <= max_bytes:
+			stop += 1
+		batch = order[start:stop]
+		scores[batch] = fill_lanes(codes, [target_codes[index] for index in batch], match_cost, indel_cost, sub_cost)
+		start = stop
+	return scores
+
+
+def fill_lanes(codes, lanes, match_cost, indel_cost, sub_cost):
+	lengths = np.array([len(lane) for lane in lanes])
+	width = int(lengths.max())
+	targets = np.zeros((len(lanes), width), dtype=np.uint8)
+	for lane, lane_codes in enumerate(lanes):
+		targets[lane, :len(lane_codes)] = lane_codes
+
+	# int32 halves the memory traffic whenever no score can overflow it
+	largest = (len(codes) + width + 1)*max(abs(match_cost), abs(indel_cost), abs(sub_cost))
+	dtype = np.int32 if 2*largest < np.iinfo(np.int32).max else np.int64
+
+	# padding past the end of a lane never feeds back into the columns before it
+	steps = np.arange(width + 1, dtype=dtype)*indel_cost
+	row = np.tile(steps, (len(lanes), 1))
+	value = np.empty_like(row)
+	diagonal = np.empty_like(row[:, 1:])
+	profile = {}
+	for i in range(len(codes)):
+		char = codes[i]
+		if char not in profile:
+			profile[char] = np.where(targets == char, match_cost, sub_cost).astype(dtype)
+		value[:, 0] = (i + 1)*indel_cost
+		np.add(row[:, 1:], indel_cost, out=value[:, 1:])
+		np.add(row[:, :-1], profile[char], out=diagonal)
+		np.minimum(value[:, 1:], diagonal, out=value[:, 1:])
+		np.subtract(value, steps, out=value)
+		np.minimum.accumulate(value, axis=1, out=row)
+		np.add(row, steps, out=row)
+	return row[np.arange(len(lanes)), lengths]
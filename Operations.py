@@ -7,3 +7,10 @@ class Operation(Enum):
     SUB = 3
     MATCH = 4
     NULL = 5
+
+
+# The values as plain ints, for the back pointer tables and runs of operations
+DELETE = Operation.DELETE.value
+INSERT = Operation.INSERT.value
+SUB = Operation.SUB.value
+MATCH = Operation.MATCH.value
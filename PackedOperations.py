@@ -0,0 +1,69 @@
+import tempfile
+
+import numpy as np
+
+
+# Tables larger than this are kept in a temporary file through numpy.memmap
+SPILL_BYTES = 256*1024*1024
+
+
+# A table of back pointers packed at 2 bits per cell, four cells to a byte.  A
+# cell holds an Operation value (DELETE, INSERT, SUB or MATCH) stored as value - 1,
+# so there is no code for "no operation": a cell never written reads as DELETE, and
+# the tracebacks tell the unfilled first row and column apart by position.  Cells
+# are combined into their byte with OR, so each one may be written only once.
+# With _buffer_ (zeroed, of table_bytes bytes, e.g. a SharedMemory block) the table
+# lives there instead.
+class PackedOperations:
+
+	def __init__(self, num_rows, num_cols, spill_bytes=None, buffer=None):
+		self.num_rows = num_rows
+		self.num_cols = num_cols
+		shape = (num_rows, (num_cols + 3)//4)
+		if spill_bytes is None:
+			spill_bytes = SPILL_BYTES
+		self.spilled = buffer is None and shape[0]*shape[1] > spill_bytes
+		if buffer is not None:
+			self.data = np.ndarray(shape, dtype=np.uint8, buffer=buffer)
+		elif self.spilled:
+			# the mapping keeps the file alive; it is deleted once the table is dropped
+			with tempfile.TemporaryFile(prefix='operations') as file:
+				self.data = np.memmap(file, dtype=np.uint8, mode='w+', shape=shape)
+		else:
+			self.data = np.zeros(shape, dtype=np.uint8)
+
+	# Bytes of the table for _num_rows_ x _num_cols_ cells
+	@staticmethod
+	def table_bytes(num_rows, num_cols):
+		return num_rows*((num_cols + 3)//4)
+
+	@property
+	def nbytes(self):
+		return self.data.nbytes
+
+	# Write one cell in each of _rows_ (all different) at the matching _cols_
+	def put(self, rows, cols, operations):
+		cols = np.asarray(cols)
+		codes = (np.asarray(operations, dtype=np.uint8) - 1) << ((cols & 3) << 1).astype(np.uint8)
+		self.data[rows, cols >> 2] |= codes
+
+	# Write the cells of row _i_ from column _first_ on
+	def put_row(self, i, first, operations):
+		offset = first & 3
+		padded = np.zeros((offset + len(operations) + 3)//4*4, dtype=np.uint8)
+		padded[offset:offset + len(operations)] = np.asarray(operations, dtype=np.uint8) - 1
+		packed = padded[0::4] | padded[1::4] << 2 | padded[2::4] << 4 | padded[3::4] << 6
+		self.data[i, first >> 2:(first >> 2) + len(packed)] |= packed
+
+	# Write a block of cells: operations[r, c] goes to cell (first_row + r, first_col + c)
+	def put_block(self, first_row, first_col, operations):
+		operations = np.asarray(operations, dtype=np.uint8)
+		offset = first_col & 3
+		padded = np.zeros((len(operations), (offset + operations.shape[1] + 3)//4*4), dtype=np.uint8)
+		padded[:, offset:offset + operations.shape[1]] = operations - 1
+		packed = padded[:, 0::4] | padded[:, 1::4] << 2 | padded[:, 2::4] << 4 | padded[:, 3::4] << 6
+		self.data[first_row:first_row + len(packed), first_col >> 2:(first_col >> 2) + packed.shape[1]] |= packed
+
+	# The Operation value of cell (i, j)
+	def get(self, i, j):
+		return ((int(self.data[i, j >> 2]) >> ((j & 3) << 1)) & 3) + 1
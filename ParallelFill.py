@@ -0,0 +1,148 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from Operations import DELETE, INSERT, MATCH, SUB
+from PackedOperations import PackedOperations
+from SequenceCodes import as_codes
+
+# Tiles are this many rows and columns.  A multiple of 4, so tiles side by side
+# never share a byte of the packed operations table
+DEFAULT_TILE_SIZE = 1024
+
+# State of each worker process, set up once by attach_table
+worker_memory = None
+worker_codes1 = None
+worker_codes2 = None
+worker_ops = None
+
+
+# Pool initializer: attach to the shared sequences and operations table
+def attach_table(name, num_rows, num_cols):
+	global worker_memory, worker_codes1, worker_codes2, worker_ops
+	worker_memory = shared_memory.SharedMemory(name=name)
+	worker_codes1 = np.ndarray((num_rows,), dtype=np.uint8, buffer=worker_memory.buf)
+	worker_codes2 = np.ndarray((num_cols,), dtype=np.uint8, buffer=worker_memory.buf, offset=num_rows)
+	worker_ops = PackedOperations(num_rows + 1, num_cols + 1, buffer=worker_memory.buf[num_rows + num_cols:])
+
+
+# Fill the cells of rows _first_row_ .. and columns _first_col_ .. _last_col_,
+# writing their operations into _ops_.  _top_ holds the scores of the row above from
+# column first_col - 1 to last_col, and _left_ those of column first_col - 1 from
+# row first_row on, one per row of the tile.  The scores are found a row at a time
+# with NumPy: the diagonal and the cell above for every cell at once and the chain
+# of inserts from the left with a running minimum.  The operations then follow for
+# the whole tile at once: matches are taken whenever they are possible and ties
+# broken delete, then insert, then sub, exactly as AntiDiagonal.fill_antidiagonal
+# does, so the table is the same cell for cell.  Returns the scores of the tile's
+# last row (from column first_col - 1) and last column.
+def fill_tile(codes1, codes2, ops, first_row, first_col, last_col, top, left, match_cost, indel_cost, sub_cost):
+	height = len(left)
+	width = last_col - first_col + 1
+	steps = np.arange(width + 1, dtype=np.int32)*indel_cost
+	matches = codes1[first_row - 1:first_row - 1 + height, None] == codes2[None, first_col - 1:last_col]
+	costs = np.where(matches, match_cost, sub_cost).astype(np.int32)
+
+	# the tile's scores with the row above and the column to the left
+	scores = np.empty((height + 1, width + 1), dtype=np.int32)
+	scores[0] = top
+	scores[1:, 0] = left
+	for k in range(height):
+		above = scores[k]
+		row = scores[k + 1]
+		np.minimum(above[:-1] + costs[k], above[1:] + indel_cost, out=row[1:])
+		row -= steps
+		np.minimum.accumulate(row, out=row)
+		row += steps
+
+	value = scores[1:, 1:]
+	op = np.where(value == scores[1:, :-1] + indel_cost, INSERT, SUB)
+	op = np.where(value == scores[:-1, 1:] + indel_cost, DELETE, op)
+	op = np.where(matches, MATCH, op)
+	ops.put_block(first_row, first_col, op)
+	return scores[-1].astype(np.int64), scores[1:, -1].astype(np.int64)
+
+
+def fill_worker_tile(first_row, first_col, last_col, top, left, match_cost, indel_cost, sub_cost):
+	return fill_tile(worker_codes1, worker_codes2, worker_ops, first_row, first_col, last_col, top, left,
+					 match_cost, indel_cost, sub_cost)
+
+
+# The first cell row or column of every tile, and one past the last
+def tile_edges(count, tile_size):
+	return [1] + list(range(tile_size, count + 1, tile_size)) + [count + 1]
+
+
+# Fill the full Needleman-Wunsch table of _seq1_ and _seq2_ on _workers_ processes.
+# The table is cut into tiles of _tile_size_ cells a side; a tile only needs the
+# last row of the tile above it and the last column of the tile to its left, so
+# every tile is handed to the pool as soon as those two are done, and those
+# boundaries are all that passes between the processes.  The sequences and the
+# operations table live in one shared memory block that every tile writes its own
+# part of.  Returns the score of the bottom right cell and the operations table,
+# the same as AntiDiagonal.fill_antidiagonal gives.
+def fill_parallel(seq1, seq2, match_cost, indel_cost, sub_cost, workers=None, tile_size=DEFAULT_TILE_SIZE):
+	if tile_size % 4:
+		raise ValueError('the tile size must be a multiple of 4, not {}'.format(tile_size))
+	if workers is None:
+		workers = os.cpu_count() or 1
+	codes1 = as_codes(seq1)
+	codes2 = as_codes(seq2)
+	num_rows = len(codes1)
+	num_cols = len(codes2)
+
+	size = num_rows + num_cols + PackedOperations.table_bytes(num_rows + 1, num_cols + 1)
+	memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+	try:
+		memory.buf[:num_rows] = codes1.tobytes()
+		memory.buf[num_rows:num_rows + num_cols] = codes2.tobytes()
+		score = fill_tiles(memory.name, num_rows, num_cols, match_cost, indel_cost, sub_cost, workers, tile_size)
+		# the table is handed back as a private copy (spilled to a file when large) so
+		# the block can go at once
+		ops = PackedOperations(num_rows + 1, num_cols + 1)
+		ops.data[:] = np.ndarray(ops.data.shape, dtype=np.uint8, buffer=memory.buf, offset=num_rows + num_cols)
+	finally:
+		memory.close()
+		memory.unlink()
+	return score, ops
+
+
+def fill_tiles(name, num_rows, num_cols, match_cost, indel_cost, sub_cost, workers, tile_size):
+	if num_rows == 0 or num_cols == 0:
+		return max(num_rows, num_cols)*indel_cost
+	row_edges = tile_edges(num_rows, tile_size)
+	col_edges = tile_edges(num_cols, tile_size)
+	tile_rows = len(row_edges) - 1
+	tile_cols = len(col_edges) - 1
+
+	# the last row of the tiles done so far in each tile column, and the last column
+	# of those in each tile row; the first row and column of the table are all indels
+	bottoms = [np.arange(col_edges[J] - 1, col_edges[J + 1], dtype=np.int64)*indel_cost for J in range(tile_cols)]
+	rights = [np.arange(row_edges[I], row_edges[I + 1], dtype=np.int64)*indel_cost for I in range(tile_rows)]
+	# the next tile row waiting in each tile column
+	next_row = [0]*tile_cols
+
+	with ProcessPoolExecutor(max_workers=min(workers, tile_rows, tile_cols), initializer=attach_table,
+							 initargs=(name, num_rows, num_cols)) as pool:
+		running = {}
+
+		def submit(I, J):
+			future = pool.submit(fill_worker_tile, row_edges[I], col_edges[J], col_edges[J + 1] - 1, bottoms[J],
+								 rights[I], match_cost, indel_cost, sub_cost)
+			running[future] = (I, J)
+
+		submit(0, 0)
+		while running:
+			done, pending = wait(running, return_when=FIRST_COMPLETED)
+			for future in done:
+				I, J = running.pop(future)
+				bottoms[J], rights[I] = future.result()
+				next_row[J] = I + 1
+				# the tiles below and to the right go as soon as their other neighbour is done too
+				if I + 1 < tile_rows and (J == 0 or next_row[J - 1] > I + 1):
+					submit(I + 1, J)
+				if J + 1 < tile_cols and next_row[J + 1] == I:
+					submit(I, J + 1)
+	return int(rights[-1][-1])
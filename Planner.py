@@ -0,0 +1,152 @@
+import os
+
+from FourRussians import MAX_SYMBOLS
+from Hirschberg import DIRECT_CELLS
+from ParallelFill import DEFAULT_TILE_SIZE as PARALLEL_TILE_SIZE
+from Sketch import estimate_distance, sketch
+
+# Seconds per DP cell of the engines that fill the whole table, measured on
+# genomes.txt (per process for 'parallel'); only their ratios matter for choosing
+CELL_SECONDS = {'serial': 1.2e-6, 'antidiagonal': 70e-9, 'hirschberg': 45e-9, 'score': 8e-9, 'four-russians': 5e-9,
+				'parallel': 45e-9}
+# The Four Russians fill also pays for every anti-diagonal of 2 x 2 blocks, and
+# holds the block table and equality patterns
+BLOCK_DIAGONAL_SECONDS = 15e-6
+BLOCK_TABLE_BYTES = (2 << 20) + (4 << 16)
+# A band fill pays a fixed cost for every row (it is a Python loop over rows)
+# and a little for every cell of the band
+BAND_ROW_SECONDS = 65e-6
+BAND_CELL_SECONDS = 5e-9
+# The wavefront engine works through one wavefront per penalty point.  On
+# genomes.txt the penalty comes to about this much per base times the sketch distance,
+# and the wavefronts widen by two diagonals every gap penalty (13 with the project's
+# costs, see Wavefront.wavefront_penalties)
+WAVEFRONT_SECONDS = 220e-6
+WAVEFRONT_PENALTY = 12
+WAVEFRONT_GAP = 13
+# Bytes per base of the traceback's runs of operations, for the engines that give an alignment
+TRACE_BYTES = 48
+# Time to sketch both sequences, paid once to estimate how wide the adaptive band grows
+SKETCH_SECONDS = 0.02
+# The distance assumed when the sketch cannot estimate one (text that is not ACGT,
+# or too short for a k-mer): the worst case, every base different
+UNKNOWN_DISTANCE = 1.0
+
+# Engines the planner picks from, depending on whether the alignment is wanted
+ALIGNMENT_ENGINES = ['antidiagonal', 'adaptive', 'hirschberg', 'wavefront']
+SCORE_ENGINES = ['score', 'four-russians']
+# The budget when none is given: half the physical memory, or this much if it is unknown
+FALLBACK_BUDGET = 1 << 30
+
+
+def default_memory_budget():
+	try:
+		return os.sysconf('SC_PHYS_PAGES')*os.sysconf('SC_PAGE_SIZE')//2
+	except (AttributeError, ValueError, OSError):
+		return FALLBACK_BUDGET
+
+
+# Bytes of a PackedOperations table
+def packed_bytes(num_rows, num_cols):
+	return num_rows*((num_cols + 3)//4)
+
+
+# Half widths the adaptive band tries, from where it starts to the one it is expected
+# to stop at.  The band has to hold the path's drift away from the diagonal, which
+# for genomes.txt stays within about half the bases that differ (the sketch
+# distance times the length).  An unknown (None) distance is taken to be
+# UNKNOWN_DISTANCE; with a distance of 0 only the starting band is counted.
+def adaptive_widths(num_rows, num_cols, d, distance):
+	if distance is None:
+		distance = UNKNOWN_DISTANCE
+	d = min(max(d, num_cols - num_rows, 1), max(num_cols, 1))
+	last = min(num_cols, max(d, int(distance*num_rows/2)))
+	widths = [d]
+	while widths[-1] < last:
+		widths.append(min(2*widths[-1], num_cols))
+	return widths
+
+
+# Estimated seconds and peak bytes of aligning an n x m table (n <= m) with _engine_,
+# or None for an engine that is not estimated.  _d_ is the (starting) band half width
+# and _distance_ the estimated fraction of differing bases (None when it is unknown),
+# used for the adaptive band.
+def estimate(engine, num_rows, num_cols, d, distance=None):
+	cells = num_rows*num_cols
+	trace = TRACE_BYTES*(num_rows + num_cols)
+	if engine == 'banded':
+		width = 2*d + 1
+		return {'seconds': num_rows*(BAND_ROW_SECONDS + width*BAND_CELL_SECONDS),
+				'bytes': packed_bytes(num_rows + 1, width) + 80*width + trace}
+	if engine == 'serial':
+		return {'seconds': cells*CELL_SECONDS['serial'],
+				'bytes': packed_bytes(num_rows + 1, num_cols + 1) + 24*(num_rows + 1) + trace}
+	if engine == 'antidiagonal':
+		return {'seconds': cells*CELL_SECONDS['antidiagonal'],
+				'bytes': packed_bytes(num_rows + 1, num_cols + 1) + 64*(num_rows + 1) + trace}
+	if engine == 'parallel':
+		# one process per CPU, each with a tile's scores and operations; the table is
+		# filled in shared memory and copied out for the traceback
+		workers = os.cpu_count() or 1
+		return {'seconds': cells*CELL_SECONDS['parallel']/workers,
+				'bytes': 2*packed_bytes(num_rows + 1, num_cols + 1) + 40*PARALLEL_TILE_SIZE**2*workers + trace}
+	if engine == 'score':
+		return {'seconds': cells*CELL_SECONDS['score'], 'bytes': 80*(num_cols + 1)}
+	if engine == 'four-russians':
+		return {'seconds': cells*CELL_SECONDS['four-russians'] + (num_rows + num_cols)/2*BLOCK_DIAGONAL_SECONDS,
+				'bytes': BLOCK_TABLE_BYTES + 40*(num_rows + num_cols)}
+	if engine == 'hirschberg':
+		# the forward and backward rows of a split, the small tables solved directly
+		# and the list of operations
+		return {'seconds': cells*CELL_SECONDS['hirschberg'],
+				'bytes': 160*(num_cols + 1) + DIRECT_CELLS + 8*(num_rows + num_cols) + trace}
+	if engine == 'adaptive':
+		widths = [2*half + 1 for half in adaptive_widths(num_rows, num_cols, d, distance)]
+		return {'seconds': SKETCH_SECONDS + sum(num_rows*(BAND_ROW_SECONDS + width*BAND_CELL_SECONDS)
+												for width in widths),
+				'bytes': packed_bytes(num_rows + 1, widths[-1]) + 80*widths[-1] + 8*(num_rows + num_cols) + trace}
+	if engine == 'wavefront':
+		if distance is None:
+			distance = UNKNOWN_DISTANCE
+		penalty = WAVEFRONT_PENALTY*distance*num_rows
+		return {'seconds': SKETCH_SECONDS + penalty*WAVEFRONT_SECONDS,
+				'bytes': int(8*penalty*penalty/WAVEFRONT_GAP) + trace}
+	return None
+
+
+# Raise MemoryError when _engine_ is expected to need more than _memory_budget_ bytes.
+# An engine asked for by name is only refused when its start does not fit (distance
+# 0); the band and the wavefront refuse to outgrow the budget themselves.
+def check_budget(engine, num_rows, num_cols, d, memory_budget):
+	expected = estimate(engine, num_rows, num_cols, d, 0)
+	if expected is not None and expected['bytes'] > memory_budget:
+		raise MemoryError('the {} engine needs about {:,} bytes for {} x {} bases, over the memory budget of {:,}'
+						  .format(engine, expected['bytes'], num_rows, num_cols, memory_budget))
+
+
+# Pick the engine for aligning _seq1_ with _seq2_ (already cut to length, the shorter
+# first): the fastest expected one whose memory fits _memory_budget_, among those
+# giving an alignment when _need_alignment_ and the score only ones otherwise.
+# Returns the plan as plain data: the 'engine', the 'estimates' of every candidate,
+# the 'memory_budget' and the sketch 'distance' (None when it was not needed).
+# Raises MemoryError when no candidate fits.
+def plan_alignment(seq1, seq2, d, need_alignment, memory_budget):
+	num_rows = len(seq1)
+	num_cols = len(seq2)
+	engines = ALIGNMENT_ENGINES if need_alignment else SCORE_ENGINES
+	if 'four-russians' in engines and len(set(seq1) | set(seq2)) > MAX_SYMBOLS:
+		engines = [engine for engine in engines if engine != 'four-russians']
+
+	distance = None
+	if 'adaptive' in engines or 'wavefront' in engines:
+		distance = estimate_distance(sketch(seq1), sketch(seq2))
+	estimates = {engine: estimate(engine, num_rows, num_cols, d, distance) for engine in engines}
+
+	fitting = [engine for engine in engines if estimates[engine]['bytes'] <= memory_budget]
+	if not fitting:
+		smallest = min(engines, key=lambda engine: estimates[engine]['bytes'])
+		raise MemoryError('no engine fits {} x {} bases in the memory budget of {:,} bytes; the {} engine needs '
+						  'about {:,}'.format(num_rows, num_cols, memory_budget, smallest,
+											  estimates[smallest]['bytes']))
+	engine = min(fitting, key=lambda engine: estimates[engine]['seconds'])
+	return {'engine': engine, 'estimates': estimates, 'memory_budget': memory_budget, 'distance': distance}
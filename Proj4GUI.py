@@ -22,6 +22,50 @@ import math
 
 # Import in the code with the actual implementation
 from GeneSequencing import *
+from AllPairs import align_all_pairs
+from AlignmentCache import AlignmentCache
+from SequenceStore import load_sequences
+from Instrumentation import Instrumentation, total_instrumentation
+
+
+# Fills the matrix off the Qt main thread.  Each finished pair is sent back through
+# resultReady as soon as it arrives, followed by progress(done, total).  Cancelling
+# with requestInterruption() drops the pairs not yet started and stops the ones
+# already running in the pool, within a fraction of a second.
+class AlignmentWorker( QThread ):
+
+	resultReady = pyqtSignal(int, int, object)
+	progress = pyqtSignal(int, int)
+	cacheStats = pyqtSignal(int, int)
+
+	def __init__( self, sequences, banded, align_length, cache_path, trace_memory=False ):
+		super(AlignmentWorker,self).__init__()
+		self.sequences = sequences
+		self.banded = banded
+		self.align_length = align_length
+		self.cache_path = cache_path
+		# tracing the peak memory (tracemalloc) slows the alignments down several times
+		self.trace_memory = trace_memory
+
+	def run(self):
+		# SQLite connections belong to the thread that opened them
+		cache = AlignmentCache(self.cache_path)
+		total = len(self.sequences)*(len(self.sequences) + 1)//2
+		done = 0
+		results = align_all_pairs(self.sequences, banded=self.banded, align_length=self.align_length,
+								  engine='score', cache=cache, instrument=Instrumentation(memory=self.trace_memory),
+								  cancelled=self.isInterruptionRequested)
+		try:
+			for i, j, s in results:
+				if self.isInterruptionRequested():
+					break
+				done += 1
+				self.resultReady.emit(i, j, s)
+				self.progress.emit(done, total)
+		finally:
+			results.close()
+			self.cacheStats.emit(cache.hits, cache.misses)
+			cache.close()
 
 
 class Proj4GUI( QMainWindow ):
@@ -34,43 +78,105 @@ class Proj4GUI( QMainWindow ):
 
 		self.seqs = self.loadSequencesFromFile()
 		self.processed_results = []
+		self.worker = None
 
 		self.initUI()
-		self.solver = GeneSequencing()
+		# results from earlier runs are reused when the sequences and settings match
+		self.cache = AlignmentCache()
+		self.solver = GeneSequencing(cache=self.cache)
 
 	def processClicked(self):
 		sequences = [ self.seqs[i][2] for i in sorted(self.seqs.keys()) ]
 
 		self.statusBar.showMessage('Processing...')
-		app.processEvents()
-		start = time.time()
-
-		for i in range(len(sequences)):
-			jresults = []
-			for j in range(len(sequences)):
-				if(j < i):
-					s = {}
-				else:
-					s = self.solver.align(sequences[i], sequences[j], banded=self.banded.isChecked(),
-													align_length=int(self.alignLength.text()))
-					self.table.item(i,j).setText('{}'.format(int(s['align_cost']) if s['align_cost'] \
-																					 != math.inf else s['align_cost']))
-					app.processEvents()
-				jresults.append(s)
-			self.processed_results.append(jresults)
-
-		end = time.time()
-		ns = end-start
-		nm = math.floor(ns/60.)
-		ns = ns - 60.*nm
-		if nm > 0:
-			self.statusBar.showMessage('Done.  Time taken: {} mins and {:3.3f} seconds.'.format(nm,ns))
-		else:
-			self.statusBar.showMessage('Done.  Time taken: {:3.3f} seconds.'.format(ns))
+		self.start = time.time()
+
+		# Only the costs are shown in the table, so fill it with the score only engine and
+		# leave the traceback until a cell is clicked
+		self.processed_banded = self.banded.isChecked()
+		# several comma separated lengths are swept in one pass, and each cell shows every cost
+		lengths = [int(length) for length in self.alignLength.text().split(',') if length.strip()]
+		self.processed_align_length = lengths[0] if len(lengths) == 1 else lengths
+
+		# The pairs are aligned on a worker thread (and its process pool) and arrive in the order they finish
+		self.processed_results = [[{} for j in range(len(sequences))] for i in range(len(sequences))]
+		self.cache_hits = self.cache_misses = 0
+		self.progressBar.setValue(0)
+		self.progressBar.show()
 		self.processButton.setEnabled(False)
+		self.clearButton.setEnabled(False)
+		self.cancelButton.setEnabled(True)
+
+		self.worker = AlignmentWorker(sequences, self.processed_banded, self.processed_align_length, self.cache.path,
+									  self.traceMemory.isChecked())
+		self.worker.resultReady.connect(self.resultReady)
+		self.worker.progress.connect(self.progressMade)
+		self.worker.cacheStats.connect(self.cacheStatsReady)
+		self.worker.finished.connect(self.processFinished)
+		self.worker.start()
+
+	def resultReady(self, i, j, s):
+		self.processed_results[i][j] = s
+		costs = [entry['align_cost'] for entry in s['sweep']] if 'sweep' in s else [s['align_cost']]
+		self.table.item(i,j).setText(' / '.join('{}'.format(int(cost) if cost != math.inf else cost)
+												for cost in costs))
+
+	def progressMade(self, done, total):
+		self.progressBar.setMaximum(total)
+		self.progressBar.setValue(done)
+		elapsed = time.time() - self.start
+		eta = elapsed/done*(total - done)
+		self.statusBar.showMessage('Processing... {} of {} pairs, ETA {}.'.format(done, total, self.formatTime(eta)))
+
+	def cacheStatsReady(self, hits, misses):
+		self.cache_hits = hits
+		self.cache_misses = misses
+
+	def cancelClicked(self):
+		if self.worker is not None:
+			self.worker.requestInterruption()
+			self.cancelButton.setEnabled(False)
+			self.statusBar.showMessage('Cancelling...')
+
+	def processFinished(self):
+		cancelled = self.worker.isInterruptionRequested()
+		self.worker = None
+		self.progressBar.hide()
+		self.cancelButton.setEnabled(False)
 		self.clearButton.setEnabled(True)
+
+		taken = self.formatTime(time.time() - self.start)
+		cached = '  Cache: {} hits, {} misses.'.format(self.cache_hits, self.cache_misses)
+		measured = self.instrumentationSummary()
+		if cancelled:
+			# the pairs already shown are kept; processing again picks the rest up from the cache
+			self.processButton.setEnabled(True)
+			self.statusBar.showMessage('Cancelled after {}.'.format(taken) + cached + measured)
+		else:
+			self.statusBar.showMessage('Done.  Time taken: {}.'.format(taken) + cached + measured)
 		self.repaint()
 
+	def formatTime(self, seconds):
+		nm = math.floor(seconds/60.)
+		ns = seconds - 60.*nm
+		if nm > 0:
+			return '{} mins and {:3.3f} seconds'.format(nm,ns)
+		return '{:3.3f} seconds'.format(ns)
+
+	# Totals over the pairs aligned in this run (cached pairs were not measured)
+	def instrumentationSummary(self):
+		reports = [results['instrumentation'] for row in self.processed_results for results in row
+				   if 'instrumentation' in results]
+		if not reports:
+			return ''
+		totals = total_instrumentation(reports)
+		return '  Measured {} alignments: fill {:3.3f}s, {:,} cells{}.'.format(
+			totals['alignments'], totals['timings'].get('fill', 0), totals['cells'], self.formatPeak(totals['peak_bytes']))
+
+	# The peak memory, when it was traced
+	def formatPeak(self, peak_bytes):
+		return '' if peak_bytes is None else ', peak {:,.0f} KiB'.format(peak_bytes/1024)
+
 	def clearClicked(self):
 		self.processed_results = []
 		self.resetTable()
@@ -99,7 +205,8 @@ class Proj4GUI( QMainWindow ):
 		print('Cell {},{} clicked!'.format(i,j))
 		print('lbls: {} and {}'.format(self.seqs[i][1],self.seqs[j][1]))
 
-		if self.processed_results and j >= i:
+		# pairs still being aligned have no results yet
+		if self.processed_results and j >= i and self.processed_results[i][j]:
 			print('in if')
 			self.seq1n_lbl.setText( 'Label {}: '.format(i+1) )
 			self.seq1c_lbl.setText( 'Sequence {}: '.format(i+1) )
@@ -109,32 +216,44 @@ class Proj4GUI( QMainWindow ):
 			self.seq1_name.setText( '{}'.format(self.seqs[i][1]) )
 			self.seq2_name.setText( '{}'.format(self.seqs[j][1]) )
 			results = self.processed_results[i][j]
+			if results['seqi_first100'] is None:
+				# Compute the alignment strings the first time this pair is shown, with whichever
+				# engine the planner expects to be fastest within the memory budget
+				# a sweep shows the alignment of its longest length
+				align_length = self.processed_align_length
+				if isinstance(align_length, list):
+					align_length = max(align_length)
+				try:
+					results.update(self.solver.align(self.seqs[i][2], self.seqs[j][2], banded=self.processed_banded,
+													 align_length=align_length, engine='auto'))
+				except MemoryError as error:
+					self.statusBar.showMessage('Pair {},{}: {}'.format(i+1, j+1, error))
+					return
 			self.seq1_chars.setText( '{}'.format(results['seqi_first100']) )
 			self.seq2_chars.setText( '{}'.format(results['seqj_first100']) )
+			if 'instrumentation' in results:
+				report = results['instrumentation']
+				timings = ', '.join('{} {:3.4f}s'.format(name, seconds) for name, seconds in report['timings'].items())
+				band = '' if report['band_width'] is None else ', band width {}'.format(report['band_width'])
+				self.statusBar.showMessage('Pair {},{}: {}, total {:3.4f}s, {:,} cells{}{}'.format(
+					i+1, j+1, timings, report['total'], report['cells'], band, self.formatPeak(report['peak_bytes'])))
+			else:
+				self.statusBar.showMessage('Pair {},{}: cached, not measured'.format(i+1, j+1))
+
+	# Stop a running matrix before the window goes away.  The worker sees the request
+	# within AllPairs.CANCEL_POLL_SECONDS and kills its pool, so the wait is short.
+	def closeEvent(self, event):
+		if self.worker is not None:
+			self.worker.requestInterruption()
+			self.worker.wait()
+		super(Proj4GUI,self).closeEvent(event)
 
 	def loadSequencesFromFile( self ):
 		FILENAME = 'genomes.txt'
-		raw = open(FILENAME,'r').readlines()
+		# Parsed once into 2-bit packed sequences; later runs reload the binary sidecar
 		sequences = {}
-
-		i = 0
-		cur_id	= ''
-		cur_str = ''
-		for liner in raw:
-			line = liner.strip()
-			if '#' in line:
-				if len(cur_id) > 0:
-					sequences[i] = (i,cur_id,cur_str)
-					cur_id	= ''
-					cur_str = ''
-					i += 1
-				parts = line.split('#')
-				cur_id = parts[0]
-				cur_str += parts[1]
-			else:
-				cur_str += line
-		if len(cur_str) > 0 or len(cur_id) > 0:
-			sequences[i] = (i,cur_id,cur_str)
+		for i, seq in enumerate(load_sequences(FILENAME)):
+			sequences[i] = (i,seq.name,seq)
 		return sequences
 
 	def getTableDims( self ):
@@ -186,9 +305,15 @@ class Proj4GUI( QMainWindow ):
 
 		self.processButton	= QPushButton('Process')
 		self.clearButton	= QPushButton('Clear')
+		self.cancelButton	= QPushButton('Cancel')
+		self.progressBar	= QProgressBar()
+		self.progressBar.hide()
+		self.statusBar.addPermanentWidget(self.progressBar)
 
 		self.banded		= QCheckBox('Banded')
 		self.banded.setChecked(False)
+		self.traceMemory	= QCheckBox('Trace peak memory')
+		self.traceMemory.setChecked(False)
 		self.alignLength	  = QLineEdit('1000')
 		font = QFont()
 		font.setFamily("Courier New")
@@ -240,12 +365,14 @@ class Proj4GUI( QMainWindow ):
 		h.addStretch(1)
 		h.addWidget( self.processButton )
 		h.addWidget( self.clearButton )
+		h.addWidget( self.cancelButton )
 		h.addStretch(1)
 		vbox.addLayout(h)
 
 		h = QHBoxLayout()
 		h.addStretch(1)
 		h.addWidget( self.banded )
+		h.addWidget( self.traceMemory )
 		h.addWidget( QLabel('Align Length: ') )
 		h.addWidget( self.alignLength )
 		h.addStretch(1)
@@ -254,6 +381,8 @@ class Proj4GUI( QMainWindow ):
 		self.processButton.clicked.connect(self.processClicked)
 		self.clearButton.clicked.connect(self.clearClicked)
 		self.clearButton.setEnabled(False)
+		self.cancelButton.clicked.connect(self.cancelClicked)
+		self.cancelButton.setEnabled(False)
 		self.table.cellClicked.connect(self.cellClicked)
 
 		self.show()
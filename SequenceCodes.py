@@ -0,0 +1,21 @@
+import numpy as np
+
+
+# Turn a sequence into a uint8 array of character codes so the NumPy engines
+# can compare whole slices at once.  Strings are encoded byte for byte and
+# packed sequences (SequenceStore.PackedSequence) are unpacked.
+def as_codes(seq):
+	if isinstance(seq, np.ndarray):
+		return seq.astype(np.uint8, copy=False)
+	if isinstance(seq, str):
+		seq = seq.encode('latin-1')
+	elif hasattr(seq, 'codes'):
+		return seq.codes()
+	return np.frombuffer(bytes(seq), dtype=np.uint8)
+
+
+# The same sequence as a str, for building the aligned strings
+def as_text(seq):
+	if isinstance(seq, str):
+		return seq
+	return as_codes(seq).tobytes().decode('latin-1')
@@ -0,0 +1,187 @@
+import json
+import mmap
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+# Sequences are stored next to their source file under this suffix
+SIDECAR_SUFFIX = '.seqstore.npz'
+# Bump when the sidecar layout changes so stale files are parsed again
+STORE_VERSION = 1
+
+LOWER_BASES = b'acgt'
+UPPER_BASES = b'ACGT'
+
+
+# A sequence packed at 2 bits per base, four bases to a byte.  Bases outside the
+# sequence's four letter alphabet (N and the other ambiguity codes, or anything
+# else) are packed as 0 and recorded as runs of (start, length, character), so
+# unpacking gives back exactly the original characters.
+class PackedSequence:
+
+	def __init__(self, name, length, alphabet, packed, exception_starts, exception_lengths, exception_values):
+		self.name = name
+		self.length = length
+		self.alphabet = alphabet
+		self.packed = packed
+		self.exception_starts = exception_starts
+		self.exception_lengths = exception_lengths
+		self.exception_values = exception_values
+
+	@classmethod
+	def from_bytes(cls, name, raw):
+		codes = np.frombuffer(bytes(raw), dtype=np.uint8)
+		length = len(codes)
+
+		# pack against whichever case of ACGT the sequence mostly uses
+		lower = np.isin(codes, np.frombuffer(LOWER_BASES, dtype=np.uint8)).sum()
+		upper = np.isin(codes, np.frombuffer(UPPER_BASES, dtype=np.uint8)).sum()
+		alphabet = UPPER_BASES if upper > lower else LOWER_BASES
+		lookup = np.full(256, -1, dtype=np.int16)
+		lookup[np.frombuffer(alphabet, dtype=np.uint8)] = np.arange(4)
+		base_codes = lookup[codes]
+
+		# runs of the same character outside the alphabet
+		exceptions = base_codes < 0
+		changes = np.ones(length, dtype=bool)
+		changes[1:] = (codes[1:] != codes[:-1]) | (exceptions[1:] != exceptions[:-1])
+		run_starts = np.flatnonzero(changes)
+		run_ends = np.append(run_starts[1:], length)[:len(run_starts)]
+		in_exception = exceptions[run_starts]
+		starts = run_starts[in_exception]
+		ends = run_ends[in_exception]
+		base_codes[exceptions] = 0
+
+		padded = np.zeros((length + 3)//4*4, dtype=np.uint8)
+		padded[:length] = base_codes
+		packed = padded[0::4] | padded[1::4] << 2 | padded[2::4] << 4 | padded[3::4] << 6
+
+		return cls(name, length, alphabet, packed, starts, ends - starts, codes[starts])
+
+	def __len__(self):
+		return self.length
+
+	# The original characters as a uint8 array, ready for the NumPy engines
+	def codes(self):
+		shifts = np.array([0, 2, 4, 6], dtype=np.uint8)
+		base_codes = ((self.packed[:, None] >> shifts) & 3).reshape(-1)[:self.length]
+		codes = np.frombuffer(self.alphabet, dtype=np.uint8)[base_codes]
+		for start, length, value in zip(self.exception_starts, self.exception_lengths, self.exception_values):
+			codes[start:start + length] = value
+		return codes
+
+	def __bytes__(self):
+		return self.codes().tobytes()
+
+	def __str__(self):
+		return bytes(self).decode('latin-1')
+
+
+# Stream the records of a genomes.txt style file ("label#sequence" headers) or a
+# FASTA file (">label" headers) through a memory map, yielding a PackedSequence
+# per record.  Only the record being read is ever held unpacked.
+def parse_sequences(path):
+	with open(path, 'rb') as file:
+		if os.fstat(file.fileno()).st_size == 0:
+			return
+		with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			name = None
+			raw = bytearray()
+			for line in iter(data.readline, b''):
+				line = line.strip()
+				if line.startswith(b'>'):
+					header = line[1:]
+					rest = b''
+				elif b'#' in line:
+					header, rest = line.split(b'#', 1)
+					rest = rest.split(b'#', 1)[0]
+				else:
+					raw += line
+					continue
+
+				if name is not None or raw:
+					yield PackedSequence.from_bytes(name or '', raw)
+				name = header.decode('latin-1')
+				raw = bytearray(rest)
+			if name is not None or raw:
+				yield PackedSequence.from_bytes(name or '', raw)
+
+
+def sidecar_path(path):
+	return path + SIDECAR_SUFFIX
+
+
+def source_signature(path):
+	stat = os.stat(path)
+	return {'version': STORE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+# Write the packed sequences to a binary store that load_store reads back without parsing
+def save_store(sequences, path, signature):
+	arrays = {'header': np.frombuffer(json.dumps({
+		'signature': signature,
+		'names': [seq.name for seq in sequences],
+		'lengths': [seq.length for seq in sequences],
+		'alphabets': [seq.alphabet.decode('latin-1') for seq in sequences],
+	}).encode(), dtype=np.uint8)}
+	for index, seq in enumerate(sequences):
+		arrays['packed{}'.format(index)] = seq.packed
+		arrays['exceptions{}'.format(index)] = np.stack([seq.exception_starts, seq.exception_lengths,
+														 seq.exception_values.astype(np.int64)])
+
+	# write to a temporary file of our own first, so a reader never sees half a
+	# store, even with several processes saving the same one
+	descriptor, temporary = tempfile.mkstemp(suffix='.tmp.npz', prefix=os.path.basename(path) + '.',
+											 dir=os.path.dirname(path) or '.')
+	try:
+		with os.fdopen(descriptor, 'wb') as file:
+			np.savez(file, **arrays)
+		os.replace(temporary, path)
+	except BaseException:
+		os.unlink(temporary)
+		raise
+
+
+# Read a store written by save_store, or None if it is missing, unreadable (cut
+# short or corrupt) or was made from a different source
+def load_store(path, signature=None):
+	if not os.path.exists(path):
+		return None
+	try:
+		return read_store(path, signature)
+	except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+		return None
+
+
+def read_store(path, signature):
+	with np.load(path) as arrays:
+		header = json.loads(arrays['header'].tobytes())
+		if signature is not None and header['signature'] != signature:
+			return None
+		sequences = []
+		for index, name in enumerate(header['names']):
+			starts, lengths, values = arrays['exceptions{}'.format(index)]
+			sequences.append(PackedSequence(name, header['lengths'][index], header['alphabets'][index].encode('latin-1'),
+											arrays['packed{}'.format(index)], starts, lengths, values.astype(np.uint8)))
+	return sequences
+
+
+# Load every sequence in _path_, reusing the sidecar store when it is up to date
+# and writing one after parsing otherwise
+def load_sequences(path, use_sidecar=True):
+	signature = source_signature(path)
+	if use_sidecar:
+		sequences = load_store(sidecar_path(path), signature)
+		if sequences is not None:
+			return sequences
+
+	sequences = list(parse_sequences(path))
+	if use_sidecar:
+		try:
+			save_store(sequences, sidecar_path(path), signature)
+		except OSError:
+			# a read only directory just means parsing again next time
+			pass
+	return sequences
@@ -0,0 +1,103 @@
+import math
+
+import numpy as np
+
+from SequenceCodes import as_codes
+
+DEFAULT_K = 16
+DEFAULT_SIZE = 512
+
+# 2-bit values of the bases in either case; anything else ends a k-mer
+BASE_VALUES = np.full(256, -1, dtype=np.int8)
+for value, bases in enumerate([b'Aa', b'Cc', b'Gg', b'Tt']):
+	for base in bases:
+		BASE_VALUES[base] = value
+
+
+# Scramble k-mer values (splitmix64's finalizer) so the smallest hashes are a
+# random sample of the k-mers rather than the A-rich ones
+def mix(values):
+	values = values.astype(np.uint64)
+	with np.errstate(over='ignore'):
+		values ^= values >> np.uint64(30)
+		values *= np.uint64(0xbf58476d1ce4e5b9)
+		values ^= values >> np.uint64(27)
+		values *= np.uint64(0x94d049bb133111eb)
+		values ^= values >> np.uint64(31)
+	return values
+
+
+# The 2-bit packed value of every k-mer made only of ACGT, and where each starts
+def kmer_values(seq, k):
+	if not 0 < k < 32:
+		raise ValueError('k-mers are packed into 64 bits, so k must be between 1 and 31, not {}'.format(k))
+	values = BASE_VALUES[as_codes(seq)]
+	if len(values) < k:
+		return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+
+	windows = np.lib.stride_tricks.sliding_window_view(values, k)
+	positions = np.flatnonzero(windows.min(axis=1) >= 0)
+	weights = np.uint64(4)**np.arange(k - 1, -1, -1, dtype=np.uint64)
+	kmers = (windows[positions].astype(np.uint64)*weights).sum(axis=1, dtype=np.uint64)
+	return positions, kmers
+
+
+# The bottom-_size_ MinHash sketch of a sequence: the _size_ smallest distinct
+# hashes of its k-mers, sorted.  K-mers holding anything but ACGT are left out,
+# so a sequence that is not DNA (like the test strings) has an empty sketch.
+def sketch(seq, k=DEFAULT_K, size=DEFAULT_SIZE):
+	positions, kmers = kmer_values(seq, k)
+	return np.unique(mix(kmers))[:size]
+
+
+# Estimated Jaccard similarity of the k-mer sets behind two sketches: the
+# share of the bottom _size_ hashes of their union found in both.  None when
+# both are empty and there is nothing to compare.
+def estimate_jaccard(sketch1, sketch2, size=DEFAULT_SIZE):
+	union = np.union1d(sketch1, sketch2)[:size]
+	if len(union) == 0:
+		return None
+	shared = np.intersect1d(sketch1, sketch2, assume_unique=True)
+	return np.count_nonzero(shared <= union[-1])/len(union)
+
+
+# Mash distance, an estimate of the fraction of differing bases (1.0 when no
+# k-mer is shared), or None when the sketches cannot be compared
+def estimate_distance(sketch1, sketch2, k=DEFAULT_K, size=DEFAULT_SIZE):
+	jaccard = estimate_jaccard(sketch1, sketch2, size)
+	if jaccard is None:
+		return None
+	if jaccard == 0:
+		return 1.0
+	return min(1.0, math.log((1 + jaccard)/(2*jaccard))/k)
+
+
+# The result reported for a pair skipped by the screen instead of aligned
+def estimated_result(distance):
+	return {'align_cost':None, 'seqi_first100':None, 'seqj_first100':None, 'alignment':None,
+			'estimated':True, 'distance':distance}
+
+
+# Sketch every sequence once and estimate the distance of every pair.  Only the
+# first _align_length_ bases (the longest, for a list of lengths) are sketched,
+# since only they are aligned.  Returns the pairs to align, most similar first
+# (pairs that cannot be estimated go last), the (i, j, distance) of the pairs
+# farther apart than _max_distance_, which are left out, and the distance of every pair.
+def screen_pairs(sequences, pairs, max_distance=None, align_length=None, k=DEFAULT_K, size=DEFAULT_SIZE):
+	if isinstance(align_length, (list, tuple)):
+		align_length = max(align_length)
+	needed = sorted({index for pair in pairs for index in pair})
+	sketches = {index: sketch(as_codes(sequences[index])[:align_length], k, size) for index in needed}
+
+	distances = {}
+	keep = []
+	skipped = []
+	for i, j in pairs:
+		distance = estimate_distance(sketches[i], sketches[j], k, size)
+		distances[i, j] = distance
+		if max_distance is not None and distance is not None and distance > max_distance:
+			skipped.append((i, j, distance))
+		else:
+			keep.append((i, j))
+	keep.sort(key=lambda pair: (distances[pair] is None, distances[pair] or 0))
+	return keep, skipped, distances
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+# Checkpointed all-pairs jobs that can be resumed and shared between machines.
+#
+#   python3 TiledJob.py init runs/genomes genomes.txt --align-length 3000 --tile-size 64
+#   python3 TiledJob.py work runs/genomes      (start as many as you like, on any host sharing runs/)
+#   python3 TiledJob.py status runs/genomes
+#   python3 TiledJob.py collect runs/genomes > matrix.tsv
+#
+# The upper triangle of the matrix is cut into tiles of tile_size x tile_size
+# sequences.  A worker claims a tile by creating its lock file (which only one
+# creator can do), aligns its pairs and writes the tile's results to a temporary
+# file that is then renamed into place, so a tile file is either complete or
+# missing.  Workers skip tiles that have a result file, which is all resuming
+# takes.  A worker touches its lock after every pair; a lock left untouched for
+# stale_seconds belongs to a worker that died and is taken over.
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sys
+import time
+
+from AlignmentCache import storable_result
+from GeneSequencing import GeneSequencing
+from SequenceCodes import as_codes
+from SequenceStore import load_sequences
+
+JOB_FILE = 'job.json'
+DEFAULT_TILE_SIZE = 32
+STALE_SECONDS = 600
+
+
+# The (a, b) tiles of the upper triangle, row a of tiles against column b
+def tiles(count, tile_size):
+	tile_count = (count + tile_size - 1)//tile_size
+	return [(a, b) for a in range(tile_count) for b in range(a, tile_count)]
+
+
+# The (i, j) pairs with j >= i inside tile (a, b)
+def tile_pairs(count, tile_size, a, b):
+	rows = range(a*tile_size, min(count, (a + 1)*tile_size))
+	cols = range(b*tile_size, min(count, (b + 1)*tile_size))
+	return [(i, j) for i in rows for j in cols if j >= i]
+
+
+def tile_path(directory, a, b):
+	return os.path.join(directory, 'tile-{}-{}.json'.format(a, b))
+
+
+def lock_path(directory, a, b):
+	return os.path.join(directory, 'tile-{}-{}.lock'.format(a, b))
+
+
+# A digest of the sequences, so a job is never resumed against a changed file
+def sequences_digest(sequences):
+	digest = hashlib.sha256()
+	for seq in sequences:
+		digest.update(hashlib.sha256(as_codes(seq).tobytes()).digest())
+	return digest.hexdigest()
+
+
+# Write _data_ as JSON so that readers see either the old file or the whole new one
+def write_atomically(path, data):
+	temporary = '{}.{}.{}.tmp'.format(path, socket.gethostname(), os.getpid())
+	with open(temporary, 'w') as file:
+		json.dump(data, file)
+		file.flush()
+		os.fsync(file.fileno())
+	os.replace(temporary, path)
+
+
+def create_job(directory, sequence_file, banded, align_length, engine='score', tile_size=DEFAULT_TILE_SIZE):
+	sequences = load_sequences(sequence_file)
+	os.makedirs(directory, exist_ok=True)
+	job = {
+		'file': os.path.abspath(sequence_file),
+		'count': len(sequences),
+		'digest': sequences_digest(sequences),
+		'banded': banded,
+		'align_length': align_length,
+		'engine': engine,
+		'tile_size': tile_size,
+	}
+	path = os.path.join(directory, JOB_FILE)
+	if os.path.exists(path):
+		with open(path) as file:
+			if json.load(file) != job:
+				raise ValueError('{} already holds a different job'.format(directory))
+		return job
+	write_atomically(path, job)
+	return job
+
+
+def load_job(directory):
+	with open(os.path.join(directory, JOB_FILE)) as file:
+		return json.load(file)
+
+
+# The token and modification time (ns) of the lock file at _path_
+def lock_state(path):
+	with open(path) as file:
+		return file.read(), os.fstat(file.fileno()).st_mtime_ns
+
+
+# Try to take tile (a, b).  Returns the token written into the lock, or None when
+# another worker holds it.  A stale lock is first renamed away.  Between looking at
+# the lock and renaming it another worker may have taken it over and made a fresh
+# one, so the renamed file must still be the stale lock that was seen (same token,
+# same time); otherwise it is put back and the tile left alone.
+def claim_tile(directory, a, b, stale_seconds=STALE_SECONDS):
+	path = lock_path(directory, a, b)
+	token = '{} {} {}'.format(socket.gethostname(), os.getpid(), time.time())
+	for attempt in range(2):
+		try:
+			descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+		except FileExistsError:
+			try:
+				seen = lock_state(path)
+				if time.time() - seen[1]/1e9 < stale_seconds:
+					return None
+				stale = '{}.{}.stale'.format(path, token.replace(' ', '-'))
+				os.rename(path, stale)
+				if lock_state(stale) != seen:
+					try:
+						# link, unlike rename, never replaces a lock made in the meantime
+						os.link(stale, path)
+					except FileExistsError:
+						pass
+					os.remove(stale)
+					return None
+				os.remove(stale)
+			except FileNotFoundError:
+				# released or taken over by someone else in the meantime
+				pass
+			continue
+		with os.fdopen(descriptor, 'w') as file:
+			file.write(token)
+		return token
+	return None
+
+
+# Touch our lock so it does not look stale, unless it was taken over
+def heartbeat_tile(directory, a, b, token):
+	path = lock_path(directory, a, b)
+	try:
+		with open(path) as file:
+			if file.read() == token:
+				os.utime(file.fileno())
+	except FileNotFoundError:
+		pass
+
+
+# Remove our lock, unless it was taken over while we were slow
+def release_tile(directory, a, b, token):
+	path = lock_path(directory, a, b)
+	try:
+		with open(path) as file:
+			if file.read() == token:
+				os.remove(path)
+	except FileNotFoundError:
+		pass
+
+
+# Work through the job in _directory_ until no tile is left to claim.  Returns the
+# number of tiles this worker completed.
+def run_worker(directory, stale_seconds=STALE_SECONDS, log=None):
+	job = load_job(directory)
+	sequences = load_sequences(job['file'])
+	if len(sequences) != job['count'] or sequences_digest(sequences) != job['digest']:
+		raise ValueError('{} has changed since the job was created'.format(job['file']))
+	solver = GeneSequencing()
+
+	completed = 0
+	for a, b in tiles(job['count'], job['tile_size']):
+		if os.path.exists(tile_path(directory, a, b)):
+			continue
+		token = claim_tile(directory, a, b, stale_seconds)
+		if token is None:
+			continue
+		try:
+			# finished by another worker between the check and the claim
+			if os.path.exists(tile_path(directory, a, b)):
+				continue
+			results = []
+			for i, j in tile_pairs(job['count'], job['tile_size'], a, b):
+				result = solver.align(sequences[i], sequences[j], banded=job['banded'],
+									  align_length=job['align_length'], engine=job['engine'])
+				results.append({'i': i, 'j': j, 'result': storable_result(result)})
+				heartbeat_tile(directory, a, b, token)
+			write_atomically(tile_path(directory, a, b), {'tile': [a, b], 'results': results})
+			completed += 1
+			if log is not None:
+				print('tile {},{}: {} pairs'.format(a, b, len(results)), file=log)
+		finally:
+			release_tile(directory, a, b, token)
+	return completed
+
+
+def job_status(directory):
+	job = load_job(directory)
+	all_tiles = tiles(job['count'], job['tile_size'])
+	done = sum(os.path.exists(tile_path(directory, a, b)) for a, b in all_tiles)
+	claimed = sum(os.path.exists(lock_path(directory, a, b)) and not os.path.exists(tile_path(directory, a, b))
+				  for a, b in all_tiles)
+	return {'tiles': len(all_tiles), 'done': done, 'claimed': claimed, 'pending': len(all_tiles) - done - claimed}
+
+
+# Yield (i, j, result) for every pair of every finished tile
+def collect(directory):
+	job = load_job(directory)
+	for a, b in tiles(job['count'], job['tile_size']):
+		path = tile_path(directory, a, b)
+		if os.path.exists(path):
+			with open(path) as file:
+				for entry in json.load(file)['results']:
+					yield entry['i'], entry['j'], entry['result']
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Resumable all-pairs alignment jobs split into tiles.')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	init = commands.add_parser('init', help='create a job directory')
+	init.add_argument('directory')
+	init.add_argument('file', help='genomes.txt style or FASTA file, on a filesystem every worker can read')
+	init.add_argument('--banded', action='store_true', help='banded alignment')
+	init.add_argument('--align-length', type=int, default=1000, help='number of bases to align')
+	init.add_argument('--engine', default='score', help='full alignment engine (see GeneSequencing.align)')
+	init.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE, help='sequences per tile side')
+
+	work = commands.add_parser('work', help='claim and align tiles until none are left')
+	work.add_argument('directory')
+	work.add_argument('--stale-seconds', type=float, default=STALE_SECONDS,
+					  help='take over locks not touched for this long')
+
+	status = commands.add_parser('status', help='count finished, claimed and pending tiles')
+	status.add_argument('directory')
+
+	gather = commands.add_parser('collect', help='write the finished results as TSV')
+	gather.add_argument('directory')
+	args = parser.parse_args(argv)
+
+	if args.command == 'init':
+		job = create_job(args.directory, args.file, args.banded, args.align_length, args.engine, args.tile_size)
+		print('{} sequences in {} tiles'.format(job['count'], len(tiles(job['count'], job['tile_size']))))
+	elif args.command == 'work':
+		completed = run_worker(args.directory, args.stale_seconds, log=sys.stderr)
+		print('{} tiles completed'.format(completed))
+	elif args.command == 'status':
+		print(json.dumps(job_status(args.directory)))
+	else:
+		print('i\tj\talign_cost')
+		for i, j, result in collect(args.directory):
+			print('{}\t{}\t{}'.format(i, j, result['align_cost']))
+
+
+if __name__ == '__main__':
+	main()
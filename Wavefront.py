@@ -0,0 +1,159 @@
+import numpy as np
+
+from Alignment import push_run
+from Operations import DELETE, INSERT, MATCH, SUB
+from SequenceCodes import as_codes
+
+# Offset of a diagonal that no path reaches with the score of its wavefront
+NONE = -(1 << 40)
+# Matching runs are compared in chunks that start at FIRST_CHUNK bases and double
+# up to MAX_CHUNK, so a long run costs a few NumPy comparisons
+FIRST_CHUNK = 16
+MAX_CHUNK = 1024
+
+
+# The mismatch and gap penalties (with matches free) equivalent to the costs.  An
+# alignment of n and m bases with M matches, X subs and G indels has
+# 2*M + 2*X + G = n + m, so twice its cost is
+#   match_cost*(n + m) + 2*(sub_cost - match_cost)*X + (2*indel_cost - match_cost)*G
+# and minimising the cost minimises the penalty.  With MATCH=-3, INDEL=5 and SUB=1
+# a mismatch costs 8 and a gap 13.
+def wavefront_penalties(match_cost, indel_cost, sub_cost):
+	mismatch = 2*(sub_cost - match_cost)
+	gap = 2*indel_cost - match_cost
+	if mismatch <= 0 or gap <= 0:
+		raise ValueError('the wavefront needs subs and indels to cost more than matches')
+	return mismatch, gap
+
+
+# A wavefront: the furthest column reached on each diagonal k = j - i from lo on
+class Front:
+
+	def __init__(self, lo, offsets):
+		self.lo = lo
+		self.offsets = offsets
+
+	@property
+	def hi(self):
+		return self.lo + len(self.offsets) - 1
+
+	# The offsets of diagonals lo .. hi, NONE outside the front
+	def lookup(self, lo, hi):
+		values = np.full(hi - lo + 1, NONE, dtype=np.int64)
+		first = max(lo, self.lo)
+		last = min(hi, self.hi)
+		if first <= last:
+			values[first - lo:last - lo + 1] = self.offsets[first - self.lo:last - self.lo + 1]
+		return values
+
+	def get(self, k):
+		return int(self.offsets[k - self.lo]) if self.lo <= k <= self.hi else NONE
+
+
+# Cells (offset - k, offset) outside the n x m table are not reached
+def valid_offsets(offsets, diagonals, num_rows, num_cols):
+	rows = offsets - diagonals
+	return np.where((offsets >= 0) & (offsets <= num_cols) & (rows >= 0) & (rows <= num_rows), offsets, NONE)
+
+
+# Slide every reached diagonal along its run of matching bases.  _codes1_ and
+# _codes2_ are padded with MAX_CHUNK different values, which end every run at the
+# edge of the table.
+def extend(codes1, codes2, offsets, diagonals):
+	active = np.flatnonzero(offsets >= 0)
+	chunk = FIRST_CHUNK
+	while active.size:
+		cols = offsets[active]
+		rows = cols - diagonals[active]
+		window = np.arange(chunk)
+		same = codes1[rows[:, None] + window] == codes2[cols[:, None] + window]
+		run = np.where(same.all(axis=1), chunk, same.argmin(axis=1))
+		offsets[active] += run
+		active = active[run == chunk]
+		chunk = min(2*chunk, MAX_CHUNK)
+
+
+# Exact global alignment with the wavefront algorithm (WFA): instead of every cell,
+# only the furthest cell reached on each diagonal with each penalty is kept, and
+# runs of matches are crossed in bulk.  The work grows with the sequence length
+# times the penalty of the alignment, so near identical sequences take very few
+# wavefronts.  Every wavefront is kept for the traceback, which for distant
+# sequences grows with the square of the penalty: with _max_bytes_ the alignment
+# raises MemoryError once they need more.  Returns the score in the given costs, the
+# alignment as [operation, count] runs from (0, 0) and the number of diagonal
+# offsets computed.
+def wavefront_alignment(seq1, seq2, match_cost, indel_cost, sub_cost, max_bytes=None):
+	codes1 = as_codes(seq1)
+	codes2 = as_codes(seq2)
+	num_rows = len(codes1)
+	num_cols = len(codes2)
+	mismatch, gap = wavefront_penalties(match_cost, indel_cost, sub_cost)
+	padded1 = np.concatenate([codes1, np.zeros(MAX_CHUNK, dtype=np.uint8)])
+	padded2 = np.concatenate([codes2, np.ones(MAX_CHUNK, dtype=np.uint8)])
+	end = num_cols - num_rows
+
+	offsets = np.zeros(1, dtype=np.int64)
+	extend(padded1, padded2, offsets, np.zeros(1, dtype=np.int64))
+	fronts = {0: Front(0, offsets)}
+	penalty = 0
+	stored = offsets.size
+	while fronts.get(penalty) is None or fronts[penalty].get(end) < num_cols:
+		penalty += 1
+		sources = [front for front in (fronts.get(penalty - mismatch), fronts.get(penalty - gap)) if front is not None]
+		if not sources:
+			continue
+		lo = max(-num_rows, min(front.lo - 1 for front in sources))
+		hi = min(num_cols, max(front.hi + 1 for front in sources))
+		diagonals = np.arange(lo, hi + 1)
+
+		offsets = np.full(len(diagonals), NONE, dtype=np.int64)
+		if penalty - mismatch in fronts:
+			offsets = np.maximum(offsets, valid_offsets(fronts[penalty - mismatch].lookup(lo, hi) + 1, diagonals,
+														num_rows, num_cols))
+		if penalty - gap in fronts:
+			source = fronts[penalty - gap]
+			# an insert comes from the diagonal below and a delete from the one above
+			offsets = np.maximum(offsets, valid_offsets(source.lookup(lo - 1, hi - 1) + 1, diagonals,
+														num_rows, num_cols))
+			offsets = np.maximum(offsets, valid_offsets(source.lookup(lo + 1, hi + 1), diagonals,
+														num_rows, num_cols))
+		reached = np.flatnonzero(offsets >= 0)
+		if reached.size == 0:
+			continue
+		offsets = offsets[reached[0]:reached[-1] + 1]
+		diagonals = diagonals[reached[0]:reached[-1] + 1]
+		extend(padded1, padded2, offsets, diagonals)
+		fronts[penalty] = Front(int(diagonals[0]), offsets)
+		stored += offsets.size
+		if max_bytes is not None and stored*offsets.itemsize > max_bytes:
+			raise MemoryError('the wavefronts up to penalty {} need more than {:,} bytes'.format(penalty, max_bytes))
+
+	score = (match_cost*(num_rows + num_cols) + penalty)//2
+	return score, trace_wavefronts(fronts, penalty, end, num_rows, num_cols, mismatch, gap), stored
+
+
+# Walk the wavefronts back from the end cell.  Each step undoes the run of matches
+# that extended a diagonal, then the sub, insert or delete that reached it, found
+# the same way the forward pass chose it.
+def trace_wavefronts(fronts, penalty, k, num_rows, num_cols, mismatch, gap):
+	runs = []
+	offset = num_cols
+	while penalty > 0:
+		best = None
+		for operation, source, diagonal, advance in ((SUB, penalty - mismatch, k, 1),
+													 (INSERT, penalty - gap, k - 1, 1),
+													 (DELETE, penalty - gap, k + 1, 0)):
+			if source not in fronts:
+				continue
+			start = fronts[source].get(diagonal) + advance
+			if 0 <= start <= num_cols and 0 <= start - k <= num_rows and (best is None or start > best[0]):
+				best = (start, operation, source, diagonal, advance)
+		start, operation, penalty, k, advance = best
+		if offset > start:
+			push_run(runs, MATCH, offset - start)
+		push_run(runs, operation)
+		offset = start - advance
+	if offset > 0:
+		push_run(runs, MATCH, offset)
+	runs.reverse()
+	return runs
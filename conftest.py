@@ -0,0 +1,81 @@
+import os
+import random
+
+import pytest
+
+from GeneSequencing import INDEL, MATCH, SUB, GeneSequencing
+from Operations import DELETE, INSERT
+
+GENOMES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'genomes.txt')
+
+
+# _count_ pairs of random ACGT sequences, the second a mutated copy of the first so
+# that the pairs range from identical to unrelated
+def random_pairs(count=12, seed=1):
+	rng = random.Random(seed)
+	pairs = []
+	for index in range(count):
+		seq1 = ''.join(rng.choice('ACGT') for k in range(rng.randint(0, 60)))
+		seq2 = list(seq1)
+		for k in range(rng.randint(0, 30)):
+			position = rng.randint(0, len(seq2))
+			kind = rng.choice('sid')
+			if kind == 'i' or not seq2:
+				seq2.insert(position, rng.choice('ACGT'))
+			elif kind == 'd':
+				del seq2[min(position, len(seq2) - 1)]
+			else:
+				seq2[min(position, len(seq2) - 1)] = rng.choice('ACGT')
+		pairs.append((seq1, ''.join(seq2)))
+	return pairs
+
+
+# The sequences of genomes.txt, read the way the GUI reads them
+def load_genomes():
+	genomes = []
+	for line in open(GENOMES):
+		line = line.strip()
+		if '#' in line:
+			genomes.append(line.split('#')[1])
+		else:
+			genomes[-1] += line
+	return genomes
+
+
+# Prefixes of some pairs of genomes.txt
+def genome_pairs(length=300):
+	genomes = load_genomes()
+	return [(genomes[i][:length], genomes[j][:length]) for i, j in [(0, 1), (2, 3), (3, 9), (5, 6)]]
+
+
+# The cost of the path an Alignment takes, which must use up both sequences
+def path_cost(alignment):
+	i = alignment.start_i
+	j = alignment.start_j
+	cost = 0
+	for operation, count in alignment.runs:
+		for step in range(count):
+			if operation == DELETE:
+				cost += INDEL
+				i += 1
+			elif operation == INSERT:
+				cost += INDEL
+				j += 1
+			else:
+				cost += MATCH if alignment.seq1[i] == alignment.seq2[j] else SUB
+				i += 1
+				j += 1
+	assert (i, j) == (len(alignment.seq1), len(alignment.seq2))
+	return cost
+
+
+@pytest.fixture(scope='session')
+def pairs():
+	return random_pairs() + genome_pairs()
+
+
+# The serial engine's result for every pair, which the other engines are checked against
+@pytest.fixture(scope='session')
+def serial_results(pairs):
+	solver = GeneSequencing()
+	return [solver.align(seq1, seq2, False, 1000) for seq1, seq2 in pairs]
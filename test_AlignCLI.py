@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from AlignCLI import main
+from conftest import GENOMES
+from GeneSequencing import GeneSequencing
+from SequenceStore import load_sequences
+
+
+def run(capsys, *argv):
+	main([str(arg) for arg in argv])
+	return capsys.readouterr().out.splitlines()
+
+
+def test_tsv_every_pair(capsys):
+	lines = run(capsys, GENOMES, '--align-length', 50)
+	count = len(load_sequences(GENOMES))
+	assert lines[0].split('\t') == ['i', 'j', 'label_i', 'label_j', 'align_cost']
+	assert len(lines) == 1 + count*(count + 1)//2
+
+	sequences = [str(seq) for seq in load_sequences(GENOMES)]
+	for line in lines[1:]:
+		i, j, label_i, label_j, cost = line.split('\t')
+		assert int(cost) == GeneSequencing().align(sequences[int(i)], sequences[int(j)], False, 50)['align_cost']
+
+
+def test_json_query_with_strings_and_cigar(capsys):
+	lines = run(capsys, GENOMES, '--query', 2, '--engine', 'antidiagonal', '--align-length', 100, '--format', 'json',
+				'--strings', '--cigar')
+	sequences = [str(seq) for seq in load_sequences(GENOMES)]
+	for line in lines:
+		record = json.loads(line)
+		assert record['i'] == 2
+		expected = GeneSequencing().align(sequences[2], sequences[record['j']], False, 100)
+		assert record['align_cost'] == expected['align_cost']
+		assert record['seqi_first100'] == expected['seqi_first100']
+		assert record['cigar'] == expected['alignment'].cigar()
+
+
+def test_json_sweep_with_traceback_lengths(capsys):
+	lines = run(capsys, GENOMES, '--query', 3, '--align-length', 30, 80, '--traceback-lengths', 30, '--engine',
+				'serial', '--format', 'json', '--cigar')
+	for line in lines:
+		sweep = json.loads(line)['sweep']
+		assert [entry['align_length'] for entry in sweep] == [30, 80]
+		assert sweep[0]['cigar'] is not None
+		assert sweep[1]['cigar'] is None
+
+
+def test_tsv_sweep(capsys):
+	lines = run(capsys, GENOMES, '--query', 3, '--align-length', 30, 80)
+	assert lines[0].split('\t')[-1] == 'sweep'
+	assert all(line.split('\t')[-1].startswith('30:') for line in lines[1:])
+
+
+# A TSV row has room for one alignment, not one per length of a sweep
+@pytest.mark.parametrize('option', ['--cigar', '--strings'])
+def test_tsv_sweep_refuses_alignments(capsys, option):
+	with pytest.raises(SystemExit) as exit_info:
+		main([GENOMES, '--align-length', '30', '80', '--traceback-lengths', '30', option])
+	assert exit_info.value.code == 2
+	assert '--format json' in capsys.readouterr().err
+
+
+def test_fasta_query_file(tmp_path, capsys):
+	references = tmp_path/'references.fasta'
+	references.write_text('>a\nACGTTGCA\n>b\nACTTGCCA\n')
+	query = tmp_path/'query.fasta'
+	query.write_text('>q\nACGTGCA\n')
+	lines = run(capsys, references, '--query-file', query, '--engine', 'serial')
+	assert [line.split('\t')[2:4] for line in lines[1:]] == [['q', 'a'], ['q', 'b']]
+	assert [int(line.split('\t')[4]) for line in lines[1:]] == [
+		GeneSequencing().align('ACGTGCA', target, False, 1000)['align_cost'] for target in ('ACGTTGCA', 'ACTTGCCA')]
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from AlignService import AlignmentService
+from conftest import genome_pairs
+from GeneSequencing import GeneSequencing
+
+
+# Start a service on a free local port, run scenario(port, service) against it and stop it
+def run_service(scenario, **options):
+	async def main():
+		service = AlignmentService(workers=1, **options)
+		server = await service.start('127.0.0.1', 0)
+		try:
+			return await scenario(server.sockets[0].getsockname()[1], service)
+		finally:
+			await service.close()
+	return asyncio.run(main())
+
+
+async def post(port, payload, path='/align'):
+	reader, writer = await asyncio.open_connection('127.0.0.1', port)
+	body = json.dumps(payload).encode()
+	writer.write('POST {} HTTP/1.1\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(
+		path, len(body)).encode('latin-1') + body)
+	await writer.drain()
+	response = await reader.read()
+	writer.close()
+	head, body = response.split(b'\r\n\r\n', 1)
+	return int(head.split()[1]), json.loads(body)
+
+
+def test_align_and_bad_requests():
+	seq1, seq2 = genome_pairs()[1]
+
+	async def scenario(port, service):
+		status, result = await post(port, {'seq1': seq1, 'seq2': seq2, 'align_length': 300})
+		assert status == 200
+		assert result['align_cost'] == GeneSequencing().align(seq1, seq2, False, 300)['align_cost']
+
+		for payload in [{'seq1': seq1}, {'seq1': seq1, 'seq2': seq2, 'align_length': -1},
+						{'seq1': seq1, 'seq2': seq2, 'engine': 'no such engine'}]:
+			status, result = await post(port, payload)
+			assert status == 400 and result['error']
+		# too many characters for the four-russians tables
+		status, result = await post(port, {'seq1': 'abcdefghijklmnopq', 'seq2': 'abc', 'engine': 'four-russians'})
+		assert status == 400
+		assert (await post(port, {}, path='/nowhere'))[0] == 404
+
+	run_service(scenario)
+
+
+# A table far past the memory budget fails the alignment, not the request
+def test_failed_alignment():
+	seq = 'ACGT'*250000
+
+	async def scenario(port, service):
+		status, result = await post(port, {'seq1': seq, 'seq2': seq, 'align_length': len(seq), 'engine': 'serial'})
+		assert status == 500 and result['error'].startswith('MemoryError')
+		assert (await post(port, {'seq1': 'ACGT', 'seq2': 'ACT'}))[0] == 200
+
+	run_service(scenario)
+
+
+def test_request_timeout():
+	seq1, seq2 = genome_pairs(length=1000)[1]
+
+	async def scenario(port, service):
+		payload = {'seq1': seq1, 'seq2': seq2, 'align_length': 1000, 'engine': 'serial'}
+		status, result = await post(port, payload)
+		assert status == 504 and '0.2 seconds' in result['error']
+
+	run_service(scenario, request_timeout=0.2)
+
+
+# A worker that dies breaks the pool: its batch gets 503 and the next one a new pool
+def test_broken_pool():
+	async def scenario(port, service):
+		assert (await post(port, {'seq1': 'ACGT', 'seq2': 'ACT'}))[0] == 200
+		for process in service.pool._processes.values():
+			process.kill()
+		status, result = await post(port, {'seq1': 'ACGT', 'seq2': 'AGT'})
+		assert status == 503 and 'broke' in result['error']
+		assert (await post(port, {'seq1': 'ACGT', 'seq2': 'AGT'}))[0] == 200
+
+	run_service(scenario)
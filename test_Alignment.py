@@ -0,0 +1,61 @@
+from Alignment import Alignment
+from AlignmentCache import AlignmentCache, restored_result, storable_result
+from conftest import genome_pairs, random_pairs
+from GeneSequencing import GeneSequencing
+from Operations import DELETE, INSERT, MATCH, SUB
+
+
+def test_render():
+	alignment = Alignment.from_operations('ACGT', 'AGGTT', [MATCH, SUB, INSERT, MATCH, DELETE, INSERT])
+	assert alignment.render() == ('AC-GT-', 'AGGT-T')
+	assert alignment.cigar() == '1=1X1I1=1D1I'
+	assert len(alignment) == 6
+
+
+# Any window is the same columns of the whole rendering
+def test_render_windows():
+	seq1, seq2 = genome_pairs()[1]
+	alignment = GeneSequencing().align(seq1, seq2, False, 1000)['alignment']
+	whole1, whole2 = alignment.render()
+	assert len(whole1) == len(whole2) == len(alignment)
+	for start, stop in [(0, 100), (0, 1), (7, 45), (250, None), (len(alignment) - 3, len(alignment) + 10), (40, 40)]:
+		assert alignment.render(start, stop) == (whole1[start:stop], whole2[start:stop])
+
+
+def test_from_cigar_round_trip():
+	for seq1, seq2 in random_pairs(8) + genome_pairs():
+		alignment = GeneSequencing().align(seq1, seq2, False, 1000)['alignment']
+		rebuilt = Alignment.from_cigar(alignment.seq1, alignment.seq2, alignment.cigar(), alignment.start_i,
+									  alignment.start_j)
+		assert rebuilt.runs == alignment.runs
+		assert rebuilt.render() == alignment.render()
+
+
+def test_restored_result_has_the_same_keys():
+	seq1, seq2 = genome_pairs()[2]
+	solver = GeneSequencing()
+	result = solver.align(seq1, seq2, False, 1000)
+	restored = restored_result(storable_result(result), *solver.shorter_longer_sequence(seq1, seq2))
+	assert restored.keys() == result.keys()
+	assert restored['alignment'].render() == result['alignment'].render()
+
+
+# A cache hit looks like a miss: the Alignment is rebuilt from the stored CIGAR string
+def test_cache_hit_rebuilds_the_alignment(tmp_path):
+	cache = AlignmentCache(str(tmp_path/'alignments.sqlite'))
+	solver = GeneSequencing(cache=cache)
+	for seq1, seq2 in genome_pairs()[:2] + random_pairs(4):
+		for banded, engine in [(False, 'serial'), (False, 'score'), (False, 'hirschberg'), (True, 'serial')]:
+			computed = solver.align(seq1, seq2, banded, 1000, engine=engine)
+			hits = cache.hits
+			cached = solver.align(seq1, seq2, banded, 1000, engine=engine)
+			assert cache.hits == hits + 1
+			assert cached.keys() == computed.keys()
+			assert cached['align_cost'] == computed['align_cost']
+			assert cached['seqi_first100'] == computed['seqi_first100']
+			assert cached['seqj_first100'] == computed['seqj_first100']
+			if computed['alignment'] is None:
+				assert cached['alignment'] is None
+			else:
+				assert cached['alignment'].render() == computed['alignment'].render()
+	cache.close()
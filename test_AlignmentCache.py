@@ -0,0 +1,50 @@
+from AlignmentCache import AlignmentCache
+from GeneSequencing import GeneSequencing
+
+
+def test_put_and_get(tmp_path):
+	cache = AlignmentCache(str(tmp_path/'alignments.sqlite'))
+	key = cache.key('ACGT', 'AGT', {'engine': 'score'})
+	assert cache.get(key) is None
+	cache.put(key, {'align_cost': 2, 'seqi_first100': None, 'seqj_first100': None, 'alignment': None})
+	assert cache.get(key)['align_cost'] == 2
+	assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+	cache.close()
+
+
+def test_key_depends_on_sequences_and_parameters(tmp_path):
+	cache = AlignmentCache(str(tmp_path/'alignments.sqlite'))
+	key = cache.key('ACGT', 'AGT', {'engine': 'score'})
+	assert cache.key('ACGT', 'AGT', {'engine': 'score'}) == key
+	assert cache.key('ACGT', 'AGA', {'engine': 'score'}) != key
+	assert cache.key('ACGT', 'AGT', {'engine': 'serial'}) != key
+	cache.close()
+
+
+# The least recently used entries go first once the results outgrow max_bytes
+def test_lru_eviction(tmp_path):
+	result = {'align_cost': 1, 'seqi_first100': 'A'*100, 'seqj_first100': 'C'*100, 'alignment': None}
+	cache = AlignmentCache(str(tmp_path/'alignments.sqlite'), max_bytes=1000)
+	for index in range(3):
+		cache.put(str(index), result)
+	assert cache.get('0') is not None
+	cache.put('3', result)
+	cache.put('4', result)
+	assert cache.get('1') is None and cache.get('2') is None
+	assert all(cache.get(key) is not None for key in ('0', '3', '4'))
+	assert cache.stats()['bytes'] <= 1000
+	cache.close()
+
+
+# A cached result survives closing the cache, and the second align is a hit
+def test_results_persist(tmp_path):
+	path = str(tmp_path/'alignments.sqlite')
+	cache = AlignmentCache(path)
+	expected = GeneSequencing(cache=cache).align('ACGTTGCA', 'ACTTGCCA', False, 1000, engine='score')
+	cache.close()
+
+	cache = AlignmentCache(path)
+	result = GeneSequencing(cache=cache).align('ACGTTGCA', 'ACTTGCCA', False, 1000, engine='score')
+	assert result['align_cost'] == expected['align_cost']
+	assert cache.stats()['hits'] == 1
+	cache.close()
@@ -0,0 +1,44 @@
+import multiprocessing
+import time
+
+from AllPairs import CANCEL_POLL_SECONDS, align_all_pairs, upper_triangle
+from conftest import load_genomes
+from GeneSequencing import GeneSequencing
+
+
+def short_genomes(count=5, length=150):
+	return [genome[:length] for genome in load_genomes()[:count]]
+
+
+def test_pool_aligns_every_pair_once():
+	sequences = short_genomes()
+	results = {}
+	for i, j, result in align_all_pairs(sequences, False, 1000, engine='antidiagonal', workers=2, chunk_size=2):
+		assert (i, j) not in results
+		results[i, j] = result
+	assert sorted(results) == upper_triangle(len(sequences))
+
+	solver = GeneSequencing()
+	for (i, j), result in results.items():
+		expected = solver.align(sequences[i], sequences[j], False, 1000)
+		assert result['align_cost'] == expected['align_cost']
+		assert result['seqi_first100'] == expected['seqi_first100']
+
+
+# Closing the generator early stops the pool without waiting for the pairs left
+def test_closing_early_stops_the_workers():
+	results = align_all_pairs(short_genomes(8, 400), False, 1000, engine='serial', workers=2)
+	next(results)
+	results.close()
+	assert multiprocessing.active_children() == []
+
+
+# Cancel returns within a poll or two, even with long alignments still running
+def test_cancel_stops_quickly():
+	sequences = short_genomes(6, 2000)
+	started = time.perf_counter()
+	results = list(align_all_pairs(sequences, False, 2000, engine='serial', workers=2,
+								   cancelled=lambda: time.perf_counter() - started > 0.5))
+	assert time.perf_counter() - started < 0.5 + 10*CANCEL_POLL_SECONDS
+	assert len(results) < len(upper_triangle(len(sequences)))
+	assert multiprocessing.active_children() == []
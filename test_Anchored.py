@@ -0,0 +1,50 @@
+import random
+
+from Anchored import chain_seeds, find_seeds
+from conftest import path_cost
+from GeneSequencing import GeneSequencing
+from SequenceCodes import as_codes
+
+
+# Anchored alignments are only optimal between the anchors
+def test_alignment_is_valid(pairs, serial_results):
+	solver = GeneSequencing()
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		result = solver.align(seq1, seq2, False, 1000, engine='anchored')
+		assert result['align_cost'] >= expected['align_cost']
+		assert path_cost(result['alignment']) == result['align_cost']
+		if len(result['alignment']):
+			assert abs(result['anchored_fraction'] + result['filled_fraction'] - 1) < 1e-9
+
+
+def test_close_genomes_are_mostly_anchored():
+	rng = random.Random(7)
+	seq1 = ''.join(rng.choice('ACGT') for index in range(6000))
+	seq2 = list(seq1)
+	for position in rng.sample(range(len(seq2)), 40):
+		seq2[position] = rng.choice('ACGT')
+	del seq2[3000:3005]
+	seq2 = ''.join(seq2)
+
+	solver = GeneSequencing()
+	result = solver.align(seq1, seq2, False, 10000, engine='anchored')
+	optimal = solver.align(seq1, seq2, False, 10000, engine='score')['align_cost']
+	assert result['anchors'] > 10
+	assert result['anchored_fraction'] > 0.8
+	assert optimal <= result['align_cost'] <= optimal + 20
+	assert path_cost(result['alignment']) == result['align_cost']
+
+
+# The heaviest co-linear chain, with overlaps trimmed off the later seed
+def test_chain_seeds():
+	seeds = [(0, 0, 10), (5, 5, 10), (20, 3, 5), (30, 30, 4)]
+	assert chain_seeds(seeds) == [(0, 0, 10), (10, 10, 5), (30, 30, 4)]
+	assert chain_seeds([]) == []
+
+
+# Seeds found once in each sequence, merged along their diagonal
+def test_find_seeds():
+	rng = random.Random(8)
+	seq = ''.join(rng.choice('ACGT') for index in range(200))
+	assert find_seeds(as_codes(seq), as_codes('TT' + seq), 16) == [(0, 2, 200)]
+	assert find_seeds(as_codes(seq), as_codes(seq[::-1]), 16) == []
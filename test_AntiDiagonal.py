@@ -0,0 +1,25 @@
+from AntiDiagonal import fill_antidiagonal
+from conftest import genome_pairs
+from GeneSequencing import INDEL, MATCH, SUB, GeneSequencing
+
+
+def test_same_alignment_as_serial(pairs, serial_results):
+	solver = GeneSequencing()
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		result = solver.align(seq1, seq2, False, 1000, engine='antidiagonal')
+		assert result['align_cost'] == expected['align_cost']
+		assert result['seqi_first100'] == expected['seqi_first100']
+		assert result['seqj_first100'] == expected['seqj_first100']
+		assert result['alignment'].cigar() == expected['alignment'].cigar()
+
+
+def test_align_length_cuts_both_sequences():
+	seq1, seq2 = genome_pairs()[1]
+	solver = GeneSequencing()
+	result = solver.align(seq1, seq2, False, 120, engine='antidiagonal')
+	assert result['align_cost'] == solver.align(seq1[:120], seq2[:120], False, 1000)['align_cost']
+
+
+def test_empty_sequences():
+	assert fill_antidiagonal('', 'ACG', MATCH, INDEL, SUB)[0] == 3*INDEL
+	assert fill_antidiagonal('AC', '', MATCH, INDEL, SUB)[0] == 2*INDEL
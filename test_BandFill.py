@@ -0,0 +1,69 @@
+import math
+
+from BandFill import adaptive_band, fill_band
+from conftest import genome_pairs, path_cost, random_pairs
+from GeneSequencing import INDEL, MATCH, MAXINDELS, SUB, GeneSequencing
+
+
+# The banded table filled cell by cell, as the original banded engine did: a
+# match always takes the diagonal, and cells more than _d_ off the diagonal are
+# out of reach
+def banded_scores(seq1, seq2, d):
+	scores = {}
+	for i in range(len(seq1) + 1):
+		for j in range(max(0, i - d), min(len(seq2), i + d) + 1):
+			if i == 0 or j == 0:
+				scores[i, j] = (i + j)*INDEL
+			elif seq1[i - 1] == seq2[j - 1]:
+				scores[i, j] = scores[i - 1, j - 1] + MATCH
+			else:
+				scores[i, j] = min(scores[i - 1, j - 1] + SUB, scores.get((i - 1, j), math.inf) + INDEL,
+								   scores.get((i, j - 1), math.inf) + INDEL)
+	return scores
+
+
+def test_band_matches_cell_by_cell_fill():
+	for seq1, seq2 in random_pairs(20, seed=2) + genome_pairs(80):
+		seq1, seq2 = sorted((seq1, seq2), key=len)
+		if len(seq2) > len(seq1) + MAXINDELS:
+			seq2 = seq2[:len(seq1) + MAXINDELS]
+		expected = banded_scores(seq1, seq2, MAXINDELS)
+		last_row, band = fill_band(seq1, seq2, MAXINDELS, MATCH, INDEL, SUB)
+		i = len(seq1)
+		for j in range(max(0, i - MAXINDELS), min(len(seq2), i + MAXINDELS) + 1):
+			assert last_row[j - i + MAXINDELS] == expected[i, j]
+
+
+# Only the 2d+1 cells of every row are stored, packed 4 to a byte
+def test_band_storage_is_linear():
+	seq1, seq2 = genome_pairs(1000)[1]
+	last_row, band = fill_band(seq1, seq2, MAXINDELS, MATCH, INDEL, SUB)
+	assert band.data.shape == (len(seq1) + 1, (2*MAXINDELS + 1 + 3)//4)
+	assert len(last_row) == 2*MAXINDELS + 1
+
+
+def test_identical_sequences_align_on_the_diagonal():
+	seq = genome_pairs()[1][0]
+	result = GeneSequencing().align(seq, seq, True, 1000)
+	assert result['align_cost'] == MATCH*len(seq)
+	assert result['seqi_first100'] == result['seqj_first100'] == seq[:100]
+
+
+def test_adaptive_band_is_optimal(pairs, serial_results):
+	solver = GeneSequencing()
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		result = solver.align(seq1, seq2, False, 1000, engine='adaptive')
+		assert result['align_cost'] == expected['align_cost']
+		assert path_cost(result['alignment']) == expected['align_cost']
+		assert result['band_width'] % 2 == 1
+
+
+# The band only grows as far as the sequences need
+def test_adaptive_band_width():
+	seq = genome_pairs(400)[1][0]
+	close = seq[:100] + seq[101:]
+	assert adaptive_band(close, seq, MAXINDELS, MATCH, INDEL, SUB)[2] == MAXINDELS
+	shifted = seq[:50] + seq[66:] + 'ACGTACGTACGTACGT'
+	score, operations, d = adaptive_band(seq, shifted, MAXINDELS, MATCH, INDEL, SUB)
+	assert d > MAXINDELS
+	assert score == GeneSequencing().align(seq, shifted, False, 1000, engine='score')['align_cost']
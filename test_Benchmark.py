@@ -0,0 +1,25 @@
+import json
+
+from Benchmark import DEFAULT_ENGINES, main
+from conftest import GENOMES
+from GeneSequencing import ENGINES, SCORE_ONLY_ENGINES, GeneSequencing
+
+
+# Every engine align takes is listed, and every one giving an alignment is benchmarked
+def test_default_engines_cover_every_alignment_engine():
+	solver = GeneSequencing()
+	for engine in ENGINES:
+		result = solver.align('ACGTTGCA', 'ACTTGCCA', False, 1000, engine=engine)
+		assert (result['alignment'] is None) == (engine in SCORE_ONLY_ENGINES)
+		assert (engine in DEFAULT_ENGINES) == (engine not in SCORE_ONLY_ENGINES)
+
+
+def test_benchmark_report(tmp_path, capsys):
+	output = str(tmp_path/'bench.json')
+	main(['--file', GENOMES, '--lengths', '20,50', '--pairs', '2-3', '--output', output])
+	runs = json.load(open(output))['runs']
+	assert sorted({run['mode'] for run in runs}) == sorted(DEFAULT_ENGINES + ['banded'])
+	assert all(run['peak_bytes'] > 0 and run['cells'] > 0 for run in runs)
+
+	main(['--file', GENOMES, '--lengths', '20,50', '--pairs', '2-3', '--compare', output])
+	assert 'CHANGED' not in capsys.readouterr().out
@@ -0,0 +1,59 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from AlignCLI import main
+from Bounds import exceeds_max_cost, remaining_cost_bound
+from conftest import GENOMES, genome_pairs
+from GeneSequencing import INDEL, MATCH, GeneSequencing
+from SequenceStore import load_sequences
+
+
+def test_remaining_cost_bound():
+	assert remaining_cost_bound(0, 0, MATCH, INDEL) == 0
+	assert remaining_cost_bound(4, 4, MATCH, INDEL) == 4*MATCH
+	assert remaining_cost_bound(2, 5, MATCH, INDEL) == 2*MATCH + 3*INDEL
+	scores = np.array([20, 0, 30])
+	rows_left = np.array([3, 3, 3])
+	cols_left = np.array([3, 6, 0])
+	# the cheapest way out is from the second cell, at 3*MATCH + 3*INDEL
+	assert not exceeds_max_cost(scores, rows_left, cols_left, MATCH, INDEL, 3*MATCH + 3*INDEL)
+	assert exceeds_max_cost(scores, rows_left, cols_left, MATCH, INDEL, 3*MATCH + 3*INDEL - 1)
+
+
+# At its own cost a pair aligns as before; a point below, it is given up
+@pytest.mark.parametrize('engine', ['serial', 'antidiagonal', 'score', 'hirschberg', 'wavefront'])
+def test_max_cost(engine, pairs, serial_results):
+	solver = GeneSequencing()
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		cost = expected['align_cost']
+		within = solver.align(seq1, seq2, False, 1000, engine=engine, max_cost=cost)
+		assert within['align_cost'] == cost
+		assert within['max_cost'] == cost
+		over = solver.align(seq1, seq2, False, 1000, engine=engine, max_cost=cost - 1)
+		assert over['align_cost'] == math.inf
+		assert over['seqi_first100'] is None and over['seqj_first100'] is None
+		assert over['alignment'] is None
+
+
+def test_banded_max_cost():
+	seq1, seq2 = genome_pairs()[1]
+	solver = GeneSequencing()
+	cost = solver.align(seq1, seq2, True, 300)['align_cost']
+	assert solver.align(seq1, seq2, True, 300, max_cost=cost)['align_cost'] == cost
+	assert solver.align(seq1, seq2, True, 300, max_cost=cost - 1)['align_cost'] == math.inf
+
+
+# JSON has no infinity: the costs over --max-cost are null and flagged
+def test_cli_json(capsys):
+	main([GENOMES, '--query', '2', '--align-length', '100', '--max-cost', '0', '--format', 'json'])
+	records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+	sequences = [str(seq) for seq in load_sequences(GENOMES)]
+	assert len(records) == len(sequences)
+	for record in records:
+		cost = GeneSequencing().align(sequences[2], sequences[record['j']], False, 100)['align_cost']
+		assert record['exceeds_max_cost'] == (cost > 0)
+		assert record['align_cost'] == (None if cost > 0 else cost)
+		assert record['max_cost'] == 0
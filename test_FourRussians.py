@@ -0,0 +1,46 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from FourRussians import block_table, build_block_table, four_russians_score
+from GeneSequencing import INDEL, MATCH, SUB, GeneSequencing
+
+
+def test_cost_matches_serial(pairs, serial_results):
+	solver = GeneSequencing()
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		result = solver.align(seq1, seq2, False, 1000, engine='four-russians')
+		assert result['align_cost'] == expected['align_cost']
+		assert result['alignment'] is None
+
+
+# Odd rows and columns are left over from the blocks and finished row by row
+def test_odd_lengths():
+	rng = random.Random(13)
+	solver = GeneSequencing()
+	for num_rows, num_cols in [(0, 5), (1, 1), (1, 4), (3, 3), (7, 10), (10, 7), (33, 50), (51, 51)]:
+		seq1 = ''.join(rng.choice('ACGT') for index in range(num_rows))
+		seq2 = ''.join(rng.choice('ACGT') for index in range(num_cols))
+		expected = solver.align(seq1, seq2, False, 1000, engine='score')['align_cost']
+		assert four_russians_score(seq1, seq2, MATCH, INDEL, SUB) == expected
+
+
+def test_too_many_symbols():
+	assert four_russians_score('abcdefghijklmnop', 'ponmlkjihgfedcba', MATCH, INDEL, SUB) == \
+		GeneSequencing().align('abcdefghijklmnop', 'ponmlkjihgfedcba', False, 1000, engine='score')['align_cost']
+	with pytest.raises(ValueError):
+		four_russians_score('abcdefghijklmnopq', 'abc', MATCH, INDEL, SUB)
+	with pytest.raises(ValueError):
+		build_block_table(-3, 20, 1)
+
+
+# The table is built once and read back; a damaged file is built again
+def test_block_table_file(tmp_path):
+	table = block_table(MATCH, INDEL, SUB, str(tmp_path))
+	[name] = os.listdir(tmp_path)
+	assert np.array_equal(np.load(tmp_path/name), table)
+	(tmp_path/name).write_bytes(b'not a table')
+	assert np.array_equal(block_table(MATCH, INDEL, SUB, str(tmp_path)), table)
+	assert os.listdir(tmp_path) == [name]
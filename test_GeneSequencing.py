@@ -0,0 +1,63 @@
+import math
+
+from AlignmentCache import AlignmentCache
+from conftest import genome_pairs
+from GeneSequencing import GeneSequencing
+
+
+def test_score_engine_gives_the_cost_only(pairs, serial_results):
+	solver = GeneSequencing()
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		result = solver.align(seq1, seq2, False, 1000, engine='score')
+		assert result['align_cost'] == expected['align_cost']
+		assert result['seqi_first100'] is None and result['seqj_first100'] is None
+		assert result['alignment'] is None
+
+
+# The GUI fills the matrix with the cost only and aligns a pair again when it is shown
+def test_score_then_traceback_on_demand():
+	seq1, seq2 = genome_pairs()[3]
+	solver = GeneSequencing()
+	cost = solver.align(seq1, seq2, False, 200, engine='score')['align_cost']
+	shown = solver.align(seq1, seq2, False, 200)
+	assert shown['align_cost'] == cost
+	assert len(shown['seqi_first100']) == len(shown['seqj_first100']) == 100
+
+
+# A sweep costs every length the same as aligning it on its own, the longest last
+def test_sweep_costs_match_serial():
+	seq1, seq2 = genome_pairs()[2]
+	lengths = [300, 0, 7, 120, 50, 7]
+	result = GeneSequencing().align(seq1, seq2, False, lengths)
+	expected = {length: GeneSequencing().align(seq1, seq2, False, length)['align_cost'] for length in lengths}
+	assert [entry['align_length'] for entry in result['sweep']] == [0, 7, 50, 120, 300]
+	assert [entry['align_cost'] for entry in result['sweep']] == [expected[length] for length in (0, 7, 50, 120, 300)]
+	assert result['align_cost'] == expected[300] and result['align_length'] == 300
+
+
+def test_sweep_traceback_lengths_and_max_cost():
+	seq1, seq2 = genome_pairs()[2]
+	solver = GeneSequencing()
+	result = solver.align(seq1, seq2, False, [40, 300], engine='serial', traceback_lengths=[40])
+	shown = solver.align(seq1, seq2, False, 40, engine='serial')
+	assert result['sweep'][0]['alignment'].cigar() == shown['alignment'].cigar()
+	assert result['sweep'][1]['alignment'] is None
+
+	# matches make the longer prefixes cheaper
+	cost = result['sweep'][1]['align_cost']
+	bounded = solver.align(seq1, seq2, False, [40, 300], max_cost=cost)
+	assert [entry['align_cost'] for entry in bounded['sweep']] == [math.inf, cost]
+
+
+def test_cache_round_trip_sweep(tmp_path):
+	cache = AlignmentCache(str(tmp_path/'alignments.sqlite'))
+	solver = GeneSequencing(cache=cache)
+	seq1, seq2 = genome_pairs()[2]
+	computed = solver.align(seq1, seq2, False, [40, 300], traceback_lengths=[40], engine='serial')
+	hits = cache.hits
+	cached = solver.align(seq1, seq2, False, [40, 300], traceback_lengths=[40], engine='serial')
+	assert cache.hits == hits + 2
+	assert [entry.keys() for entry in cached['sweep']] == [entry.keys() for entry in computed['sweep']]
+	assert [entry['align_cost'] for entry in cached['sweep']] == [entry['align_cost'] for entry in computed['sweep']]
+	assert cached['sweep'][0]['alignment'].render() == computed['sweep'][0]['alignment'].render()
+	cache.close()
@@ -0,0 +1,38 @@
+import Hirschberg
+from conftest import genome_pairs, path_cost
+from GeneSequencing import INDEL, MATCH, SUB, GeneSequencing
+from Hirschberg import corner_scores, hirschberg, last_row_scores
+from SequenceCodes import as_codes
+
+
+def test_optimal_alignment(pairs, serial_results):
+	solver = GeneSequencing()
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		result = solver.align(seq1, seq2, False, 1000, engine='hirschberg')
+		assert result['align_cost'] == expected['align_cost']
+		assert path_cost(result['alignment']) == expected['align_cost']
+
+
+# Small direct tables, so that the halves are split many times over
+def test_split_alignment_is_optimal(monkeypatch, pairs, serial_results):
+	monkeypatch.setattr(Hirschberg, 'DIRECT_CELLS', 16)
+	solver = GeneSequencing()
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		result = solver.align(seq1, seq2, False, 1000, engine='hirschberg')
+		assert result['align_cost'] == expected['align_cost']
+		assert path_cost(result['alignment']) == expected['align_cost']
+
+
+def test_last_row_scores():
+	seq1, seq2 = genome_pairs(60)[1]
+	row = last_row_scores(as_codes(seq1), as_codes(seq2), MATCH, INDEL, SUB)
+	for j in (0, 1, 17, 60):
+		assert row[j] == hirschberg(seq1, seq2[:j], MATCH, INDEL, SUB)[0]
+
+
+# One pass gives the same scores as a table for each corner
+def test_corner_scores():
+	seq1, seq2 = genome_pairs(60)[2]
+	corners = [(0, 0), (0, 9), (7, 0), (13, 40), (60, 60), (31, 31)]
+	scores = corner_scores(as_codes(seq1), as_codes(seq2), corners, MATCH, INDEL, SUB)
+	assert list(scores) == [hirschberg(seq1[:i], seq2[:j], MATCH, INDEL, SUB)[0] for i, j in corners]
@@ -0,0 +1,78 @@
+import tracemalloc
+from contextlib import contextmanager
+
+import pytest
+
+from AlignmentCache import AlignmentCache
+from BandFill import band_cells
+from conftest import genome_pairs
+from GeneSequencing import MAXINDELS, GeneSequencing
+from Instrumentation import Instrumentation, total_instrumentation
+
+
+def test_counters():
+	seq1, seq2 = genome_pairs(120)[1]
+	solver = GeneSequencing()
+	report = solver.align(seq1, seq2, False, 100, engine='antidiagonal', instrument=True)['instrumentation']
+	assert report['cells'] == 100*100
+	assert {'fill', 'traceback'} <= set(report['timings'])
+	assert report['total'] >= sum(report['timings'].values())
+	assert report['peak_bytes'] > 0
+
+	report = solver.align(seq1, seq2, True, 100, instrument=True)['instrumentation']
+	assert report['cells'] == band_cells(100, 100, MAXINDELS)
+	assert report['band_width'] == 2*MAXINDELS + 1
+
+	result = solver.align(seq1, seq2, False, 100, engine='adaptive', instrument=True)
+	assert result['instrumentation']['band_width'] == result['band_width']
+	assert solver.align(seq1, seq2, False, 100).get('instrumentation') is None
+
+
+def test_memory_tracing_is_opt_in():
+	seq1, seq2 = genome_pairs(50)[1]
+	report = GeneSequencing().align(seq1, seq2, False, 50, instrument=Instrumentation(memory=False))['instrumentation']
+	assert report['peak_bytes'] is None
+	assert report['cells'] == 50*50
+	assert not tracemalloc.is_tracing()
+
+
+# The probe is stopped even when the engine raises, so tracemalloc does not stay on
+def test_probe_stopped_when_the_engine_raises():
+	solver = GeneSequencing(memory_budget=1)
+	with pytest.raises(MemoryError):
+		solver.align('ACGT'*50, 'ACGT'*50, False, 1000, engine='antidiagonal', instrument=True)
+	assert not tracemalloc.is_tracing()
+
+
+def test_hooks_wrap_every_phase():
+	phases = []
+
+	@contextmanager
+	def hook(name):
+		phases.append(name)
+		yield
+
+	GeneSequencing().align('ACGTTGCA', 'ACTTGCCA', False, 1000, engine='hirschberg',
+						   instrument=Instrumentation(memory=False, hooks=[hook]))
+	assert phases == ['fill', 'traceback', 'render']
+
+
+# Instrumented alignments always run, and their timings are not cached
+def test_instrumented_alignments_skip_the_cache(tmp_path):
+	cache = AlignmentCache(str(tmp_path/'alignments.sqlite'))
+	solver = GeneSequencing(cache=cache)
+	solver.align('ACGTTGCA', 'ACTTGCCA', False, 1000)
+	report = solver.align('ACGTTGCA', 'ACTTGCCA', False, 1000, instrument=True)['instrumentation']
+	assert report['cells'] == 8*8
+	assert cache.stats()['hits'] == 0
+	assert 'instrumentation' not in solver.align('ACGTTGCA', 'ACTTGCCA', False, 1000)
+	cache.close()
+
+
+def test_total_instrumentation():
+	solver = GeneSequencing()
+	reports = [solver.align(seq1, seq2, False, 40, instrument=True)['instrumentation'] for seq1, seq2 in genome_pairs()]
+	totals = total_instrumentation(reports)
+	assert totals['alignments'] == len(reports)
+	assert totals['cells'] == sum(report['cells'] for report in reports)
+	assert totals['peak_bytes'] == max(report['peak_bytes'] for report in reports)
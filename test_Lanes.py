@@ -0,0 +1,58 @@
+import random
+
+from AlignmentCache import AlignmentCache
+from conftest import load_genomes
+from GeneSequencing import INDEL, MATCH, SUB, GeneSequencing
+from Lanes import lane_scores
+
+
+# Targets of mixed lengths, some shorter than align_length and one empty
+def query_and_targets():
+	rng = random.Random(9)
+	genomes = load_genomes()
+	query = genomes[2][:400]
+	targets = [genome[:rng.randint(50, 600)] for genome in genomes] + ['', genomes[2][:400], 'ACGT']
+	return query, targets
+
+
+def test_every_lane_matches_align():
+	query, targets = query_and_targets()
+	solver = GeneSequencing()
+	for align_length in (300, 1000):
+		results = solver.align_many(query, targets, False, align_length)
+		assert len(results) == len(targets)
+		for target, result in zip(targets, results):
+			expected = solver.align(query, target, False, align_length, engine='score')
+			assert result['align_cost'] == expected['align_cost']
+			assert result.keys() == expected.keys()
+
+
+# Small batches, so the lanes are split over several fills
+def test_batches():
+	query, targets = query_and_targets()
+	expected = lane_scores(query, targets, MATCH, INDEL, SUB)
+	assert list(lane_scores(query, targets, MATCH, INDEL, SUB, max_bytes=4096)) == list(expected)
+
+
+def test_banded_and_other_engines_align_one_at_a_time():
+	query, targets = query_and_targets()
+	solver = GeneSequencing()
+	for banded, engine in [(True, 'score'), (False, 'antidiagonal')]:
+		results = solver.align_many(query, targets, banded, 300, engine=engine)
+		for target, result in zip(targets, results):
+			expected = solver.align(query, target, banded, 300, engine=engine)
+			assert result['align_cost'] == expected['align_cost']
+			assert result['seqi_first100'] == expected['seqi_first100']
+
+
+def test_cached_lanes(tmp_path):
+	query, targets = query_and_targets()
+	cache = AlignmentCache(str(tmp_path/'alignments.sqlite'))
+	solver = GeneSequencing(cache=cache)
+	first = solver.align_many(query, targets[:5], False, 300)
+	results = solver.align_many(query, targets, False, 300)
+	assert cache.stats()['hits'] == 5
+	assert [result['align_cost'] for result in results[:5]] == [result['align_cost'] for result in first]
+	for target, result in zip(targets, results):
+		assert result['align_cost'] == GeneSequencing().align(query, target, False, 300, engine='score')['align_cost']
+	cache.close()
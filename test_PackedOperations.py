@@ -0,0 +1,58 @@
+import numpy as np
+
+import PackedOperations as packed_module
+from conftest import genome_pairs
+from GeneSequencing import GeneSequencing
+from PackedOperations import PackedOperations
+
+
+def random_operations(shape, seed=10):
+	return np.random.default_rng(seed).integers(1, 5, size=shape, dtype=np.uint8)
+
+
+def test_put_and_get():
+	operations = random_operations((9, 23))
+	ops = PackedOperations(9, 23)
+	# one cell of every row at a time, as the anti-diagonal fill writes them
+	for j in range(23):
+		ops.put(np.arange(9), np.full(9, j), operations[:, j])
+	assert ops.nbytes == PackedOperations.table_bytes(9, 23) == 9*6
+	assert all(ops.get(i, j) == operations[i, j] for i in range(9) for j in range(23))
+
+
+# Rows and blocks written from any column land in the same cells as single puts
+def test_put_row_and_block():
+	operations = random_operations((9, 23))
+	for first in range(5):
+		by_row = PackedOperations(9, 23)
+		for i in range(9):
+			by_row.put_row(i, first, operations[i, first:])
+		by_block = PackedOperations(9, 23)
+		by_block.put_block(2, first, operations[2:, first:])
+		for i in range(9):
+			for j in range(first, 23):
+				assert by_row.get(i, j) == operations[i, j]
+				if i >= 2:
+					assert by_block.get(i, j) == operations[i, j]
+
+
+def test_spilled_table():
+	operations = random_operations((40, 41))
+	ops = PackedOperations(40, 41, spill_bytes=100)
+	assert ops.spilled and isinstance(ops.data, np.memmap)
+	for i in range(40):
+		ops.put_row(i, 0, operations[i])
+	assert all(ops.get(i, j) == operations[i, j] for i in range(40) for j in range(41))
+	assert not PackedOperations(40, 41).spilled
+
+
+# An alignment traced from a table in a temporary file is the same as from memory
+def test_engines_with_spilled_tables(monkeypatch):
+	seq1, seq2 = genome_pairs()[1]
+	solver = GeneSequencing()
+	expected = [solver.align(seq1, seq2, banded, 1000) for banded in (False, True)]
+	monkeypatch.setattr(packed_module, 'SPILL_BYTES', 0)
+	for banded, result in zip((False, True), expected):
+		spilled = solver.align(seq1, seq2, banded, 1000)
+		assert spilled['align_cost'] == result['align_cost']
+		assert spilled['alignment'].cigar() == result['alignment'].cigar()
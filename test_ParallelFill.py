@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from AntiDiagonal import fill_antidiagonal
+from conftest import genome_pairs
+from GeneSequencing import INDEL, MATCH, SUB, GeneSequencing
+from ParallelFill import fill_parallel, tile_edges
+
+
+def test_same_alignment_as_serial(pairs, serial_results):
+	solver = GeneSequencing(workers=2)
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		result = solver.align(seq1, seq2, False, 1000, engine='parallel')
+		assert result['align_cost'] == expected['align_cost']
+		assert result['seqi_first100'] == expected['seqi_first100']
+		assert result['seqj_first100'] == expected['seqj_first100']
+		assert result['alignment'].cigar() == expected['alignment'].cigar()
+
+
+# Small tiles, so the table is filled by many tiles on several processes
+def test_tiles_match_antidiagonal():
+	long1, long2 = genome_pairs(150)[3]
+	# and tiles cut short at the last row and column
+	for seq1, seq2 in [genome_pairs(150)[2], (long1[:61], long2)]:
+		score, ops = fill_antidiagonal(seq1, seq2, MATCH, INDEL, SUB)
+		tiled_score, tiled_ops = fill_parallel(seq1, seq2, MATCH, INDEL, SUB, workers=2, tile_size=16)
+		assert tiled_score == score
+		assert np.array_equal(tiled_ops.data, ops.data)
+
+
+def test_tile_size():
+	assert tile_edges(40, 16) == [1, 16, 32, 41]
+	assert tile_edges(10, 16) == [1, 11]
+	with pytest.raises(ValueError, match='multiple of 4'):
+		fill_parallel('ACGT', 'ACGT', MATCH, INDEL, SUB, workers=2, tile_size=18)
@@ -0,0 +1,61 @@
+import pytest
+
+from BandFill import adaptive_band
+from conftest import genome_pairs
+from GeneSequencing import INDEL, MATCH, SUB, GeneSequencing
+from Planner import UNKNOWN_DISTANCE, adaptive_widths, estimate, plan_alignment
+
+
+def test_engine_over_the_budget_is_refused():
+	seq1, seq2 = genome_pairs()[2]
+	solver = GeneSequencing(memory_budget=estimate('serial', 300, 300, 3)['bytes'] - 1)
+	with pytest.raises(MemoryError, match='serial engine'):
+		solver.align(seq1, seq2, False, 300, engine='serial')
+	# the score engine needs a row only
+	assert solver.align(seq1, seq2, False, 300, engine='score')['align_cost'] == \
+		GeneSequencing().align(seq1, seq2, False, 300)['align_cost']
+
+
+# The band starts within the budget but would have to double past it
+def test_adaptive_band_stops_at_the_budget():
+	seq1, seq2 = genome_pairs()[2]
+	assert adaptive_band(seq1, seq2, 3, MATCH, INDEL, SUB)[2] > 3
+	with pytest.raises(MemoryError, match='band of half width'):
+		adaptive_band(seq1, seq2, 3, MATCH, INDEL, SUB, max_bytes=301*((2*3 + 4)//4))
+
+	# the solver's budget holds the band's start with the rest of the alignment
+	seq1, seq2 = genome_pairs(3000)[2]
+	solver = GeneSequencing(memory_budget=estimate('adaptive', 3000, 3000, 3, 0)['bytes'])
+	with pytest.raises(MemoryError, match='band of half width'):
+		solver.align(seq1, seq2, False, 3000, engine='adaptive')
+	assert GeneSequencing().align(seq1, seq2, False, 3000, engine='adaptive')['band_width'] > 2*384 + 1
+
+
+# Each time the budget shrinks below the chosen engine another one is picked, at
+# the same cost, until none fits
+def test_plan_follows_the_budget():
+	seq1, seq2 = genome_pairs()[2]
+	cost = GeneSequencing().align(seq1, seq2, False, 300)['align_cost']
+	budget = 1 << 40
+	chosen = []
+	while True:
+		try:
+			result = GeneSequencing(memory_budget=budget).align(seq1, seq2, False, 300, engine='auto')
+		except MemoryError:
+			break
+		plan = result['plan']
+		assert result['align_cost'] == cost
+		assert plan['estimates'][plan['engine']]['bytes'] <= budget == plan['memory_budget']
+		chosen.append(plan['engine'])
+		budget = plan['estimates'][plan['engine']]['bytes'] - 1
+	assert len(chosen) >= 2 and len(set(chosen)) == len(chosen)
+	assert all(budget < estimate['bytes'] for estimate in plan['estimates'].values())
+
+
+# Sequences that cannot be sketched are planned as if they differed everywhere
+def test_unknown_distance():
+	plan = plan_alignment('polynomially', 'exponentially', 3, True, 1 << 30)
+	assert plan['distance'] is None
+	assert plan['estimates']['wavefront'] == estimate('wavefront', 12, 13, 3, UNKNOWN_DISTANCE)
+	assert adaptive_widths(300, 300, 3, None) == adaptive_widths(300, 300, 3, UNKNOWN_DISTANCE)
+	assert adaptive_widths(300, 300, 3, 0) == [3]
@@ -0,0 +1,63 @@
+import os
+
+from conftest import GENOMES, load_genomes
+from SequenceStore import PackedSequence, load_sequences, load_store, parse_sequences, sidecar_path
+
+
+def write(path, text):
+	with open(path, 'w') as file:
+		file.write(text)
+	return str(path)
+
+
+def test_parse_genomes_txt():
+	sequences = list(parse_sequences(GENOMES))
+	assert [str(seq) for seq in sequences] == load_genomes()
+	assert all(seq.name for seq in sequences)
+
+
+def test_parse_fasta(tmp_path):
+	path = write(tmp_path/'pair.fasta', '>first one\nACGT\nacgN\n\n>second\nNNNNRYacgt\n>empty\n')
+	sequences = list(parse_sequences(path))
+	assert [seq.name for seq in sequences] == ['first one', 'second', 'empty']
+	assert [str(seq) for seq in sequences] == ['ACGTacgN', 'NNNNRYacgt', '']
+
+
+# Characters outside ACGT are kept as runs beside the 2 bit codes
+def test_packing_round_trip():
+	for text in ['', 'A', 'ACGTACG', 'acgtNNNNacgt', 'ACGTnACGT-*', 'NNNN']:
+		seq = PackedSequence.from_bytes('name', text.encode())
+		assert str(seq) == text
+		assert len(seq) == len(text)
+	assert PackedSequence.from_bytes('name', b'ACGT'*100).packed.nbytes == 100
+
+
+def test_sidecar_is_reused(tmp_path):
+	path = write(tmp_path/'genomes.txt', open(GENOMES).read())
+	sequences = load_sequences(path)
+	assert os.path.exists(sidecar_path(path))
+	assert [str(seq) for seq in load_store(sidecar_path(path))] == [str(seq) for seq in sequences]
+	assert [str(seq) for seq in load_sequences(path)] == [str(seq) for seq in sequences]
+	# no temporary files are left beside it
+	assert sorted(os.listdir(tmp_path)) == ['genomes.txt', 'genomes.txt.seqstore.npz']
+
+
+def test_stale_sidecar_is_rebuilt(tmp_path):
+	path = write(tmp_path/'pair.txt', 'a#ACGT\nb#GGCC\n')
+	load_sequences(path)
+	write(path, 'a#ACGTACGT\nb#GGCC\nc#TT\n')
+	os.utime(path, ns=(1, 1))
+	assert [str(seq) for seq in load_sequences(path)] == ['ACGTACGT', 'GGCC', 'TT']
+	assert [str(seq) for seq in load_sequences(path)] == ['ACGTACGT', 'GGCC', 'TT']
+
+
+# A sidecar cut short or overwritten is parsed again instead of failing
+def test_corrupt_sidecar_is_parsed_again(tmp_path):
+	path = write(tmp_path/'pair.txt', 'a#ACGT\nb#GGCC\n')
+	load_sequences(path)
+	data = open(sidecar_path(path), 'rb').read()
+	for corrupt in (data[:len(data)//2], b'not a store', b''):
+		with open(sidecar_path(path), 'wb') as file:
+			file.write(corrupt)
+		assert load_store(sidecar_path(path)) is None
+		assert [str(seq) for seq in load_sequences(path)] == ['ACGT', 'GGCC']
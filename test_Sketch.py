@@ -0,0 +1,51 @@
+import random
+
+from Sketch import estimate_distance, screen_pairs, sketch
+
+
+def random_dna(length, rng):
+	return ''.join(rng.choice('ACGT') for index in range(length))
+
+
+def mutated(seq, rate, rng):
+	return ''.join(rng.choice('ACGT'.replace(base, '')) if rng.random() < rate else base for base in seq)
+
+
+def test_distance_follows_the_mutation_rate():
+	rng = random.Random(4)
+	seq = random_dna(20000, rng)
+	assert estimate_distance(sketch(seq), sketch(seq)) == 0
+	for rate in (0.01, 0.05):
+		distance = estimate_distance(sketch(seq), sketch(mutated(seq, rate, rng)))
+		assert rate/2 < distance < 2*rate
+	assert estimate_distance(sketch(seq), sketch(random_dna(20000, rng))) == 1.0
+	assert estimate_distance(sketch('polynomially'), sketch('exponentially')) is None
+
+
+# Pairs within max_distance are kept, closest first; the rest are skipped with their distance
+def test_screen_keeps_close_pairs():
+	rng = random.Random(5)
+	base = random_dna(10000, rng)
+	sequences = [base, mutated(base, 0.02, rng), mutated(base, 0.005, rng), random_dna(10000, rng), 'polynomially',
+				 'exponentially']
+	pairs = [(0, 1), (0, 2), (0, 3), (4, 5)]
+	keep, skipped, distances = screen_pairs(sequences, pairs, max_distance=0.1)
+	assert keep == [(0, 2), (0, 1), (4, 5)]
+	assert skipped == [(0, 3, distances[0, 3])]
+	assert distances[0, 2] < distances[0, 1] < 0.1
+	assert distances[4, 5] is None
+
+	keep, skipped, distances = screen_pairs(sequences, pairs)
+	assert keep == [(0, 2), (0, 1), (0, 3), (4, 5)] and skipped == []
+
+
+# Only the bases that will be aligned are sketched
+def test_screen_sketches_the_aligned_prefix():
+	rng = random.Random(6)
+	shared = random_dna(3000, rng)
+	sequences = [shared + random_dna(20000, rng), shared + random_dna(20000, rng)]
+	assert screen_pairs(sequences, [(0, 1)], max_distance=0.1)[1] != []
+	keep, skipped, distances = screen_pairs(sequences, [(0, 1)], max_distance=0.1, align_length=3000)
+	assert keep == [(0, 1)] and distances[0, 1] == 0
+	assert screen_pairs(sequences, [(0, 1)], max_distance=0.1, align_length=[1000, 3000])[0] == [(0, 1)]
+	assert screen_pairs(sequences, [(0, 1)], max_distance=0.1, align_length=[1000, 23000])[0] == []
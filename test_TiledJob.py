@@ -0,0 +1,99 @@
+import os
+import time
+
+import TiledJob
+from GeneSequencing import GeneSequencing
+from TiledJob import (claim_tile, collect, create_job, heartbeat_tile, job_status, lock_path, release_tile, run_worker,
+					  tiles)
+
+SEQUENCES = ['ACGTTGCA', 'ACTTGCCA', 'GGATCCAT', 'ACGTACGT', 'TTGCAACG', 'CCGTAGGA', 'ACGTTGCC']
+
+
+def make_job(tmp_path):
+	source = tmp_path/'sequences.fasta'
+	source.write_text(''.join('>s{}\n{}\n'.format(index, seq) for index, seq in enumerate(SEQUENCES)))
+	directory = str(tmp_path/'job')
+	create_job(directory, str(source), False, 1000, engine='serial', tile_size=2)
+	return directory
+
+
+# A lock as a worker that died long ago left it
+def leave_stale_lock(directory, a, b):
+	path = lock_path(directory, a, b)
+	with open(path, 'w') as file:
+		file.write('dead-host 1 0')
+	os.utime(path, (time.time() - 3600, time.time() - 3600))
+
+
+def test_claim_and_release(tmp_path):
+	directory = make_job(tmp_path)
+	token = claim_tile(directory, 0, 1)
+	assert token is not None
+	assert claim_tile(directory, 0, 1) is None
+	# someone else's token neither refreshes nor releases the lock
+	release_tile(directory, 0, 1, 'another worker')
+	assert os.path.exists(lock_path(directory, 0, 1))
+	release_tile(directory, 0, 1, token)
+	assert not os.path.exists(lock_path(directory, 0, 1))
+	assert claim_tile(directory, 0, 1) is not None
+
+
+def test_heartbeat(tmp_path):
+	directory = make_job(tmp_path)
+	token = claim_tile(directory, 0, 0)
+	path = lock_path(directory, 0, 0)
+	os.utime(path, (1, 1))
+	heartbeat_tile(directory, 0, 0, 'another worker')
+	assert os.stat(path).st_mtime < 10
+	heartbeat_tile(directory, 0, 0, token)
+	assert os.stat(path).st_mtime > time.time() - 60
+	assert claim_tile(directory, 0, 0, stale_seconds=60) is None
+
+
+# A stale lock is taken over, a live one left alone, and resuming finishes the rest:
+# every tile is aligned exactly once
+def test_stale_lock_takeover_and_resume(tmp_path):
+	directory = make_job(tmp_path)
+	all_tiles = tiles(len(SEQUENCES), 2)
+	leave_stale_lock(directory, 0, 1)
+	live = claim_tile(directory, 1, 2)
+
+	assert run_worker(directory, stale_seconds=60) == len(all_tiles) - 1
+	assert job_status(directory) == {'tiles': len(all_tiles), 'done': len(all_tiles) - 1, 'claimed': 1, 'pending': 0}
+	assert run_worker(directory, stale_seconds=60) == 0
+
+	release_tile(directory, 1, 2, live)
+	assert run_worker(directory, stale_seconds=60) == 1
+	assert run_worker(directory, stale_seconds=60) == 0
+	assert job_status(directory)['done'] == len(all_tiles)
+	assert not any(name.endswith(('.lock', '.stale', '.tmp')) for name in os.listdir(directory))
+
+	results = [(i, j, result['align_cost']) for i, j, result in collect(directory)]
+	assert sorted((i, j) for i, j, cost in results) == [(i, j) for i in range(7) for j in range(i, 7)]
+	solver = GeneSequencing()
+	for i, j, cost in results:
+		assert cost == solver.align(SEQUENCES[i], SEQUENCES[j], False, 1000)['align_cost']
+
+
+# Another worker takes the stale lock over between our look at it and our rename:
+# the fresh lock is put back and we back off
+def test_takeover_race(tmp_path, monkeypatch):
+	directory = make_job(tmp_path)
+	leave_stale_lock(directory, 0, 0)
+	path = lock_path(directory, 0, 0)
+	real_lock_state = TiledJob.lock_state
+	calls = []
+
+	def racing_lock_state(lock):
+		state = real_lock_state(lock)
+		if not calls:
+			os.remove(path)
+			with open(path, 'w') as file:
+				file.write('other worker')
+		calls.append(lock)
+		return state
+
+	monkeypatch.setattr(TiledJob, 'lock_state', racing_lock_state)
+	assert claim_tile(directory, 0, 0, stale_seconds=60) is None
+	assert open(path).read() == 'other worker'
+	assert [name for name in os.listdir(directory) if name.endswith('.stale')] == []
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from conftest import genome_pairs, path_cost
+from GeneSequencing import INDEL, MATCH, SUB, GeneSequencing
+from Operations import MATCH as MATCH_OPERATION
+from Wavefront import wavefront_alignment, wavefront_penalties
+
+
+def test_optimal_alignment(pairs, serial_results):
+	solver = GeneSequencing()
+	for (seq1, seq2), expected in zip(pairs, serial_results):
+		result = solver.align(seq1, seq2, False, 1000, engine='wavefront')
+		assert result['align_cost'] == expected['align_cost']
+		assert path_cost(result['alignment']) == expected['align_cost']
+
+
+def test_penalties():
+	assert wavefront_penalties(MATCH, INDEL, SUB) == (8, 13)
+	with pytest.raises(ValueError):
+		wavefront_penalties(0, 5, 0)
+
+
+# Runs of matches far longer than a chunk are crossed without a wavefront each
+def test_identical_sequences():
+	seq = ''.join(random.Random(11).choice('ACGT') for index in range(5000))
+	score, runs, offsets = wavefront_alignment(seq, seq, MATCH, INDEL, SUB)
+	assert score == 5000*MATCH
+	assert runs == [[MATCH_OPERATION, 5000]]
+	assert offsets == 1
+
+
+# Close genomes cost a small part of the table, and distant ones stop at max_bytes
+def test_work_follows_the_distance():
+	rng = random.Random(12)
+	seq1 = ''.join(rng.choice('ACGT') for index in range(4000))
+	seq2 = list(seq1)
+	for position in rng.sample(range(len(seq2)), 20):
+		seq2[position] = rng.choice('ACGT')
+	del seq2[2000:2003]
+	seq2 = ''.join(seq2)
+	score, runs, offsets = wavefront_alignment(seq1, seq2, MATCH, INDEL, SUB)
+	assert score == GeneSequencing().align(seq1, seq2, False, 4000, engine='score')['align_cost']
+	assert offsets < len(seq1)*len(seq2)//100
+
+	seq1, seq2 = genome_pairs(1000)[2]
+	with pytest.raises(MemoryError):
+		wavefront_alignment(seq1, seq2, MATCH, INDEL, SUB, max_bytes=1 << 16)